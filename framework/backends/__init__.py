@@ -155,12 +155,16 @@ def load(file_path):
 
         tests = os.path.join(file_path, 'tests')
         if os.path.exists(tests):
-            return _extension(os.listdir(tests)[0])
-        else:
-            # At this point we have failed to find any sort of backend, just
-            # except and die
-            raise BackendError("No backend found for any file in {}".format(
-                file_path))
+            # The index of the tests has no extension, skip it
+            for file_ in os.listdir(tests):
+                extension = _extension(file_)
+                if extension[0]:
+                    return extension
+
+        # At this point we have failed to find any sort of backend, just
+        # except and die
+        raise BackendError("No backend found for any file in {}".format(
+            file_path))
 
     extension, compression = get_extension(file_path)
 
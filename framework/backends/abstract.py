@@ -30,9 +30,16 @@ from __future__ import (
 )
 import abc
 import contextlib
+import errno
 import itertools
+import multiprocessing
+import multiprocessing.util
 import os
 import shutil
+import struct
+import threading
+import time
+import zlib
 
 import six
 
@@ -41,16 +48,16 @@ from . import compression
 from framework.results import TestResult
 from framework.status import INCOMPLETE
 
+# The name of the index of test statuses in the tests directory
+_INDEX = 'index'
 
-@contextlib.contextmanager
-def write_compressed(filename):
-    """Write a the final result using desired compression.
+
+def compressed_name(filename):
+    """Return the compression mode to use, and filename with its suffix.
 
     This helper function reads the piglit.conf to decide whether to use
     compression, and what type of compression to use.
 
-    Currently it implements no compression
-
     """
     mode = compression.get_mode()
     if mode != 'none':
@@ -60,11 +67,466 @@ def write_compressed(filename):
             filename = '{}.{}'.format(os.path.splitext(filename)[0], mode)
         else:
             filename = '{}.{}'.format(filename, mode)
+    return mode, filename
+
+
+@contextlib.contextmanager
+def write_compressed(filename):
+    """Write a the final result using desired compression.
+
+    The compression and the name of the file are decided by compressed_name.
+    Where possible the compression is spread over several cores, see
+    compression.write_parallel.
 
-    with compression.COMPRESSORS[mode](filename) as f:
+    """
+    mode, filename = compressed_name(filename)
+    with compression.write_parallel(mode, filename) as f:
         yield f
 
 
+def read_tests(dest):
+    """Yield the text written for each test by a FileBackend.
+
+    This reads both the file per test and journal write modes, in the order
+    the tests were started. When a journal contains more than one record for
+    a test the last one is used, and records that were not completely written
+    are ignored.
+
+    Arguments:
+    dest -- the directory the backend was writing to
+    """
+    tests_dir = os.path.join(dest, 'tests')
+    entries = []
+    for file_ in os.listdir(tests_dir):
+        path = os.path.join(tests_dir, file_)
+        name = os.path.splitext(file_)[0]
+        if name.endswith('.journal'):
+            entries.extend(six.iteritems(_Journal.read(path)))
+        elif file_ != _INDEX and not file_.endswith('.tmp'):
+            entries.append((int(name), (path, None, None)))
+
+    for _, (path, start, end) in sorted(entries, key=lambda e: e[0]):
+        with open(path, 'rb') as f:
+            if start is None:
+                data = f.read()
+            else:
+                f.seek(start)
+                data = f.read(end - start)
+        yield data.decode('utf-8')
+
+
+def read_index(dest):
+    """Return the status of each test started by a FileBackend.
+
+    This reads only the index kept by the backend, not the results, so it is
+    cheap even for very large runs. Returns a tuple of a dict mapping the
+    name of each test to the name of its last status, and the id to give to
+    the next test. Returns None if there is no index.
+
+    Arguments:
+    dest -- the directory the backend was writing to
+    """
+    try:
+        with open(os.path.join(dest, 'tests', _INDEX), 'rb') as f:
+            data = f.read()
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+
+    statuses = {}
+    next_ = 0
+    # The last line is either empty or was not completely written.
+    for line in data.split(b'\n')[:-1]:
+        id_, status, name = line.decode('utf-8').split(' ', 2)
+        statuses[name] = status
+        next_ = max(next_, int(id_) + 1)
+    return statuses, next_
+
+
+class _Index(object):
+    """The index of the statuses of the tests of a FileBackend.
+
+    Each line of the index is the id of a test, the name of its status, and
+    its name. A line with the incomplete status is appended before anything
+    is written for a test, and another with the final status once its result
+    is on disk, so the last line for a test is its status, and there is a line
+    for every id in use. If a line is lost the test is just run again on
+    resume, see read_index.
+
+    Each process keeps the index open for appending, shared by its threads.
+    Lines are written with a single write, so lines from different processes
+    and threads are never interleaved.
+
+    Arguments:
+    dest -- the directory the backend is writing to
+    """
+
+    def __init__(self, dest):
+        self._dest = dest
+        self._reset()
+        multiprocessing.util.register_after_fork(self, _Index._reset)
+
+    def _reset(self):
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'_dest': self._dest}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    @property
+    def path(self):
+        return os.path.join(self._dest, 'tests', _INDEX)
+
+    def append(self, id_, status, name):
+        """Append the status of the test id_ to the index."""
+        line = '{} {} {}\n'.format(id_, status, name).encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(line)
+            self._file.flush()
+
+    def sync(self):
+        """Sync the lines appended by this process to disk."""
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+
+
+class _Journal(object):
+    """An append only log of test results.
+
+    Each process writes to its own file, tests/<pid>.journal.<extension>,
+    which threads of that process share. Records are a header of the length
+    of the data, its crc32, and the id of the test, followed by the data.
+
+    Arguments:
+    dest      -- the directory the backend is writing to
+    extension -- the file extension of the backend
+    """
+    RECORD = struct.Struct(str('<IIQ'))
+
+    def __init__(self, dest, extension):
+        self._dest = dest
+        self._extension = extension
+        self._reset()
+        multiprocessing.util.register_after_fork(self, _Journal._reset)
+
+    def _reset(self):
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'_dest': self._dest, '_extension': self._extension}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def append(self, id_, data):
+        """Append a record for the test id_ to the journal."""
+        record = self.RECORD.pack(len(data), zlib.crc32(data) & 0xffffffff,
+                                  id_) + data
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            # A single write, so that a record is never split between two
+            # writes that could be separated by a crash.
+            self._file.write(record)
+            self._file.flush()
+            if options.OPTIONS.sync and not options.OPTIONS.sync_window:
+                os.fsync(self._file.fileno())
+
+    @property
+    def path(self):
+        """The journal of this process."""
+        return os.path.join(self._dest, 'tests', '{}.journal.{}'.format(
+            os.getpid(), self._extension))
+
+    @classmethod
+    def read(cls, path):
+        """Return a dict of test ids to (path, start, end) of their data.
+
+        Reading stops at the first record which is incomplete or doesn't match
+        its checksum.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        return {id_: (path, start, end)
+                for id_, start, end in cls.records(data)}
+
+    @classmethod
+    def records(cls, data):
+        """Yield the (id, start, end) of each complete record in data."""
+        idx = 0
+        while idx + cls.RECORD.size <= len(data):
+            length, crc, id_ = cls.RECORD.unpack_from(data, idx)
+            start = idx + cls.RECORD.size
+            idx = start + length
+            if idx > len(data) or \
+                    zlib.crc32(data[start:idx]) & 0xffffffff != crc:
+                return
+            yield id_, start, idx
+
+
+class TestFollower(object):
+    """Follows the tests written by a FileBackend while it is running.
+
+    poll returns the (id, text) of the tests written since the last poll,
+    leaving out tests that have been marked as done with done. Result files
+    are replaced when a test finishes, so the files of tests that are not
+    done are read again by each poll, while journals are read from where the
+    last poll stopped.
+
+    Arguments:
+    dest      -- the directory the backend is writing to
+    extension -- the file extension of the backend
+    journal   -- True if the backend is writing journals
+
+    Keyword Arguments:
+    start -- the id of the first test. Default: 0
+    """
+    # Tests are started in parallel, so files are not created in the order of
+    # their ids. This many missing files are looked for past the last one
+    # found before giving up.
+    LOOKAHEAD = 64
+
+    def __init__(self, dest, extension, journal, start=0):
+        self._tests = os.path.join(dest, 'tests')
+        self._extension = extension
+        self._journal = journal
+        self._next = start
+        self._done = set()
+        self._offsets = {}
+        self._latest = {}
+
+    def is_done(self, id_):
+        return id_ < self._next or id_ in self._done
+
+    def done(self, id_):
+        """Mark a test as done, it won't be returned again."""
+        self._done.add(id_)
+        self._latest.pop(id_, None)
+        while self._next in self._done:
+            self._done.remove(self._next)
+            self._next += 1
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read().decode('utf-8')
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+    def _poll_journals(self):
+        found = {}
+        for file_ in os.listdir(self._tests):
+            if not os.path.splitext(file_)[0].endswith('.journal'):
+                continue
+            path = os.path.join(self._tests, file_)
+            offset = self._offsets.get(path, 0)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            for id_, start, end in _Journal.records(data):
+                self._offsets[path] = offset + end
+                if not self.is_done(id_):
+                    found[id_] = data[start:end].decode('utf-8')
+        self._latest.update(found)
+        return found
+
+    def _poll_files(self):
+        found = {}
+        id_ = self._next
+        misses = 0
+        while misses < self.LOOKAHEAD:
+            if not self.is_done(id_):
+                text = self._read(os.path.join(
+                    self._tests, '{}.{}'.format(id_, self._extension)))
+                if text is None:
+                    misses += 1
+                else:
+                    misses = 0
+                    found[id_] = text
+            id_ += 1
+        return found
+
+    def poll(self):
+        """Return a list of (id, text) of tests written since the last poll,
+        sorted by id.
+        """
+        if self._journal:
+            found = self._poll_journals()
+        else:
+            found = self._poll_files()
+        return sorted(six.iteritems(found))
+
+    def drain(self):
+        """Return a list of (id, text) of every test that isn't done yet,
+        sorted by id.
+
+        Unlike poll this finds every test, even ones written after a gap of
+        more than LOOKAHEAD tests that were never written.
+        """
+        if self._journal:
+            self._poll_journals()
+            return sorted(six.iteritems(self._latest))
+
+        found = []
+        for file_ in os.listdir(self._tests):
+            if file_ == _INDEX or file_.endswith('.tmp'):
+                continue
+            id_ = int(os.path.splitext(file_)[0])
+            if not self.is_done(id_):
+                text = self._read(os.path.join(self._tests, file_))
+                if text is not None:
+                    found.append((id_, text))
+        return sorted(found)
+
+
+def _sync_path(path, flags=os.O_RDWR):
+    """Sync the file or directory at path to disk, if it still exists."""
+    try:
+        fd = os.open(path, flags)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        raise
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _GroupCommit(object):
+    """Syncs written files to disk in groups, from a background thread.
+
+    Rather than every write waiting for its own fsync, the paths of written
+    files are added to a set of pending files, and a thread syncs all of them
+    together once options.OPTIONS.sync_window milliseconds have passed since
+    the first was added, or once options.OPTIONS.sync_batch are pending,
+    whichever comes first. A result may therefore be lost by a crash for at
+    most the length of the window after it was written.
+
+    The status of a test is only added to the index once the file holding its
+    result has been synced, and the index is synced along with the group, so
+    the index never claims a result that isn't on disk.
+
+    Each process has its own thread, which is started on first use. Pending
+    files are synced when the process exits, and by flush.
+
+    Arguments:
+    index -- the _Index of the backend
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._reset()
+        multiprocessing.util.register_after_fork(self, _GroupCommit._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._sync_lock = threading.Lock()
+        self._pending = set()
+        self._statuses = []
+        self._first = None
+        self._thread = None
+
+    def __getstate__(self):
+        return {'_index': self._index}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def add(self, path, status=None):
+        """Add path to the files to be synced.
+
+        Keyword Arguments:
+        status -- an (id, status, name) tuple to add to the index once path
+                  has been synced
+        """
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+                multiprocessing.util.Finalize(self, self.flush,
+                                              exitpriority=10)
+            if not self._pending:
+                self._first = time.time()
+            self._pending.add(path)
+            if status is not None:
+                self._statuses.append(status)
+            if len(self._pending) >= options.OPTIONS.sync_batch:
+                self._cond.notify()
+
+    def _take(self):
+        pending, self._pending = self._pending, set()
+        statuses, self._statuses = self._statuses, []
+        return pending, statuses
+
+    def _sync(self, pending, statuses):
+        with self._sync_lock:
+            for path in pending:
+                _sync_path(path)
+            # Make the renames of result files durable as well.
+            if os.name == 'posix':
+                for dir_ in set(os.path.dirname(p) for p in pending):
+                    _sync_path(dir_, os.O_RDONLY)
+            if statuses:
+                for status in statuses:
+                    self._index.append(*status)
+                self._index.sync()
+
+    def _run(self):
+        window = options.OPTIONS.sync_window / 1000
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while len(self._pending) < options.OPTIONS.sync_batch:
+                    remaining = self._first + window - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                pending = self._take()
+            self._sync(*pending)
+
+    def flush(self):
+        """Sync all pending files, and wait for any sync in progress."""
+        with self._cond:
+            pending = self._take()
+        self._sync(*pending)
+
+
+class _SharedCounter(object):
+    """A replacement for itertools.count that is safe to share between
+    processes.
+    """
+    def __init__(self, start=0):
+        self.__value = multiprocessing.Value('L', start)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.__value.get_lock():
+            value = self.__value.value
+            self.__value.value += 1
+        return value
+
+    next = __next__
+
+
 @six.add_metaclass(abc.ABCMeta)
 class Backend(object):
     """ Abstract base class for summary backends
@@ -149,6 +611,27 @@ class Backend(object):
 
         """
 
+    def share(self):
+        """ Prepare the backend to have write_test called from more than one
+        process
+
+        This is called by executors that run tests in worker processes before
+        those processes are started. Backends that keep state between calls to
+        write_test (like a counter) must make that state process safe here.
+        The default implementation does nothing.
+
+        """
+
+    def abort(self):
+        """ Stop writing results after the run was aborted
+
+        This is called instead of finalize() when the run is aborted, backends
+        that write anything besides the results of the tests while they run
+        should stop and remove it here. The run may be resumed later. The
+        default implementation does nothing.
+
+        """
+
 
 class FileBackend(Backend):
     """ A baseclass for file based backends
@@ -165,25 +648,59 @@ class FileBackend(Backend):
                         tests. It is important for resumes that this is not
                         overlapping as the Inheriting classes assume they are
                         not. Default: 0
+    file_journal     -- if True, append the results of each process to a
+                        single journal file, rather than writing a file per
+                        test. Default: False
 
     """
-    def __init__(self, dest, file_start_count=0, **kwargs):
+    def __init__(self, dest, file_start_count=0, file_journal=False,
+                 **kwargs):
         self._dest = dest
+        self._start_count = file_start_count
         self._counter = itertools.count(file_start_count)
         self._write_final = write_compressed
+        self._journal = None
+        if file_journal:
+            self._journal = _Journal(dest, self._file_extension)
+        self._index = _Index(dest)
+        self._group_commit = _GroupCommit(self._index)
 
     __INCOMPLETE = TestResult(result=INCOMPLETE)
 
+    def share(self):
+        self._counter = _SharedCounter(next(self._counter))
+
     def __fsync(self, file_):
         """ Sync the file to disk
 
-        If options.OPTIONS.sync is truthy this will sync self._file to disk
+        If options.OPTIONS.sync is truthy and there is no sync window this will
+        sync self._file to disk
 
         """
         file_.flush()
-        if options.OPTIONS.sync:
+        if options.OPTIONS.sync and not options.OPTIONS.sync_window:
             os.fsync(file_.fileno())
 
+    def __commit(self, path, status):
+        """ Queue a written file to be synced to disk, and record its status
+
+        If options.OPTIONS.sync is truthy and there is a sync window this will
+        add the file to the next group of files to be synced, and the status
+        is added to the index once it has been. Otherwise the status is added
+        to the index now, and synced if the file was.
+
+        Arguments:
+        path   -- the path of the written file
+        status -- an (id, status, name) tuple for the index, or None
+
+        """
+        if options.OPTIONS.sync and options.OPTIONS.sync_window:
+            self._group_commit.add(path, status)
+        elif status is not None:
+            self._index.append(*status)
+            if options.OPTIONS.sync:
+                self._index.sync()
+
     @abc.abstractmethod
     def _write(self, f, name, data):
         """Method that writes a TestResult into a result file."""
@@ -205,19 +722,48 @@ class FileBackend(Backend):
         long as the filesystem continues running and the result was valid in
         the original file it will be valid at the end
 
+        In journal mode both the placeholder and the final result are appended
+        to the journal, readers use the last complete record of each test.
+
+        The status of the test is added to the index after each of these
+        writes, see read_index.
+
         """
+        id_ = next(self._counter)
+        self._index.append(id_, INCOMPLETE, name)
+
+        if self._journal is not None:
+            def write(val):
+                f = six.StringIO()
+                self._write(f, name, val)
+                data = f.getvalue()
+                if isinstance(data, six.text_type):
+                    data = data.encode('utf-8')
+                self._journal.append(id_, data)
+
+            def append(val):
+                write(val)
+                self.__commit(self._journal.path, (id_, val.result, name))
+
+            write(self.__INCOMPLETE)
+            self.__commit(self._journal.path, None)
+            yield append
+            return
+
         def finish(val):
             tfile = file_ + '.tmp'
             with open(tfile, 'w') as f:
                 self._write(f, name, val)
                 self.__fsync(f)
             shutil.move(tfile, file_)
+            self.__commit(file_, (id_, val.result, name))
 
         file_ = os.path.join(self._dest, 'tests', '{}.{}'.format(
-            next(self._counter), self._file_extension))
+            id_, self._file_extension))
 
         with open(file_, 'w') as f:
             self._write(f, name, self.__INCOMPLETE)
             self.__fsync(f)
+        self.__commit(file_, None)
 
         yield finish
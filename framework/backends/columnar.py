@@ -0,0 +1,499 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""A compact, columnar results format that is read with mmap.
+
+The text based backends have to be parsed completely before anything can be
+done with a result, even counting failures. This backend writes a single
+binary file, results.columnar, which stores each attribute of the tests in a
+separate column, so that loading it only has to read the small columns and
+the names of the tests. The output of the tests, which is most of the size of
+a result, is read from the mapped file when it is used.
+
+The file starts with a header: the magic bytes, the format version, and the
+number of tests, followed by the (offset, length) of each of the sections in
+SECTIONS. All numbers are little endian.
+
+metadata       -- a json object with everything but the tests and totals
+names          -- a json list of strings. The first entries are the names of
+                  the tests in order, followed by the names of subtests, each
+                  of which is stored once.
+groups         -- a json list of the names of the groups in the totals
+totals         -- 32 bit unsigned ints, for each group the count of each
+                  status in status.ALL
+result         -- one byte per test, the index of its status in status.ALL
+start, end     -- doubles, the times of each test
+returncode     -- 32 bit ints, RETURNCODE_NONE for None
+subtest_count  -- 32 bit unsigned ints, the number of subtests of each test
+subtest_name   -- 32 bit unsigned ints, the index in names of each subtest
+subtest_result -- one byte per subtest, the index of its status in status.ALL
+out, err,
+dmesg, fields  -- 32 bit unsigned ints, the length of each test's value in
+                  the blob
+blob           -- for each test, the utf-8 encoded out, err and dmesg, and a
+                  json object of the remaining attributes
+
+While tests are running the backend writes the same per test json files as
+the json backend, which is also used to load an unfinished run. Those are
+only written and read once each, so they gain nothing from being columnar.
+
+This format is not compressed, the compression setting is ignored.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import array
+import collections
+import mmap
+import os
+import shutil
+import struct
+import sys
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import six
+
+from framework import exceptions, grouptools, results, status
+from .abstract import read_tests
+from .register import Registry
+from . import json as json_backend
+
+__all__ = [
+    'REGISTRY',
+    'ColumnarBackend',
+    'ColumnarResult',
+    'write_results',
+]
+
+MAGIC = b'PIGLITCR'
+
+# The current version of the columnar format
+CURRENT_VERSION = 1
+
+SECTIONS = ['metadata', 'names', 'groups', 'totals', 'result', 'start',
+            'end', 'returncode', 'subtest_count', 'subtest_name',
+            'subtest_result', 'out', 'err', 'dmesg', 'fields', 'blob']
+
+# The array type code of each column
+_COLUMNS = collections.OrderedDict([
+    ('totals', str('I')),
+    ('result', str('B')),
+    ('start', str('d')),
+    ('end', str('d')),
+    ('returncode', str('i')),
+    ('subtest_count', str('I')),
+    ('subtest_name', str('I')),
+    ('subtest_result', str('B')),
+    ('out', str('I')),
+    ('err', str('I')),
+    ('dmesg', str('I')),
+    ('fields', str('I')),
+])
+
+# The attributes of a TestResult stored in the blob as json
+_FIELDS = ['command', 'environment', 'pid', 'traceback', 'exception',
+           'images']
+
+RETURNCODE_NONE = -2 ** 31
+
+_HEADER = struct.Struct(str('<8sII'))
+_SECTION = struct.Struct(str('<QQ'))
+
+_CODES = {s: i for i, s in enumerate(status.ALL)}
+
+
+def _tobytes(column):
+    if sys.byteorder != 'little':
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes() if six.PY3 else column.tostring()
+
+
+def _frombytes(typecode, data):
+    column = array.array(typecode)
+    if six.PY3:
+        column.frombytes(data)
+    else:
+        column.fromstring(data)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def _offsets(*columns):
+    """Return the running total of the sum of columns, starting at 0."""
+    offsets = [0]
+    total = 0
+    for lengths in zip(*columns):
+        total += sum(lengths)
+        offsets.append(total)
+    return offsets
+
+
+def write_results(testrun, filename):
+    """Write a results.TestrunResult to filename in the columnar format.
+
+    The file is written to a temporary file which is moved over filename, so
+    filename is either the complete result or unchanged.
+    """
+    if not testrun.totals:
+        testrun.calculate_group_totals()
+
+    columns = {k: array.array(t) for k, t in six.iteritems(_COLUMNS)}
+    names = list(testrun.tests)
+    subtest_names = {}
+    sections = {}
+
+    tmp = '{}.tmp'.format(filename)
+    with open(tmp, 'wb') as f:
+        f.write(b'\0' * (_HEADER.size + _SECTION.size * len(SECTIONS)))
+
+        start = f.tell()
+        for test in six.itervalues(testrun.tests):
+            columns['result'].append(_CODES[test.result])
+            columns['start'].append(test.time.start)
+            columns['end'].append(test.time.end)
+            columns['returncode'].append(
+                RETURNCODE_NONE if test.returncode is None
+                else test.returncode)
+
+            columns['subtest_count'].append(len(test.subtests))
+            for name, result in six.iteritems(test.subtests):
+                if name not in subtest_names:
+                    subtest_names[name] = len(names)
+                    names.append(name)
+                columns['subtest_name'].append(subtest_names[name])
+                columns['subtest_result'].append(_CODES[result])
+
+            fields = json.dumps({k: getattr(test, k) for k in _FIELDS})
+            for key, value in [('out', test.out), ('err', test.err),
+                               ('dmesg', test.dmesg), ('fields', fields)]:
+                if isinstance(value, six.text_type):
+                    value = value.encode('utf-8')
+                columns[key].append(len(value))
+                f.write(value)
+        sections['blob'] = (start, f.tell() - start)
+
+        groups = list(testrun.totals)
+        for group in groups:
+            totals = testrun.totals[group]
+            columns['totals'].extend(
+                totals[six.text_type(s)] for s in status.ALL)
+
+        metadata = {k: v for k, v in six.iteritems(testrun.__dict__)
+                    if k not in ['tests', 'totals']}
+        for key, value in [
+                ('metadata', json.dumps(
+                    metadata, default=json_backend.piglit_encoder)),
+                ('names', json.dumps(names)),
+                ('groups', json.dumps(groups))]:
+            start = f.tell()
+            f.write(value.encode('utf-8'))
+            sections[key] = (start, f.tell() - start)
+
+        for key, column in six.iteritems(columns):
+            start = f.tell()
+            f.write(_tobytes(column))
+            sections[key] = (start, f.tell() - start)
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, CURRENT_VERSION, len(testrun.tests)))
+        for key in SECTIONS:
+            f.write(_SECTION.pack(*sections[key]))
+
+    shutil.move(tmp, filename)
+
+
+class _BlobString(results.LazyString):
+    """A string in the blob of a mapped file, decoded when it is used."""
+    __slots__ = ['map', 'start', 'end']
+
+    def __init__(self, map_, start, end):
+        self.map = map_
+        self.start = start
+        self.end = end
+
+    def resolve(self):
+        return self.map[self.start:self.end].decode('utf-8')
+
+
+class _Tests(collections.Mapping):
+    """A read only mapping of test names to results.TestResult.
+
+    TestResult instances are created from the columns the first time they
+    are looked up.
+    """
+
+    def __init__(self, map_, count, names, columns, blob_start):
+        self._map = map_
+        self._names = names
+        self._columns = columns
+        self._index = dict(zip(names[:count], six.moves.range(count)))
+        self._subtests = _offsets(columns['subtest_count'])
+        self._blob = [blob_start + o for o in _offsets(
+            columns['out'], columns['err'], columns['dmesg'],
+            columns['fields'])]
+        self._subtest_rows_ = None
+        self._cache = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        index = self._index[name]
+        columns = self._columns
+
+        # pylint: disable=assigning-non-slot
+        test = results.TestResult(status.ALL[columns['result'][index]])
+        test.time = results.TimeAttribute(columns['start'][index],
+                                          columns['end'][index])
+        returncode = columns['returncode'][index]
+        if returncode != RETURNCODE_NONE:
+            test.returncode = returncode
+
+        for i in six.moves.range(self._subtests[index],
+                                 self._subtests[index + 1]):
+            test.subtests[self._names[columns['subtest_name'][i]]] = \
+                status.ALL[columns['subtest_result'][i]]
+
+        start = self._blob[index]
+        ends = []
+        for key in ['out', 'err', 'dmesg', 'fields']:
+            ends.append(start + columns[key][index])
+            start = ends[-1]
+        test.out = _BlobString(self._map, self._blob[index], ends[0])
+        test.err = _BlobString(self._map, ends[0], ends[1])
+        test.dmesg = self._map[ends[1]:ends[2]].decode('utf-8')
+        for key, value in six.iteritems(json.loads(
+                self._map[ends[2]:ends[3]].decode('utf-8'))):
+            setattr(test, key, value)
+
+        self._cache[name] = test
+        return test
+
+    def __iter__(self):
+        return iter(self._names[:len(self._index)])
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def _subtest_rows(self):
+        """Return a dict of full subtest names to their index in the columns."""
+        if self._subtest_rows_ is None:
+            self._subtest_rows_ = {}
+            names = self._columns['subtest_name']
+            for index, name in enumerate(self._names[:len(self._index)]):
+                for i in six.moves.range(self._subtests[index],
+                                         self._subtests[index + 1]):
+                    self._subtest_rows_[
+                        grouptools.join(name, self._names[names[i]])] = i
+        return self._subtest_rows_
+
+    def get_result(self, key):
+        """Return the result of a test or subtest, without creating a
+        TestResult. See TestrunResult.get_result.
+        """
+        index = self._index.get(key)
+        if index is not None:
+            return status.ALL[self._columns['result'][index]]
+
+        rows = self._subtest_rows()
+        row = rows.get(key)
+        if row is None:
+            # Subtest names are stored in lower case
+            name, subtest = grouptools.splitname(key)
+            row = rows.get(grouptools.join(name, subtest.lower()))
+            if row is None:
+                raise KeyError(key)
+        return status.ALL[self._columns['subtest_result'][row]]
+
+    def iterresults(self):
+        """Yield (name, status) for each test, see TestrunResult."""
+        names = self._names
+        results_ = self._columns['result']
+        subtest_names = self._columns['subtest_name']
+        subtest_results = self._columns['subtest_result']
+        for index, name in enumerate(names[:len(self._index)]):
+            start, end = self._subtests[index], self._subtests[index + 1]
+            if start == end:
+                yield name, status.ALL[results_[index]]
+                continue
+            for i in six.moves.range(start, end):
+                yield (grouptools.join(name, names[subtest_names[i]]),
+                       status.ALL[subtest_results[i]])
+
+
+class _Totals(collections.Mapping):
+    """A read only mapping of group names to results.Totals.
+
+    Totals instances are created from the totals column the first time they
+    are looked up.
+    """
+
+    def __init__(self, groups, counts):
+        self._groups = groups
+        self._index = {g: i for i, g in enumerate(groups)}
+        self._counts = counts
+        self._cache = {}
+
+    def __getitem__(self, group):
+        try:
+            return self._cache[group]
+        except KeyError:
+            pass
+        start = self._index[group] * len(status.ALL)
+        totals = results.Totals(zip(
+            (six.text_type(s) for s in status.ALL),
+            self._counts[start:start + len(status.ALL)]))
+        self._cache[group] = totals
+        return totals
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+
+class ColumnarResult(results.TestrunResult):
+    """A results.TestrunResult read from a columnar results file.
+
+    The tests attribute is a read only mapping, which creates TestResults as
+    they are used, and get_result is answered from the columns.
+
+    Arguments:
+    filename -- the path of a columnar results file
+    """
+
+    def __init__(self, filename):
+        super(ColumnarResult, self).__init__()
+
+        try:
+            with open(filename, 'rb') as f:
+                map_ = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = _HEADER.unpack_from(map_)
+        except (ValueError, struct.error) as e:
+            raise exceptions.PiglitFatalError(
+                'While loading columnar results file: "{}",\n'
+                'the following error occurred:\n{}'.format(
+                    filename, six.text_type(e)))
+        if magic != MAGIC:
+            raise exceptions.PiglitFatalError(
+                '"{}" is not a columnar results file'.format(filename))
+        if version != CURRENT_VERSION:
+            raise exceptions.PiglitFatalError(
+                'Unsupported columnar results version "{}", '
+                'the supported version is "{}"'.format(
+                    version, CURRENT_VERSION))
+
+        sections = {}
+        for i, key in enumerate(SECTIONS):
+            start, length = _SECTION.unpack_from(
+                map_, _HEADER.size + _SECTION.size * i)
+            sections[key] = (start, start + length)
+
+        def read(key):
+            start, end = sections[key]
+            return map_[start:end]
+
+        metadata = json.loads(read('metadata').decode('utf-8'))
+        for name in ['name', 'uname', 'options', 'glxinfo', 'wglinfo',
+                     'lspci', 'results_version', 'clinfo']:
+            value = metadata.get(name)
+            if value:
+                setattr(self, name, value)
+        self.time_elapsed = results.TimeAttribute.from_dict(
+            metadata['time_elapsed'])
+
+        columns = {k: _frombytes(t, read(k))
+                   for k, t in six.iteritems(_COLUMNS)}
+        self.totals = _Totals(json.loads(read('groups').decode('utf-8')),
+                              columns['totals'])
+        self.tests = _Tests(map_, count,
+                            json.loads(read('names').decode('utf-8')),
+                            columns, sections['blob'][0])
+
+    def get_result(self, key):
+        return self.tests.get_result(key)
+
+    def iterresults(self):
+        return self.tests.iterresults()
+
+
+class ColumnarBackend(json_backend.JSONBackend):
+    """Backend writing the columnar format.
+
+    While running this writes the same json files as the JSON backend,
+    finalize combines them into a single results.columnar.
+    """
+    _incremental = False
+
+    def finalize(self, metadata=None):
+        with open(os.path.join(self._dest, 'metadata.json'), 'r') as f:
+            data = json.load(f)
+        if metadata:
+            data.update(metadata)
+
+        data['tests'] = collections.OrderedDict()
+        for test in read_tests(self._dest):
+            try:
+                data['tests'].update(json.loads(test))
+            except ValueError:
+                pass
+        assert data['tests']
+
+        write_results(results.TestrunResult.from_dict(data),
+                      os.path.join(self._dest, 'results.columnar'))
+
+        os.unlink(os.path.join(self._dest, 'metadata.json'))
+        shutil.rmtree(os.path.join(self._dest, 'tests'))
+
+
+def load_results(filename, compression_):  # pylint: disable=unused-argument
+    """Load a columnar result, or an unfinished run of the columnar backend.
+
+    Arguments:
+    filename     -- a results.columnar file, or a directory containing one
+    compression_ -- ignored, the columnar format isn't compressed
+    """
+    if os.path.isdir(filename):
+        if os.path.exists(os.path.join(filename, 'results.columnar')):
+            filename = os.path.join(filename, 'results.columnar')
+        elif os.path.exists(os.path.join(filename, 'metadata.json')):
+            return json_backend._resume(filename)  # pylint: disable=protected-access
+        else:
+            raise exceptions.PiglitFatalError(
+                'No results found in "{}"'.format(filename))
+
+    return ColumnarResult(filename)
+
+
+REGISTRY = Registry(
+    extensions=['.columnar'],
+    backend=ColumnarBackend,
+    load=load_results,
+    meta=json_backend.set_meta,
+)
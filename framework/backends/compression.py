@@ -23,9 +23,10 @@
 This includes both compression and decompression support.
 
 This provides a low level interface of dictionaries, COMPRESSORS and
-DECOMPRESSORS, which use compression modes ('bz2', 'gz', 'xz', 'none') to
-provide open-like functions with correct mode settings for writing or reading,
-respectively.
+DECOMPRESSORS, which use compression modes ('bz2', 'gz', 'xz', 'zstd', 'lz4',
+'none') to provide open-like functions with correct mode settings for writing
+or reading, respectively. The mode of an existing file can be found from its
+contents with detect_mode().
 
 They should always take unicode (str in python 3.x) objects. It is up to the
 caller to ensure that they're passing unicode and not bytes.
@@ -35,15 +36,24 @@ the PIGLIT_COMPRESSION environment variable, then the piglit.conf
 [core]:compression key, and finally the value of compression.DEFAULT). This is
 the best way to get a compressor.
 
+For large files BLOCK_COMPRESSORS provides functions that compress a block of
+bytes into a complete stream of their mode. Streams concatenated together are
+read by the DECOMPRESSORS as a single file, which write_parallel uses to
+compress blocks of a file on several cores at once.
+
 """
 
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import bz2
+import collections
 import errno
 import functools
 import gzip
+import io
+import multiprocessing
+import multiprocessing.dummy
 import os
 import subprocess
 import contextlib
@@ -56,9 +66,13 @@ from framework.core import PIGLIT_CONFIG
 
 __all__ = [
     'UnsupportedCompressor',
+    'BLOCK_COMPRESSORS',
     'COMPRESSORS',
     'DECOMPRESSORS',
+    'detect_mode',
     'get_mode',
+    'get_threads',
+    'write_parallel',
 ]
 
 
@@ -75,6 +89,17 @@ class UnsupportedCompressor(exceptions.PiglitInternalError):
 
 DEFAULT = 'bz2'
 
+# The amount of text write_parallel compresses as one block.
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _compress_gz(data):
+    """Compress bytes into a single gzip member."""
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        f.write(data)
+    return out.getvalue()
+
 if six.PY2:
     COMPRESSION_SUFFIXES = ['.gz', '.bz2']
     COMPRESSORS = {
@@ -89,6 +114,12 @@ if six.PY2:
         'none': functools.partial(open, mode='r'),
     }
 
+    # BZ2File in python 2 stops reading at the end of the first stream, so bz2
+    # can't be compressed in blocks.
+    BLOCK_COMPRESSORS = {
+        'gz': _compress_gz,
+    }
+
     # First try to use backports.lzma, that's the easiest solution. If that
     # fails then go to trying the shell. If that fails then piglit won't have
     # xz support, and will raise an error if xz is used
@@ -97,6 +128,7 @@ if six.PY2:
 
         COMPRESSORS['xz'] = functools.partial(backports.lzma.open, mode='w')
         DECOMPRESSORS['xz'] = functools.partial(backports.lzma.open, mode='r')
+        BLOCK_COMPRESSORS['xz'] = backports.lzma.compress
         COMPRESSION_SUFFIXES += ['.xz']
     except ImportError:
         try:
@@ -196,6 +228,140 @@ else:
         'xz': functools.partial(lzma.open, mode='rt'),
     }
 
+    BLOCK_COMPRESSORS = {
+        'bz2': bz2.compress,
+        'gz': _compress_gz,
+        'xz': lzma.compress,
+    }
+
+
+def _text(stream):
+    """Wrap a binary stream to read or write text in python 3.
+
+    The python 2 compressors all take and return bytes, so the stream is
+    returned as is there.
+
+    """
+    if six.PY2:
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def _has_binary(name):
+    """Return True if an executable called name is in the PATH."""
+    for dir_ in os.environ.get('PATH', '').split(os.pathsep):
+        for ext in ['', '.exe']:
+            if os.access(os.path.join(dir_, name + ext), os.X_OK):
+                return True
+    return False
+
+
+@contextlib.contextmanager
+def _pipe(filename, command, compress):
+    """Emulates an open function by piping through a command.
+
+    This is used for compression modes that python has no module for, by
+    calling out to the command line tool of the mode, which must read from
+    stdin and write to stdout.
+
+    Arguments:
+    filename -- the file to read or write
+    command  -- the command to pipe through
+    compress -- True to write, False to read
+    """
+    try:
+        if compress:
+            with open(filename, 'wb') as f:
+                proc = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                        stdout=f)
+            stream = proc.stdin
+        else:
+            with open(filename, 'rb') as f:
+                proc = subprocess.Popen(command, stdin=f,
+                                        stdout=subprocess.PIPE)
+            stream = proc.stdout
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            raise exceptions.PiglitFatalError(
+                'No {} binary available'.format(command[0]))
+        raise
+
+    stream = _text(stream)
+    try:
+        yield stream
+    finally:
+        stream.close()
+        returncode = proc.wait()
+
+    if compress and returncode != 0:
+        raise exceptions.PiglitFatalError(
+            '{} exited with status {}'.format(command[0], returncode))
+
+
+# zstd and lz4 are not part of the standard library. Their python modules are
+# used if they're installed, otherwise their command line tools are used if
+# they're in the PATH, and otherwise the modes are not available.
+# zstd compresses with a thread per core either way.
+try:
+    if six.PY2:
+        raise ImportError
+    import zstandard  # pylint: disable=wrong-import-position,import-error
+
+    COMPRESSORS['zstd'] = functools.partial(
+        zstandard.open, mode='wt', cctx=zstandard.ZstdCompressor(threads=-1))
+    DECOMPRESSORS['zstd'] = functools.partial(zstandard.open, mode='rt')
+    COMPRESSION_SUFFIXES += ['.zstd']
+except ImportError:
+    if _has_binary('zstd'):
+        COMPRESSORS['zstd'] = functools.partial(
+            _pipe, command=['zstd', '-q', '-T0', '-c'], compress=True)
+        DECOMPRESSORS['zstd'] = functools.partial(
+            _pipe, command=['zstd', '-q', '-d', '-c'], compress=False)
+        COMPRESSION_SUFFIXES += ['.zstd']
+
+try:
+    if six.PY2:
+        raise ImportError
+    import lz4.frame  # pylint: disable=wrong-import-position,import-error
+
+    COMPRESSORS['lz4'] = functools.partial(lz4.frame.open, mode='wt')
+    DECOMPRESSORS['lz4'] = functools.partial(lz4.frame.open, mode='rt')
+    COMPRESSION_SUFFIXES += ['.lz4']
+except ImportError:
+    if _has_binary('lz4'):
+        COMPRESSORS['lz4'] = functools.partial(
+            _pipe, command=['lz4', '-q', '-c'], compress=True)
+        DECOMPRESSORS['lz4'] = functools.partial(
+            _pipe, command=['lz4', '-q', '-d', '-c'], compress=False)
+        COMPRESSION_SUFFIXES += ['.lz4']
+
+# The bytes each compression mode's files start with.
+MAGIC = [
+    (b'BZh', 'bz2'),
+    (b'\x1f\x8b', 'gz'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'\x04\x22\x4d\x18', 'lz4'),
+]
+
+
+def detect_mode(filename):
+    """Return the compression mode of a file from its first bytes.
+
+    Files that don't start with the magic bytes of any mode are assumed to be
+    uncompressed, and 'none' is returned. The mode returned may not be
+    supported, if the module or tool it needs isn't available.
+
+    Arguments:
+    filename -- the file to check
+    """
+    with open(filename, 'rb') as f:
+        start = f.read(max(len(m) for m, _ in MAGIC))
+    for magic, mode in MAGIC:
+        if start.startswith(magic):
+            return mode
+    return 'none'
+
 
 def get_mode():
     """Return the key value of the correct compressor to use.
@@ -220,3 +386,121 @@ def get_mode():
         raise UnsupportedCompressor(method)
 
     return method
+
+
+def get_threads():
+    """Return the number of threads to compress with.
+
+    This is the piglit.conf [core]:compression threads key if it is set,
+    otherwise the number of CPUs.
+
+    """
+    threads = PIGLIT_CONFIG.safe_get('core', 'compression threads')
+    if threads:
+        return int(threads)
+    return multiprocessing.cpu_count()
+
+
+class _BlockWriter(io.RawIOBase):
+    """A binary stream that compresses each write in a thread pool.
+
+    Each write is compressed by the pool as a block of its own, while the
+    caller carries on producing the next. Compressed blocks are written to the
+    file in order, with at most twice as many blocks as threads in flight.
+    This is meant to be wrapped in an io.BufferedWriter, which turns the many
+    small writes of an encoder into writes of a whole block.
+
+    Arguments:
+    file_    -- a file object opened for writing bytes
+    compress -- a function from BLOCK_COMPRESSORS
+    threads  -- the number of threads to compress with
+    """
+
+    def __init__(self, file_, compress, threads):
+        io.RawIOBase.__init__(self)
+        self._file = file_
+        self._compress = compress
+        self._threads = threads
+        self._pool = multiprocessing.dummy.Pool(threads)
+        self._pending = collections.deque()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self._pool is not None:
+            self._pending.append(self._pool.apply_async(
+                self._compress, (memoryview(b).tobytes(), )))
+            while self._pending and (
+                    len(self._pending) > self._threads * 2 or
+                    self._pending[0].ready()):
+                self._file.write(self._pending.popleft().get())
+        return len(b)
+
+    def close(self):
+        """Write the remaining blocks, and stop the pool."""
+        if self._pool is not None and not self.closed:
+            while self._pending:
+                self._file.write(self._pending.popleft().get())
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        io.RawIOBase.close(self)
+
+    def terminate(self):
+        """Stop the pool, discarding anything that hasn't been written."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+class _BytesWriter(object):
+    """Wraps a binary stream to take both str and unicode in python 2."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        if isinstance(text, six.text_type):
+            text = text.encode('utf-8')
+        self._stream.write(text)
+
+    def close(self):
+        self._stream.close()
+
+
+@contextlib.contextmanager
+def write_parallel(mode, filename, threads=None):
+    """Emulates an open function in write mode, compressing on many cores.
+
+    The file is compressed in blocks of BLOCK_SIZE, each of which is a
+    complete stream of mode, using a thread per core. This is only supported
+    for modes in BLOCK_COMPRESSORS, and only when there is more than one
+    thread, otherwise this is the same as COMPRESSORS[mode].
+
+    Arguments:
+    mode     -- the compression mode
+    filename -- the file to write
+
+    Keyword Arguments:
+    threads -- the number of threads to compress with. Default: get_threads()
+    """
+    threads = threads or get_threads()
+    if mode not in BLOCK_COMPRESSORS or threads < 2:
+        with COMPRESSORS[mode](filename) as f:
+            yield f
+        return
+
+    with open(filename, 'wb') as f:
+        raw = _BlockWriter(f, BLOCK_COMPRESSORS[mode], threads)
+        stream = io.BufferedWriter(raw, BLOCK_SIZE)
+        if six.PY2:
+            writer = _BytesWriter(stream)
+        else:
+            writer = io.TextIOWrapper(stream, encoding='utf-8')
+        try:
+            yield writer
+            writer.close()
+        finally:
+            raw.terminate()
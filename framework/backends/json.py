@@ -24,11 +24,17 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import collections
+import contextlib
+import errno
 import functools
+import gc
+import itertools
+import multiprocessing.util
 import os
 import posixpath
 import shutil
 import sys
+import threading
 
 try:
     import simplejson as json
@@ -43,13 +49,15 @@ except ImportError:
     _STREAMS = False
 
 from framework import status, results, exceptions, compat
-from .abstract import FileBackend, write_compressed
+from .abstract import (FileBackend, TestFollower, compressed_name,
+                       read_index, read_tests, write_compressed)
 from .register import Registry
 from . import compression
 
 __all__ = [
     'REGISTRY',
     'JSONBackend',
+    'load_resume',
 ]
 
 # The current version of the JSON results
@@ -61,6 +69,14 @@ MINIMUM_SUPPORTED_VERSION = 7
 # The level to indent a final file
 INDENT = 4
 
+# The fields of a test which are not decoded until they are used. These must
+# all be the same length.
+_LAZY_FIELDS = ('out', 'err')
+
+# The file results.json is written to while the tests are running, see
+# _IncrementalWriter
+_PARTIAL = 'partial-results.tmp'
+
 
 def piglit_encoder(obj):
     """ Encoder for piglit that can transform additional classes into json
@@ -70,6 +86,8 @@ def piglit_encoder(obj):
     """
     if isinstance(obj, status.Status):
         return six.text_type(obj)
+    elif isinstance(obj, results.LazyString):
+        return obj.resolve()
     elif isinstance(obj, set):
         return list(obj)
     elif hasattr(obj, 'to_json'):
@@ -77,6 +95,195 @@ def piglit_encoder(obj):
     return obj
 
 
+def _dump(obj, f):
+    """Write obj to f as indented json.
+
+    This is json.dump, except that the many small pieces of the encoding are
+    joined before they are written, as writes to a compressed file are
+    expensive.
+
+    """
+    chunks = json.JSONEncoder(default=piglit_encoder,
+                              indent=INDENT).iterencode(obj)
+    while True:
+        chunk = ''.join(itertools.islice(chunks, 4096))
+        if not chunk:
+            break
+        f.write(chunk)
+
+
+def _remove(path):
+    """Remove the file at path, if it exists."""
+    try:
+        os.unlink(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+class _IncrementalWriter(object):
+    """Writes the final results file while the tests are running.
+
+    A thread follows the tests written by the backend, appending each test
+    that has finished to a compressed temporary file and counting its result
+    into the totals. Tests are appended in the order they were started,
+    holding back up to WINDOW finished tests while an earlier one is still
+    running, once that many are held they are appended out of order. This
+    leaves finish with only the last tests, the totals and the time elapsed
+    to write.
+
+    Arguments:
+    dest     -- the directory the backend is writing to
+    metadata -- the metadata of the run
+    follower -- a TestFollower for the tests of the backend
+    start    -- the id of the first test
+    """
+    INTERVAL = 1.0
+    WINDOW = 256
+
+    def __init__(self, dest, metadata, follower, start):
+        self._follower = follower
+        self._mode, self._filename = compressed_name(
+            os.path.join(dest, 'results.json'))
+        self._tmp = os.path.join(dest, _PARTIAL)
+        # Left behind if the last run in dest was aborted
+        _remove(self._tmp)
+        self._next = start
+        self._held = {}
+        self._counter = results.TotalsCounter()
+        self._context = None
+        self._stream = None
+        self._first = True
+        self._error = None
+
+        run = results.TestrunResult.from_dict(
+            dict(metadata, tests={}, totals={}))
+        header = run.to_json()
+        for key in ['tests', 'totals', 'time_elapsed']:
+            del header[key]
+        self._header = '{{\n{}"tests": {{\n'.format(''.join(
+            '{}: {},\n'.format(json.dumps(k), self._encode(v))
+            for k, v in six.iteritems(header)))
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        multiprocessing.util.register_after_fork(
+            self, _IncrementalWriter._forked)
+
+    def _forked(self):
+        # Worker processes must never write to the file of the parent.
+        self._context = None
+        self._stream = None
+
+    @staticmethod
+    def _encode(obj):
+        return json.dumps(obj, default=piglit_encoder, indent=INDENT)
+
+    def _write(self, text):
+        if self._stream is None:
+            self._context = compression.write_parallel(self._mode, self._tmp)
+            self._stream = self._context.__enter__()
+            self._stream.write(self._header)
+        if not self._first:
+            self._stream.write(',\n')
+        self._first = False
+        # Each test is written as an object with a single key, so the key and
+        # value can be copied as is.
+        self._stream.write(text.strip()[1:-1])
+
+    def _add(self, found, final):
+        """Count and hold the tests in found that have finished.
+
+        If final is True all tests are treated as finished.
+        """
+        for id_, text in found:
+            # A file that is being written may not be valid yet, if it still
+            # isn't when finishing the test is left out, like _write_results.
+            try:
+                data = json.loads(text)
+            except ValueError:
+                if final:
+                    self._follower.done(id_)
+                continue
+            if not final and any(t['result'] == 'incomplete'
+                                 for t in six.itervalues(data)):
+                continue
+            for name, test in six.iteritems(data):
+                subtests = test.get('subtests')
+                if subtests:
+                    subtests.pop('__type__', None)
+                self._counter.add(name, test['result'], subtests)
+            self._held[id_] = text
+            self._follower.done(id_)
+
+        while self._follower.is_done(self._next):
+            text = self._held.pop(self._next, None)
+            if text is not None:
+                self._write(text)
+            self._next += 1
+
+        if final or len(self._held) >= self.WINDOW:
+            for id_ in sorted(self._held):
+                self._write(self._held[id_])
+            self._held.clear()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.INTERVAL):
+                self._add(self._follower.poll(), False)
+        except Exception as e:  # pylint: disable=broad-except
+            self._error = e
+
+    def _discard(self):
+        if self._context is not None:
+            self._context.__exit__(None, None, None)
+            self._context = None
+            self._stream = None
+        _remove(self._tmp)
+
+    def abort(self):
+        """Stop writing, and remove the partially written file."""
+        self._stop.set()
+        self._thread.join()
+        self._discard()
+
+    def finish(self, metadata):
+        """Write the remaining tests and close the file.
+
+        Returns False if the file couldn't be written, in which case the
+        results must be written another way.
+
+        Arguments:
+        metadata -- the metadata passed to finalize. Only time_elapsed is
+                    written.
+        """
+        self._stop.set()
+        self._thread.join()
+        if self._error is not None:
+            self._discard()
+            return False
+
+        self._add(self._follower.drain(), True)
+        if self._stream is None:
+            return False
+
+        time_elapsed = results.TimeAttribute()
+        if metadata and 'time_elapsed' in metadata:
+            time_elapsed = results.TimeAttribute.from_dict(
+                metadata['time_elapsed'])
+        # There is a totals entry for every group, which is too many to
+        # indent in pure python.
+        self._stream.write(
+            '\n}},\n"totals": {},\n"time_elapsed": {}\n}}\n'.format(
+                json.dumps(self._counter.totals()),
+                self._encode(time_elapsed)))
+        self._context.__exit__(None, None, None)
+        os.rename(self._tmp, self._filename)
+        return True
+
+
 class JSONBackend(FileBackend):
     """ Piglit's native JSON backend
 
@@ -92,6 +299,10 @@ class JSONBackend(FileBackend):
     """
     _file_extension = 'json'
 
+    # Write results.json while the tests are running, see _IncrementalWriter
+    _incremental = True
+    _writer = None
+
     def initialize(self, metadata):
         """ Write boilerplate json code
 
@@ -118,17 +329,40 @@ class JSONBackend(FileBackend):
         except OSError:
             pass
 
+        if self._incremental:
+            self._writer = _IncrementalWriter(
+                self._dest, metadata,
+                TestFollower(self._dest, self._file_extension,
+                             self._journal is not None, self._start_count),
+                self._start_count)
+
     def finalize(self, metadata=None):
         """ End json serialization and cleanup
 
         This method is called after all of tests are written, it closes any
-        containers that are still open and closes the file
+        containers that are still open and closes the file. If the results
+        file was written while the tests ran only the last tests and the
+        totals are left to write.
 
         """
-        tests_dir = os.path.join(self._dest, 'tests')
-        file_list = sorted(os.listdir(tests_dir),
-                           key=lambda p: int(os.path.splitext(p)[0]))
+        if self._writer is None:
+            # A resumed run, which may have been aborted while writing
+            _remove(os.path.join(self._dest, _PARTIAL))
+        if self._writer is None or not self._writer.finish(metadata):
+            self._write_results(metadata)
 
+        # Delete the temporary files
+        os.unlink(os.path.join(self._dest, 'metadata.json'))
+        shutil.rmtree(os.path.join(self._dest, 'tests'))
+
+    def abort(self):
+        """Stop writing results.json while tests run, and remove it."""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+    def _write_results(self, metadata):
+        """Write the results file from the files of the tests."""
         # If jsonstreams is not present then build a complete tree of all of
         # the data and write it with json.dump
         if not _STREAMS:
@@ -147,18 +381,15 @@ class JSONBackend(FileBackend):
             # Add the tests to the dictionary
             data['tests'] = collections.OrderedDict()
 
-            for test in file_list:
-                test = os.path.join(tests_dir, test)
-                if os.path.isfile(test):
-                    # Try to open the json snippets. If we fail to open a test
-                    # then throw the whole thing out. This gives us atomic
-                    # writes, the writing worked and is valid or it didn't
-                    # work.
-                    try:
-                        with open(test, 'r') as f:
-                            data['tests'].update(json.load(f))
-                    except ValueError:
-                        pass
+            for test in read_tests(self._dest):
+                # Try to load the json snippets. If we fail to load a test
+                # then throw the whole thing out. This gives us atomic
+                # writes, the writing worked and is valid or it didn't
+                # work.
+                try:
+                    data['tests'].update(json.loads(test))
+                except ValueError:
+                    pass
             assert data['tests']
 
             data = results.TestrunResult.from_dict(data)
@@ -166,7 +397,7 @@ class JSONBackend(FileBackend):
             # write out the combined file. Use the compression writer from the
             # FileBackend
             with self._write_final(os.path.join(self._dest, 'results.json')) as f:
-                json.dump(data, f, default=piglit_encoder, indent=INDENT)
+                _dump(data, f)
 
         # Otherwise use jsonstreams to write the final dictionary. This uses an
         # external library, but is slightly faster and uses considerably less
@@ -185,22 +416,26 @@ class JSONBackend(FileBackend):
                     if metadata:
                         s.iterwrite(six.iteritems(metadata))
 
+                    # Count the totals while the tests are written, so that
+                    # they are stored in the file rather than calculated each
+                    # time it is loaded.
+                    counter = results.TotalsCounter()
                     with s.subobject('tests') as t:
-                        for test in file_list:
-                            test = os.path.join(tests_dir, test)
-                            if os.path.isfile(test):
-                                try:
-                                    with open(test, 'r') as f:
-                                        a = json.load(f)
-                                except ValueError:
-                                    continue
-
-                                t.iterwrite(six.iteritems(a))
-
-
-        # Delete the temporary files
-        os.unlink(os.path.join(self._dest, 'metadata.json'))
-        shutil.rmtree(os.path.join(self._dest, 'tests'))
+                        for test in read_tests(self._dest):
+                            try:
+                                a = json.loads(test)
+                            except ValueError:
+                                continue
+
+                            for name, value in six.iteritems(a):
+                                subtests = value.get('subtests')
+                                if subtests:
+                                    subtests = dict(subtests)
+                                    subtests.pop('__type__', None)
+                                counter.add(name, value['result'], subtests)
+                            t.iterwrite(six.iteritems(a))
+
+                    s.write('totals', counter.totals())
 
     @staticmethod
     def _write(f, name, data):
@@ -240,13 +475,40 @@ def load_results(filename, compression_):
                 'No results found in "{}" (compression: {})'.format(
                     filename, compression_))
 
+    # The suffix may not match the contents, for example if the file was
+    # renamed, or recompressed by hand, so check the contents of files.
+    if os.path.isfile(filepath):
+        compression_ = compression.detect_mode(filepath)
+        if compression_ not in compression.DECOMPRESSORS:
+            raise exceptions.PiglitFatalError(
+                '"{}" is compressed with {}, which is not available'.format(
+                    filepath, compression_))
+
     assert compression_ in compression.COMPRESSORS, \
         'unsupported compression type'
 
-    with compression.DECOMPRESSORS[compression_](filepath) as f:
-        testrun = _load(f)
+    with _gc_paused():
+        with compression.DECOMPRESSORS[compression_](filepath) as f:
+            testrun = _load(f)
+
+        return results.TestrunResult.from_dict(
+            _update_results(testrun, filepath))
+
 
-    return results.TestrunResult.from_dict(_update_results(testrun, filepath))
+@contextlib.contextmanager
+def _gc_paused():
+    """Disable the cyclic garbage collector while loading results.
+
+    Loading creates millions of objects, none of which are garbage, but each
+    allocation counts towards triggering a collection that walks all of them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 def set_meta(results):
@@ -254,6 +516,107 @@ def set_meta(results):
     results.results_version = CURRENT_JSON_VERSION
 
 
+class _JSONString(results.LazyString):
+    """A json string literal in a results file, decoded when it is used.
+
+    Only the literal itself is kept, not the text of the whole file, so the
+    file can be freed once it has been parsed.
+    """
+    __slots__ = ['literal']
+
+    def __init__(self, literal):
+        self.literal = literal
+
+    def resolve(self):
+        return json.loads(self.literal)
+
+
+def _string_end(text, idx):
+    """Return the index after the json string literal starting at text[idx].
+
+    Returns -1 if the string is not terminated.
+    """
+    # Under python 2 text is bytes, searching it for unicode would decode it
+    quote = str('"')
+    backslash = str('\\')
+
+    idx += 1
+    while True:
+        idx = text.find(quote, idx)
+        if idx == -1:
+            return -1
+
+        # A quote preceded by an odd number of backslashes is escaped
+        back = idx - 1
+        while text[back] == backslash:
+            back -= 1
+        if (idx - back) % 2:
+            return idx + 1
+        idx += 1
+
+
+def _find_lazy_fields(text):
+    """Yield the (start, end) of each out and err string literal in text.
+
+    Only the formatting written by the json module is found, which is enough,
+    anything missed is decoded along with the rest of the document.
+    """
+    needles = [str('"{}": "'.format(f)) for f in _LAZY_FIELDS]
+    idx = 0
+    while True:
+        found = [i for i in (text.find(n, idx) for n in needles) if i != -1]
+        if not found:
+            return
+        start = min(found) + len(needles[0]) - 1
+        idx = _string_end(text, start)
+        if idx == -1:
+            return
+        yield start, idx
+
+
+def _parse(text):
+    """Parse the text of a results file.
+
+    This is equivalent to json.loads with an OrderedDict object_pairs_hook,
+    except that the out and err of each test are _JSONString instances, which
+    are only decoded if they are used. Those are most of the size of a results
+    file, and most consumers of results never look at them.
+
+    Before decoding, each out and err string literal is replaced with its
+    index in a list of their positions in text. If any of those turn out not
+    to belong to a test (a subtest named "out", for example) the text is
+    decoded again without replacing anything.
+    """
+    pieces = []
+    spans = []
+    last = 0
+    for start, end in _find_lazy_fields(text):
+        pieces.append(text[last:start])
+        pieces.append(str(len(spans)))
+        spans.append((start, end))
+        last = end
+    pieces.append(text[last:])
+
+    result = json.loads(text[:0].join(pieces),
+                        object_pairs_hook=collections.OrderedDict)
+    if not spans:
+        return result
+
+    used = set()
+    tests = result.get('tests') if isinstance(result, dict) else None
+    for test in six.itervalues(tests or {}):
+        for key in _LAZY_FIELDS:
+            value = test.get(key)
+            if type(value) is int and value not in used:  # pylint: disable=unidiomatic-typecheck
+                used.add(value)
+                start, end = spans[value]
+                test[key] = _JSONString(text[start:end])
+
+    if len(used) != len(spans):
+        return json.loads(text, object_pairs_hook=collections.OrderedDict)
+    return result
+
+
 def _load(results_file):
     """Load a json results instance and return a TestrunResult.
 
@@ -261,7 +624,7 @@ def _load(results_file):
 
     """
     try:
-        result = json.load(results_file, object_pairs_hook=collections.OrderedDict)
+        result = _parse(results_file.read())
     except ValueError as e:
         raise exceptions.PiglitFatalError(
             'While loading json results file: "{}",\n'
@@ -288,20 +651,42 @@ def _resume(results_dir):
     meta['tests'] = collections.OrderedDict()
 
     # Load all of the test names and added them to the test list
-    tests_dir = os.path.join(results_dir, 'tests')
-    file_list = sorted(os.listdir(tests_dir),
-                       key=lambda p: int(os.path.splitext(p)[0]))
-
-    for file_ in file_list:
-        with open(os.path.join(tests_dir, file_), 'r') as f:
-            try:
-                meta['tests'].update(json.load(f))
-            except ValueError:
-                continue
+    for test in read_tests(results_dir):
+        try:
+            meta['tests'].update(json.loads(test))
+        except ValueError:
+            continue
 
     return results.TestrunResult.from_dict(meta)
 
 
+def load_resume(results_dir):
+    """Load what is needed to resume a partially completed run.
+
+    Unlike _resume this reads only the metadata and the index of the run, not
+    the results of the tests. Returns a tuple of a TestrunResult with the
+    metadata and no tests, a dict mapping the name of each test that was
+    started to the name of its status, and the id to give to the next test.
+    Returns None if the run has no index, for example because it was started
+    by an older version of piglit.
+
+    Arguments:
+    results_dir -- the directory the run was writing to
+    """
+    index = read_index(results_dir)
+    if index is None:
+        return None
+
+    with open(os.path.join(results_dir, 'metadata.json'), 'r') as f:
+        meta = json.load(f)
+    assert meta['results_version'] == CURRENT_JSON_VERSION, \
+        "Old results version, resume impossible"
+
+    meta['tests'] = {}
+    meta['totals'] = {}
+    return (results.TestrunResult.from_dict(meta),) + index
+
+
 def _update_results(results, filepath):
     """ Update results to the lastest version
 
@@ -356,7 +741,7 @@ def _update_results(results, filepath):
 def _write(results, file_):
     """WRite the values of the results out to a file."""
     with write_compressed(file_) as f:
-        json.dump(results, f, default=piglit_encoder, indent=INDENT)
+        _dump(results, f)
 
 
 def _update_seven_to_eight(result):
@@ -38,7 +38,7 @@ import six
 
 from framework import grouptools, results, exceptions
 from framework.core import PIGLIT_CONFIG
-from .abstract import FileBackend
+from .abstract import FileBackend, read_tests
 from .register import Registry
 
 __all__ = [
@@ -64,23 +64,27 @@ class JUnitWriter(object):
         self._test_suffix = test_suffix
         self._expected_crashes = ecrash
         self._expected_failures = efail
+        # Most groups hold many tests, so each group is only converted into a
+        # classname once.
+        self._classnames = {}
 
-    @staticmethod
-    def _make_names(name):
+    def _make_names(self, name):
         """Takes a name from piglit (using grouptools.SEPARATOR and returns a
         split classnam, testname pair in junit format.
         """
-        classname, testname = grouptools.splitname(name)
-        classname = classname.split(grouptools.SEPARATOR)
-        classname = [junit_escape(e) for e in classname]
-        classname = '.'.join(classname)
-
-        # Add the test to the piglit group rather than directly to the root
-        # group, this allows piglit junit to be used in conjunction with other
-        # piglit
-        # TODO: It would be nice if other suites integrating with piglit could
-        # set different root names.
-        classname = 'piglit.' + classname
+        group, testname = grouptools.splitname(name)
+        classname = self._classnames.get(group)
+        if classname is None:
+            classname = group.split(grouptools.SEPARATOR)
+            classname = [junit_escape(e) for e in classname]
+            classname = '.'.join(classname)
+
+            # Add the test to the piglit group rather than directly to the
+            # root group, this allows piglit junit to be used in conjunction
+            # with other piglit
+            # TODO: It would be nice if other suites integrating with piglit
+            # could set different root names.
+            classname = self._classnames[group] = 'piglit.' + classname
 
         return (classname, junit_escape(testname))
 
@@ -318,16 +322,13 @@ class JUnitBackend(FileBackend):
         root = etree.Element('testsuites')
         piglit = etree.Element('testsuite', name='piglit')
         root.append(piglit)
-        for each in os.listdir(os.path.join(self._dest, 'tests')):
-            with open(os.path.join(self._dest, 'tests', each), 'r') as f:
-                # parse returns an element tree, and that's not what we want,
-                # we want the first (and only) Element node
-                # If the element cannot be properly parsed then consider it a
-                # failed transaction and ignore it.
-                try:
-                    piglit.append(etree.parse(f).getroot())
-                except etree.ParseError:
-                    continue
+        for each in read_tests(self._dest):
+            # If the element cannot be properly parsed then consider it a
+            # failed transaction and ignore it.
+            try:
+                piglit.append(etree.fromstring(each.encode('utf-8')))
+            except etree.ParseError:
+                continue
 
         # set the test count by counting the number of tests.
         # This must be unicode (py3 str)
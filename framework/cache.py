@@ -0,0 +1,230 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Persistent caches for work done while loading profiles.
+
+Building the larger profiles means opening and parsing tens of thousands of
+files, the results of which almost never change between runs. This module
+provides a FileIndex, which stores values derived from a file on disk along
+with the modification time and size of that file, so that only files that have
+changed since the last run need to be parsed again.
+
+Caching is disabled unless options.OPTIONS.cache_dir is set, which the piglit
+programs do (see default_dir). Modified indexes are written back to disk by
+save, which load_test_profile calls once a profile has been imported.
+
+Values computed ahead of time by FileIndex.prefetch are kept in memory even
+when caching is disabled, so that they can be computed in parallel.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import functools
+import os
+import threading
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import six
+
+from framework import core, options
+
+__all__ = [
+    'FileIndex',
+    'default_dir',
+    'save',
+]
+
+# All of the FileIndex instances that have been created, so that save can
+# write them all.
+_INDEXES = []
+
+
+def default_dir():
+    """Return the directory caches should be stored in.
+
+    Try the environment variable PIGLIT_CACHE_DIR; then the piglit.conf
+    section 'core', option 'cache dir'; finally fall back to
+    $XDG_CACHE_HOME/piglit (~/.cache/piglit if XDG_CACHE_HOME isn't set).
+    """
+    dir_ = (os.environ.get('PIGLIT_CACHE_DIR') or
+            core.PIGLIT_CONFIG.safe_get('core', 'cache dir'))
+    if dir_:
+        return dir_
+
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'piglit')
+
+
+def _call(func, filename):
+    """Call func for filename in a worker process, catching exceptions."""
+    try:
+        return True, func(filename)
+    except Exception:  # pylint: disable=broad-except
+        return False, None
+
+
+def save():
+    """Write all modified FileIndex instances to disk."""
+    for index in _INDEXES:
+        index.save()
+
+
+class FileIndex(object):
+    """A persistent mapping of file names to values derived from them.
+
+    Each entry stores the modification time and size of the file it was
+    derived from, and is only used as long as those are unchanged; this makes
+    invalidation incremental, if a handful of files change only those files are
+    parsed again.
+
+    Values must be serializable to json, and must not be modified by the
+    caller.
+
+    Arguments:
+    name    -- the name of the index, this is used as the file name
+    version -- the version of the data stored. Incrementing this when the
+               values change format discards any existing index.
+    """
+
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        _INDEXES.append(self)
+
+    @property
+    def path(self):
+        """The path of the on-disk index, or None if caching is disabled."""
+        if not options.OPTIONS.cache_dir:
+            return None
+        return os.path.join(options.OPTIONS.cache_dir,
+                            '{}.json'.format(self.name))
+
+    def _load(self):
+        """Load the on-disk index, discarding it if it isn't usable."""
+        self._entries = {}
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+        if data.get('version') == self.version:
+            self._entries = data['entries']
+
+    @staticmethod
+    def _key(filename):
+        stat = os.stat(filename)
+        return [stat.st_mtime, stat.st_size]
+
+    def get(self, filename, func):
+        """Return the value for filename, calling func to create it if needed.
+
+        Arguments:
+        filename -- the path to the file the value is derived from
+        func     -- a function which takes filename and returns the value
+        """
+        key = self._key(filename)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            entry = self._entries.get(filename)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        value = func(filename)
+        if self.path is not None:
+            self.set(filename, value, key)
+        return value
+
+    def set(self, filename, value, key=None):
+        """Store a value for filename, which has already been computed."""
+        if key is None:
+            key = self._key(filename)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self._entries[filename] = [key, value]
+            self._dirty = True
+
+    def save(self):
+        """Write the index to disk if it has been modified.
+
+        Entries for files which no longer exist are dropped. Failure to write
+        the index is not an error, it just won't be used next time.
+        """
+        with self._lock:
+            if not self._dirty or self.path is None:
+                return
+
+            entries = {k: v for k, v in six.iteritems(self._entries)
+                       if os.path.exists(k)}
+            tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+            try:
+                core.check_dir(os.path.dirname(self.path))
+                with open(tmp, 'w') as f:
+                    json.dump({'version': self.version, 'entries': entries}, f)
+                os.rename(tmp, self.path)
+            except (IOError, OSError):
+                return
+            self._dirty = False
+
+    def prefetch(self, filenames, func, pool, chunksize=64):
+        """Compute the values of any filenames that aren't in the index.
+
+        The values are computed by the workers of pool, a multiprocessing
+        pool, so func must be a module level function. If func raises an
+        exception for a file that file is skipped, calling get for it will
+        raise the exception again in this process.
+
+        Arguments:
+        filenames -- a list of paths to the files values are derived from
+        func      -- a function which takes a filename and returns the value
+        pool      -- a multiprocessing.Pool instance
+
+        Keyword Arguments:
+        chunksize -- the number of filenames sent to a worker at once. Use a
+                     small value when func is slow, like running a process.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            todo = []
+            for filename in filenames:
+                key = self._key(filename)
+                entry = self._entries.get(filename)
+                if entry is None or entry[0] != key:
+                    todo.append((filename, key))
+
+        values = pool.imap(functools.partial(_call, func),
+                           [f for f, _ in todo], chunksize=chunksize)
+        for (filename, key), (success, value) in zip(todo, values):
+            if success:
+                self.set(filename, value, key)
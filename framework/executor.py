@@ -0,0 +1,289 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Executors that run tests for framework.profile.run.
+
+An Executor has two lanes, a concurrent lane with one worker per CPU, and a
+serial lane with a single worker. The caller decides which lane a test goes
+to, the executor decides how the lanes are implemented:
+
+thread  -- Both lanes are thread pools in the piglit process. Every test
+           shares the GIL with every other test.
+process -- Both lanes are process pools. Each worker process has its own copy
+           of the backend, which it writes results into directly, and sends
+           log messages back to the LogManager over a queue.
+hybrid  -- The concurrent lane is a process pool, and the serial lane is a
+           thread in the piglit process.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import functools
+import multiprocessing
+import multiprocessing.dummy
+import threading
+import traceback
+
+from framework import exceptions, options
+from framework.log import ChannelLog
+from framework.test.base import LazyTest
+
+__all__ = [
+    'EXECUTORS',
+    'Executor',
+]
+
+EXECUTORS = ['thread', 'process', 'hybrid']
+
+# State for worker processes, this is set by _init_worker.
+_WORKER = {}
+
+
+def _execute(name, test, backend, log, options_):
+    """Run a single test and write its result into the backend."""
+    if isinstance(test, LazyTest):
+        test = test.create()
+    with backend.write_test(name) as w:
+        test.execute(name, log, options_)
+        w(test.result)
+
+
+def _init_worker(backend, options_, channel, opts):
+    """Initializer for worker processes.
+
+    Arguments:
+    backend  -- the backend to write results to.
+    options_ -- a list of TestProfile.options, one per profile
+    channel  -- a queue to send log messages over
+    opts     -- the values of options.OPTIONS, which are not inherited when
+                the platform spawns rather than forks.
+    """
+    for key, value in opts.items():
+        setattr(options.OPTIONS, key, value)
+    _WORKER['backend'] = backend
+    _WORKER['options'] = options_
+    _WORKER['channel'] = channel
+
+
+def _error(name):
+    """Return a message for the exception being handled, raised by name."""
+    return 'Running {} raised:\n{}'.format(name, traceback.format_exc())
+
+
+def _run_in_worker(index, name, test):
+    """Run a test in a worker process.
+
+    Returns a tuple of the monitoring error message if an abort is needed,
+    and the traceback of the exception if the test raised one. Each is None
+    otherwise. Exceptions aren't always picklable, so only their traceback
+    is sent back.
+    """
+    options_ = _WORKER['options'][index]
+    try:
+        _execute(name, test, _WORKER['backend'],
+                 ChannelLog(_WORKER['channel']), options_)
+    except Exception:  # pylint: disable=broad-except
+        return None, _error(name)
+
+    if options_['monitor'].abort_needed:
+        return options_['monitor'].error_message, None
+    return None, None
+
+
+class _ThreadLane(object):
+    """A lane that runs tests in threads of this process."""
+
+    def __init__(self, processes, backend, log, on_abort, on_error):
+        self._pool = multiprocessing.dummy.Pool(processes)
+        self._backend = backend
+        self._log = log
+        self._on_abort = on_abort
+        self._on_error = on_error
+
+    def _run(self, profile, name, test):
+        try:
+            _execute(name, test, self._backend, self._log.get(),
+                     profile.options)
+        except Exception:  # pylint: disable=broad-except
+            self._on_error(_error(name))
+            return
+        if profile.options['monitor'].abort_needed:
+            self._on_abort()
+
+    def submit(self, profile, _, name, test):
+        self._pool.apply_async(self._run, (profile, name, test))
+
+    def close(self):
+        self._pool.close()
+
+    def join(self):
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+
+
+class _ProcessLane(object):
+    """A lane that runs tests in worker processes."""
+
+    def __init__(self, processes, backend, profiles, channel, on_abort,
+                 on_error):
+        self._pool = multiprocessing.Pool(
+            processes, _init_worker,
+            (backend, [p.options for p in profiles], channel,
+             dict(options.OPTIONS)))
+        self._on_abort = on_abort
+        self._on_error = on_error
+
+    def _done(self, profile, result):
+        message, error = result
+        if error is not None:
+            self._on_error(error)
+        elif message is not None:
+            profile.options['monitor'].abort(message)
+            self._on_abort()
+
+    def submit(self, profile, index, name, test):
+        self._pool.apply_async(_run_in_worker, (index, name, test),
+                               callback=functools.partial(self._done, profile))
+
+    def close(self):
+        self._pool.close()
+
+    def join(self):
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+
+
+class Executor(object):
+    """Runs tests using one of the strategies in EXECUTORS.
+
+    Tests are added with submit, which returns immediately, and wait blocks
+    until all of the tests have run, or until a monitored error requires
+    stopping the run.
+
+    Arguments:
+    kind     -- one of EXECUTORS
+    backend  -- a backends.abstract.Backend instance
+    log      -- a log.LogManager instance
+    profiles -- a list of TestProfile instances, which submit refers to by
+                index.
+
+    Keyword Arguments:
+    processes -- The number of workers in the concurrent lane. Default: the
+                 number of CPUs
+    """
+
+    def __init__(self, kind, backend, log, profiles, processes=None):
+        if kind not in EXECUTORS:
+            raise exceptions.PiglitFatalError(
+                'Unknown executor "{}", valid executors are: {}'.format(
+                    kind, ', '.join(EXECUTORS)))
+
+        self.processes = processes or multiprocessing.cpu_count()
+        self._profiles = profiles
+        self._wake = threading.Event()
+        self._aborted = False
+        self._error = None
+        self._listener = None
+        self._channel = None
+
+        if kind == 'thread':
+            self._single = _ThreadLane(1, backend, log, self._abort,
+                                       self._fail)
+            self._multi = _ThreadLane(self.processes, backend, log,
+                                      self._abort, self._fail)
+            return
+
+        # Process workers need a backend that can be written to from more
+        # than one process, and a way to send their log messages back to
+        # this process.
+        backend.share()
+        self._channel = multiprocessing.Queue()
+        self._listener = log.listen(self._channel)
+
+        self._multi = _ProcessLane(self.processes, backend, profiles,
+                                   self._channel, self._abort, self._fail)
+        if kind == 'process':
+            self._single = _ProcessLane(1, backend, profiles, self._channel,
+                                        self._abort, self._fail)
+        else:
+            self._single = _ThreadLane(1, backend, log, self._abort,
+                                       self._fail)
+
+    def _abort(self):
+        self._aborted = True
+        self._wake.set()
+
+    def _fail(self, error):
+        """Stop the run because running a test raised an exception."""
+        if self._error is None:
+            self._error = error
+        self._abort()
+
+    def submit(self, concurrent, index, name, test):
+        """Add a test to be run.
+
+        Arguments:
+        concurrent -- If True the test is run in the concurrent lane,
+                      otherwise in the serial lane.
+        index      -- the index of the test's profile in profiles
+        name       -- the name of the test
+        test       -- a Test or LazyTest instance
+        """
+        lane = self._multi if concurrent else self._single
+        lane.submit(self._profiles[index], index, name, test)
+
+    def wait(self):
+        """Wait for all submitted tests to finish.
+
+        If a monitored error is detected the remaining tests are abandoned.
+        If running a test raised an exception the remaining tests are also
+        abandoned, and the exception is raised here as a PiglitInternalError.
+        """
+        lanes = [self._single, self._multi]
+        for lane in lanes:
+            lane.close()
+
+        def join():
+            for lane in lanes:
+                lane.join()
+            self._wake.set()
+
+        joiner = threading.Thread(target=join)
+        joiner.daemon = True
+        joiner.start()
+
+        self._wake.wait()
+        if self._aborted:
+            for lane in lanes:
+                lane.terminate()
+        joiner.join()
+
+        if self._channel is not None:
+            self._channel.put(None)
+            self._listener.join()
+
+        if self._error is not None:
+            raise exceptions.PiglitInternalError(self._error)
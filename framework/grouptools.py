@@ -37,6 +37,7 @@ import six
 from six.moves import zip
 
 __all__ = [
+    'GroupTrie',
     'SEPARATOR',
     'commonprefix',
     'format',
@@ -185,3 +186,129 @@ def format(name):
     """
     assert isinstance(name, six.string_types)
     return name.replace(SEPARATOR, '/')
+
+
+class _Node(object):
+    """A group, or a test, in a GroupTrie."""
+    __slots__ = ['name', 'parent', 'children', 'order', 'count']
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = {}
+        # The position the test was added at, None if this isn't a test
+        self.order = None
+        # The number of tests in this node and its children
+        self.count = 0
+
+    def iternodes(self):
+        """Yield this node and all of its descendants."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(six.itervalues(node.children))
+
+
+class GroupTrie(object):
+    """A tree of groups, with tests as leaves.
+
+    Each group is stored once as a node that holds its full name, so finding
+    the tests in a group only visits that group, and doesn't need to split or
+    join names. A name may be both a test and a group.
+
+    Tests are yielded in the order they were added.
+
+    Arguments:
+    names -- an iterable of test names to add
+    """
+
+    def __init__(self, names=()):
+        self.__root = _Node('', None)
+        self.__order = 0
+        for name in names:
+            self.add(name)
+
+    def __find(self, group):
+        """Return the node for group, or None."""
+        node = self.__root
+        for element in split(group):
+            node = node.children.get(element)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, name):
+        node = self.__find(name)
+        return node is not None and node.order is not None
+
+    def __len__(self):
+        return self.__root.count
+
+    def __iter__(self):
+        return self.iterprefix('')
+
+    def add(self, name):
+        """Add a test. Adding a test that is already present does nothing."""
+        node = self.__root
+        for element in split(name):
+            child = node.children.get(element)
+            if child is None:
+                child = node.children[element] = _Node(
+                    join(node.name, element), node)
+            node = child
+
+        if node.order is not None:
+            return
+        node.order = self.__order
+        self.__order += 1
+        while node is not None:
+            node.count += 1
+            node = node.parent
+
+    def remove(self, name):
+        """Remove a test, raising KeyError if it isn't present."""
+        node = self.__find(name)
+        if node is None or node.order is None:
+            raise KeyError(name)
+
+        node.order = None
+        while node is not None:
+            node.count -= 1
+            parent = node.parent
+            if parent is not None and not node.count:
+                del parent.children[split(node.name)[-1]]
+            node = parent
+
+    def iterprefix(self, prefixes):
+        """Yield the tests whose names start with one of prefixes.
+
+        Only the subtrees that can match are visited. A prefix does not need
+        to end at a group boundary, 'spec@gl' will yield the tests of
+        'spec@gl', 'spec@glsl-1.10', and so on.
+
+        Arguments:
+        prefixes -- a string, or a tuple of strings
+        """
+        if isinstance(prefixes, six.string_types):
+            prefixes = (prefixes, )
+
+        starts = []
+        for prefix in prefixes:
+            if not prefix:
+                starts.append(self.__root)
+                continue
+
+            elements = split(prefix)
+            node = self.__find(join('', *elements[:-1]))
+            if node is None:
+                continue
+            # When prefix ends with SEPARATOR the last element is '', which
+            # selects all of the children, but not the group itself
+            starts.extend(c for e, c in six.iteritems(node.children)
+                          if e.startswith(elements[-1]))
+
+        # Prefixes may overlap, so the same test may be found more than once
+        found = {n.order: n.name for s in starts for n in s.iternodes()
+                 if n.order is not None}
+        return (found[o] for o in sorted(found))
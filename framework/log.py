@@ -29,6 +29,7 @@ returning BaseLog derived instances to individual tests.
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import os
 import sys
 import abc
 import itertools
@@ -41,9 +42,10 @@ except ImportError:
 
 import six
 from six.moves.BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from six.moves.urllib.parse import unquote
 
 from framework.core import PIGLIT_CONFIG
-from framework import grouptools
+from framework import grouptools, results
 
 __all__ = ['LogManager']
 
@@ -267,6 +269,34 @@ class DummyLog(BaseLog):
         pass
 
 
+class ChannelLog(object):
+    """ A Logger that forwards messages to a LogManager in another process
+
+    This is used by executors that run tests in worker processes. Rather than
+    printing anything itself it puts a message onto a queue-like channel,
+    which the LogManager that owns the channel replays onto a real log
+    instance (see LogManager.listen).
+
+    Arguments:
+    channel -- a queue-like object with a put method
+
+    """
+    _counter = itertools.count()
+
+    def __init__(self, channel):
+        self._channel = channel
+        self.__key = (os.getpid(), next(self._counter))
+
+    def start(self, name):
+        self._channel.put(('start', self.__key, name))
+
+    def log(self, status):
+        self._channel.put(('log', self.__key, six.text_type(status)))
+
+    def summary(self):
+        pass
+
+
 class HTTPLogServer(threading.Thread):
     class RequestHandler(BaseHTTPRequestHandler):
         INDENT = 4
@@ -283,6 +313,19 @@ class HTTPLogServer(threading.Thread):
                         "results" : self.server.state["summary"],
                     }
                 self.wfile.write(json.dumps(status, indent=self.INDENT))
+            elif self.path == "/totals" or self.path.startswith("/totals/"):
+                # The totals of every group, or of the group following
+                # /totals/, as counted by the tests that have completed.
+                group = unquote(self.path[len("/totals/"):])
+                with self.server.state_lock:
+                    totals = self.server.state["totals"].totals()
+                    if group:
+                        totals = dict(totals.get(group) or results.Totals())
+                    else:
+                        totals = {k: dict(v) for k, v in six.iteritems(totals)}
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(json.dumps(totals, indent=self.INDENT))
             else:
                 self.send_response(404)
                 self.end_headers()
@@ -321,6 +364,7 @@ class HTTPLog(BaseLog):
             self._state['complete'] += 1
             assert status in self.SUMMARY_KEYS
             self._state['summary'][str(status)] += 1
+            self._state['totals'].add(self._name, status)
 
     def summary(self):
         pass
@@ -360,6 +404,7 @@ class LogManager(object):
             'lastlength': 0,
             'complete': 0,
             'running': [],
+            'totals': results.TotalsCounter(),
         }
         self._state_lock = threading.Lock()
 
@@ -371,3 +416,28 @@ class LogManager(object):
     def get(self):
         """ Return a new log instance """
         return self._log(self._state, self._state_lock)
+
+    def listen(self, channel):
+        """ Replay messages sent by ChannelLog instances
+
+        Starts a daemon thread that reads messages from channel until it reads
+        None, creating a new log instance for each test started in a worker,
+        and returns that thread.
+
+        Arguments:
+        channel -- a queue-like object with a get method
+
+        """
+        def replay():
+            logs = {}
+            for kind, key, value in iter(channel.get, None):
+                if kind == 'start':
+                    logs[key] = self.get()
+                    logs[key].start(value)
+                else:
+                    logs.pop(key).log(value)
+
+        thread = threading.Thread(target=replay)
+        thread.daemon = True
+        thread.start()
+        return thread
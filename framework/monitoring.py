@@ -94,6 +94,17 @@ class Monitoring(object):
         """Simply return _abort_error message"""
         return self._abort_error
 
+    def abort(self, message):
+        """Put this instance into the abort needed state
+
+        This is used to propagate an error detected by a copy of this instance,
+        such as one living in a worker process, back to the original.
+
+        Arguments:
+        message -- The error message, as returned by error_message
+        """
+        self._abort_error = message
+
     def add_rule(self, key, type, parameters, regex):
         """Add a new monitoring rule
 
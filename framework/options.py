@@ -50,14 +50,27 @@ class _Options(object):  # pylint: disable=too-many-instance-attributes
     valgrind -- True if valgrind is to be used
     env -- environment variables set for each test before run
     deqp_mustpass -- True to enable the use of the deqp mustpass list feature.
+    cache_dir -- directory to store persistent caches in, None to disable
+                 caching (see framework.cache)
+    timing_results -- paths to previous results, whose test durations are used
+                      to plan the run (see scheduler.durations)
+    sync -- True to sync results to disk
+    sync_window -- when syncing, the milliseconds a result may stay unsynced
+                   so that syncs can be grouped, 0 to sync every write
+    sync_batch -- when syncing with a window, sync as soon as this many
+                  results are waiting
     """
 
     def __init__(self):
         self.execute = True
         self.valgrind = False
         self.sync = False
+        self.sync_window = 0
+        self.sync_batch = 64
         self.deqp_mustpass = False
         self.process_isolation = True
+        self.cache_dir = None
+        self.timing_results = []
 
         # env is used to set some base environment variables that are not going
         # to change across runs, without sending them to os.environ which is
@@ -35,18 +35,18 @@ import contextlib
 import copy
 import importlib
 import itertools
-import multiprocessing
-import multiprocessing.dummy
 import os
 import re
 
 import six
 
-from framework import grouptools, exceptions
+from framework import grouptools, exceptions, cache
 from framework.dmesg import get_dmesg
+from framework.executor import Executor
 from framework.log import LogManager
 from framework.monitoring import Monitoring
-from framework.test.base import Test
+from framework.scheduler import Scheduler
+from framework.test.base import LazyTest, Test
 
 __all__ = [
     'RegexFilter',
@@ -57,6 +57,29 @@ __all__ = [
 ]
 
 
+# Patterns that can't be combined into a single regex, either because they
+# refer to their own groups, or because they set flags for the whole regex.
+_UNCOMBINABLE = re.compile(r'\\\d|\(\?P=|^\(\?[aiLmsux]+\)')
+
+# Characters that are known to match only themselves in a regex
+_LITERAL = re.compile(r'[a-z0-9_@ ,=:/-]*', flags=re.IGNORECASE)
+
+
+def _literal_prefix(pattern):
+    """Return the literal text an anchored pattern must start with.
+
+    Returns None if the pattern isn't anchored, or may match without
+    starting with a literal.
+    """
+    if not pattern.startswith('^') or '|' in pattern:
+        return None
+    prefix = _LITERAL.match(pattern, 1).group()
+    # A quantifier makes the last literal character optional
+    if pattern[1 + len(prefix):1 + len(prefix) + 1] in ['*', '?', '{']:
+        prefix = prefix[:-1]
+    return prefix.lower() or None
+
+
 class RegexFilter(object):
     """An object to be passed to TestProfile.filter.
 
@@ -67,6 +90,12 @@ class RegexFilter(object):
     a test that matches any regex will not be scheduled. Regardless of the
     value of the inverse flag if filters is empty then the test will be run.
 
+    The regexes are combined into a single regex when possible, so that each
+    name is searched once rather than once per regex. If every regex is
+    anchored to the start of the name with a literal prefix, then prefixes is
+    a tuple of those prefixes, which TestProfile uses to skip tests without
+    running any filters.
+
     Arguments:
     filters -- a list of regex compiled objects.
 
@@ -77,6 +106,23 @@ class RegexFilter(object):
     def __init__(self, filters, inverse=False):
         self.filters = [re.compile(f, flags=re.IGNORECASE) for f in filters]
         self.inverse = inverse
+        self.prefixes = None
+        self._regex = None
+
+        if len(self.filters) == 1:
+            self._regex = self.filters[0]
+        elif self.filters and not any(_UNCOMBINABLE.search(f.pattern)
+                                      for f in self.filters):
+            try:
+                self._regex = re.compile(
+                    '|'.join('(?:{})'.format(f.pattern) for f in self.filters),
+                    flags=re.IGNORECASE)
+            except re.error:
+                pass
+
+        prefixes = [_literal_prefix(f.pattern) for f in self.filters]
+        if prefixes and all(prefixes):
+            self.prefixes = tuple(prefixes)
 
     def __call__(self, name, _):  # pylint: disable=invalid-name
         # This needs to match the signature (name, test), since it doesn't need
@@ -87,10 +133,11 @@ class RegexFilter(object):
         if not self.filters:
             return True
 
-        if not self.inverse:
-            return any(r.search(name) for r in self.filters)
+        if self._regex is not None:
+            matched = self._regex.search(name) is not None
         else:
-            return not any(r.search(name) for r in self.filters)
+            matched = any(r.search(name) for r in self.filters)
+        return matched != self.inverse
 
 
 class TestDict(collections.MutableMapping):
@@ -103,6 +150,9 @@ class TestDict(collections.MutableMapping):
     This class doesn't accept keyword arguments, this is intentional. This is
     because the TestDict class is ordered, and keyword arguments are unordered,
     which is a design mismatch.
+
+    Values may also be LazyTest instances. These are replaced by the Test they
+    create when they are accessed by key, but not by iterentries.
     """
     def __init__(self):
         # This counter is incremented once when the allow_reassignment context
@@ -110,6 +160,7 @@ class TestDict(collections.MutableMapping):
         # allows stacking of the context manager
         self.__allow_reassignment = 0
         self.__container = collections.OrderedDict()
+        self.__groups = grouptools.GroupTrie()
 
     def __setitem__(self, key, value):
         """Enforce types on set operations.
@@ -139,12 +190,15 @@ class TestDict(collections.MutableMapping):
 
         # If there is already a test of that value in the tree it is an error
         if not self.__allow_reassignment and key in self.__container:
-            if self.__container[key] != value:
+            original = self[key]
+            if isinstance(value, LazyTest):
+                value = value.create()
+            if original != value:
                 error = (
                     'Further, the two tests are not the same,\n'
                     'The original test has this command:   "{0}"\n'
                     'The new test has this command:        "{1}"'.format(
-                        ' '.join(self.__container[key].command),
+                        ' '.join(original.command),
                         ' '.join(value.command))
                 )
             else:
@@ -155,14 +209,24 @@ class TestDict(collections.MutableMapping):
                     key, error))
 
         self.__container[key] = value
+        self.__groups.add(key)
 
     def __getitem__(self, key):
-        """Lower the value before returning."""
-        return self.__container[key.lower()]
+        """Lower the value before returning.
+
+        If the value is a LazyTest the test is created, and replaces the
+        LazyTest, so that changes made to it are kept.
+        """
+        key = key.lower()
+        value = self.__container[key]
+        if isinstance(value, LazyTest):
+            value = self.__container[key] = value.create()
+        return value
 
     def __delitem__(self, key):
         """Lower the value before returning."""
         del self.__container[key.lower()]
+        self.__groups.remove(key.lower())
 
     def __len__(self):
         return len(self.__container)
@@ -170,6 +234,29 @@ class TestDict(collections.MutableMapping):
     def __iter__(self):
         return iter(self.__container)
 
+    def iterentries(self, keys=None, prefixes=None):
+        """Iterate over (key, value) pairs without creating LazyTests.
+
+        Keyword Arguments:
+        keys     -- an iterable of keys to look up, instead of iterating over
+                    all keys. Default: None
+        prefixes -- a tuple of lowercase strings. If set only keys starting
+                    with one of them are yielded. To select a group, and
+                    nothing else, end the group with grouptools.SEPARATOR.
+                    Default: None
+        """
+        if keys is None:
+            if prefixes is None:
+                return six.iteritems(self.__container)
+            # Only the groups matching prefixes are visited.
+            return ((k, self.__container[k])
+                    for k in self.__groups.iterprefix(prefixes))
+
+        entries = ((k, self.__container[k.lower()]) for k in keys)
+        if prefixes is None:
+            return entries
+        return ((k, v) for k, v in entries if k.lower().startswith(prefixes))
+
     @contextlib.contextmanager
     def group_manager(self, test_class, group, **default_args):
         """A context manager to make working with flat groups simple.
@@ -306,21 +393,37 @@ class TestProfile(object):
         new.filters = copy.copy(self.filters)
         return new
 
+    def _iterentries(self):
+        """Iterate over tests while filtering, without creating LazyTests."""
+        # Any include filter made of anchored regexes limits the tests that
+        # can match to those with its prefixes, so use it to skip tests
+        # without running the filters. This is only safe if every filter is a
+        # RegexFilter, other filters may depend on seeing every test (like
+        # FilterVsIn in quick.py, which picks tests at random).
+        prefixes = None
+        if all(isinstance(f, RegexFilter) for f in self.filters):
+            prefixes = next(
+                (f.prefixes for f in self.filters
+                 if not f.inverse and f.prefixes),
+                None)
+
+        for k, v in self.test_list.iterentries(self.forced_test_list or None,
+                                               prefixes):
+            if all(f(k, v) for f in self.filters):
+                yield k, v
+
     def itertests(self):
         """Iterate over tests while filtering.
 
+        LazyTests are created as they are yielded, but are not stored in the
+        test_list, so they are freed once the caller is done with them.
+
         This iterator is non-destructive.
         """
-        if self.forced_test_list:
-            opts = collections.OrderedDict()
-            for n in self.forced_test_list:
-                opts[n] = self.test_list[n]
-        else:
-            opts = self.test_list  # pylint: disable=redefined-variable-type
-
-        for k, v in six.iteritems(opts):
-            if all(f(k, v) for f in self.filters):
-                yield k, v
+        for k, v in self._iterentries():
+            if isinstance(v, LazyTest):
+                v = v.create()
+            yield k, v
 
 
 def load_test_profile(filename):
@@ -353,6 +456,10 @@ def load_test_profile(filename):
             'module or it doesn\'t exist. Check your spelling?'.format(
                 filename))
 
+    # Write back anything parsed while building the profile, so that the next
+    # import can reuse it.
+    cache.save()
+
     try:
         return mod.profile
     except AttributeError:
@@ -361,91 +468,75 @@ def load_test_profile(filename):
             'Did you specify the right file?'.format(filename))
 
 
-def run(profiles, logger, backend, concurrency):
-    """Runs all tests using Thread pool.
+def run(profiles, logger, backend, concurrency, executor='thread',
+        estimate=None):
+    """Runs all tests using an Executor.
 
     When called this method will flatten out self.tests into self.test_list,
-    then will prepare a logger, and begin executing tests through it's Thread
-    pools.
+    then will prepare a logger, and begin executing tests through the
+    executor's pools.
 
-    Based on the value of options.OPTIONS.concurrent it will either run all the
-    tests concurrently, all serially, or first the thread safe tests then the
-    serial tests.
+    Based on the value of concurrency it will either run all the tests
+    concurrently, all serially, or run the thread safe tests concurrently
+    alongside the serial tests. The order tests are started in is decided by
+    a scheduler.Scheduler.
 
     Finally it will print a final summary of the tests.
 
     Arguments:
-    profiles -- a list of Profile instances.
-    logger   -- a log.LogManager instance.
-    backend  -- a results.Backend derived instance.
-    """
-    chunksize = 1
+    profiles    -- a list of Profile instances.
+    logger      -- a log.LogManager instance.
+    backend     -- a results.Backend derived instance.
+    concurrency -- one of "all", "some", or "none"
+
+    Keyword Arguments:
+    executor -- the name of the executor to run tests with, one of
+                executor.EXECUTORS. Default: 'thread'
+    estimate -- a function taking (name, test) and returning the expected
+                duration of the test, used to start the longest tests first.
+                Default: scheduler.estimate
 
+    Returns the run time predicted by the scheduler using estimate.
+    """
     # The logger needs to know how many tests are running. Because of filters
     # there's no way to do that without making a concrete list out of the
-    # filters profiles.
-    profiles = [(p, list(p.itertests())) for p in profiles]
+    # filters profiles. LazyTests are left for the executor to create right
+    # before they run, so only the running tests are held in memory.
+    # pylint: disable=protected-access
+    profiles = [(p, list(p._iterentries())) for p in profiles]
     log = LogManager(logger, sum(len(l) for _, l in profiles))
 
     # check that after the filters are run there are actually tests to run.
     if not any(l for _, l in profiles):
         raise exceptions.PiglitUserError('no matching tests')
 
-    def test(name, test, profile, this_pool=None):
-        """Function to call test.execute from map"""
-        with backend.write_test(name) as w:
-            test.execute(name, log.get(), profile.options)
-            w(test.result)
-        if profile.options['monitor'].abort_needed:
-            this_pool.terminate()
-
-    def run_threads(pool, profile, test_list, filterby=None):
-        """ Open a pool, close it, and join it """
-        if filterby:
-            # Although filterby could be attached to TestProfile as a filter,
-            # it would have to be removed when run_threads exits, requiring
-            # more code, and adding side-effects
-            test_list = (x for x in test_list if filterby(x))
-
-        pool.imap(lambda pair: test(pair[0], pair[1], profile, pool),
-                  test_list, chunksize)
-
-    def run_profile(profile, test_list):
-        """Run an individual profile."""
-        profile.setup()
-        if concurrency == "all":
-            run_threads(multi, profile, test_list)
-        elif concurrency == "none":
-            run_threads(single, profile, test_list)
-        else:
-            assert concurrency == "some"
-            # Filter and return only thread safe tests to the threaded pool
-            run_threads(multi, profile, test_list,
-                        lambda x: x[1].run_concurrent)
-
-            # Filter and return the non thread safe tests to the single
-            # pool
-            run_threads(single, profile, test_list,
-                        lambda x: not x[1].run_concurrent)
-        profile.teardown()
-
-    # Multiprocessing.dummy is a wrapper around Threading that provides a
-    # multiprocessing compatible API
-    #
-    # The default value of pool is the number of virtual processor cores
-    single = multiprocessing.dummy.Pool(1)
-    multi = multiprocessing.dummy.Pool()
+    runner = Executor(executor, backend, log, [p for p, _ in profiles])
+
+    # All profiles are set up before any test is dispatched, and torn down
+    # after the last test has finished, since the serial and concurrent lanes
+    # interleave the tests of all profiles.
+    for p, _ in profiles:
+        p.setup()
+
+    if estimate is not None:
+        schedule = Scheduler(profiles, concurrency, estimate=estimate)
+    else:
+        schedule = Scheduler(profiles, concurrency)
 
     try:
-        for p in profiles:
-            run_profile(*p)
+        for args in schedule:
+            runner.submit(*args)
 
-        for pool in [single, multi]:
-            pool.close()
-            pool.join()
+        runner.wait()
     finally:
         log.get().summary()
 
+    for p, _ in profiles:
+        p.teardown()
+
     for p, _ in profiles:
         if p.options['monitor'].abort_needed:
+            backend.abort()
             raise exceptions.PiglitAbort(p.options['monitor'].error_message)
+
+    return schedule.predict(runner.processes)
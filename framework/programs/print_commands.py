@@ -35,7 +35,7 @@ import sys
 import six
 
 from . import parsers
-from framework import options, profile, exceptions
+from framework import cache, options, profile, exceptions
 from framework.test import Test, GleanTest
 
 
@@ -86,6 +86,7 @@ def main(input_):
                         help="Path to results folder")
     args = parser.parse_args(input_)
 
+    options.OPTIONS.cache_dir = cache.default_dir()
     profile_ = profile.load_test_profile(args.testProfile)
 
     if args.exclude_tests:
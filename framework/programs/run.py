@@ -33,10 +33,12 @@ import time
 
 import six
 
-from framework import core, backends, exceptions, options
+from framework import core, backends, cache, exceptions, options
 from framework import dmesg
+from framework import executor
 from framework import monitoring
 from framework import profile
+from framework import scheduler
 from framework.results import TimeAttribute
 from . import parsers
 
@@ -139,6 +141,15 @@ def _run_parser(input_):
                              const="none",
                              dest="concurrency",
                              help="Disable concurrent test runs")
+    parser.add_argument('--executor',
+                        choices=executor.EXECUTORS,
+                        default=core.PIGLIT_CONFIG.safe_get(
+                            'core', 'executor', 'thread'),
+                        help='Select how tests are run: in threads of the '
+                             'piglit process, in worker processes, or with '
+                             'concurrent tests in worker processes and serial '
+                             'tests in a thread (hybrid). '
+                             'This value can also be set in piglit.conf.')
     parser.add_argument("-p", "--platform",
                         choices=core.PLATFORMS,
                         default=_default_platform(),
@@ -160,6 +171,25 @@ def _run_parser(input_):
     parser.add_argument("-s", "--sync",
                         action="store_true",
                         help="Sync results to disk after every test")
+    parser.add_argument("--sync-window",
+                        type=int,
+                        default=0,
+                        metavar="<ms>",
+                        help="With -s/--sync, sync results from a background "
+                             "thread in groups, at most this many "
+                             "milliseconds after they were written, rather "
+                             "than after every write. Default: 0")
+    parser.add_argument("--sync-batch",
+                        type=int,
+                        default=64,
+                        metavar="<count>",
+                        help="With --sync-window, sync as soon as this many "
+                             "results are waiting. Default: 64")
+    parser.add_argument("--journal",
+                        action="store_true",
+                        help="Append the results of each process to a "
+                             "single journal file, rather than writing a "
+                             "file for each test")
     parser.add_argument("--junit_suffix",
                         type=str,
                         default="",
@@ -186,6 +216,13 @@ def _run_parser(input_):
     parser.add_argument("--test-list",
                         type=os.path.abspath,
                         help="A file containing a list of tests to run")
+    parser.add_argument('--timing-results',
+                        default=[],
+                        action='append',
+                        metavar='<results path>',
+                        help='Use the test durations from previous results to '
+                             'start the longest tests first, and print the '
+                             'predicted run time (can be used more than once)')
     parser.add_argument('-o', '--overwrite',
                         dest='overwrite',
                         action='store_true',
@@ -226,10 +263,13 @@ def _create_metadata(args, name, forced_test_list):
     opts['profile'] = args.test_profile
     opts['log_level'] = args.log_level
     opts['concurrent'] = args.concurrency
+    opts['executor'] = args.executor
+    opts['backend'] = args.backend
     opts['include_filter'] = args.include_tests
     opts['exclude_filter'] = args.exclude_tests
     opts['dmesg'] = args.dmesg
     opts['monitoring'] = args.monitored
+    opts['journal'] = args.journal
     if args.platform:
         opts['platform'] = args.platform
     opts['forced_test_list'] = forced_test_list
@@ -288,8 +328,13 @@ def run(input_):
     options.OPTIONS.execute = args.execute
     options.OPTIONS.valgrind = args.valgrind
     options.OPTIONS.sync = args.sync
+    options.OPTIONS.sync_window = args.sync_window
+    options.OPTIONS.sync_batch = args.sync_batch
     options.OPTIONS.deqp_mustpass = args.deqp_mustpass
     options.OPTIONS.process_isolation = args.process_isolation
+    options.OPTIONS.cache_dir = cache.default_dir()
+    options.OPTIONS.timing_results = [
+        path.abspath(r) for r in args.timing_results]
 
     # Set the platform to pass to waffle
     options.OPTIONS.env['PIGLIT_PLATFORM'] = args.platform
@@ -324,7 +369,8 @@ def run(input_):
     backend = backends.get_backend(args.backend)(
         args.results_path,
         junit_suffix=args.junit_suffix,
-        junit_subtests=args.junit_subtests)
+        junit_subtests=args.junit_subtests,
+        file_journal=args.journal)
     backend.initialize(_create_metadata(
         args, args.name or path.basename(args.results_path), forced_test_list))
 
@@ -352,13 +398,21 @@ def run(input_):
         if args.include_tests:
             p.filters.append(profile.RegexFilter(args.include_tests))
 
+    estimate = scheduler.durations()
+
     time_elapsed = TimeAttribute(start=time.time())
 
-    profile.run(profiles, args.log_level, backend, args.concurrency)
+    predicted = profile.run(profiles, args.log_level, backend,
+                            args.concurrency, args.executor, estimate)
 
     time_elapsed.end = time.time()
     backend.finalize({'time_elapsed': time_elapsed.to_json()})
 
+    if estimate is not None:
+        print('Predicted run time: {}\n'
+              'Actual run time:    {}'.format(
+                  TimeAttribute(end=predicted).delta, time_elapsed.delta))
+
     print('Thank you for running Piglit!\n'
           'Results have been written to ' + args.results_path)
 
@@ -382,32 +436,48 @@ def resume(input_):
     args = parser.parse_args(input_)
     _disable_windows_exception_messages()
 
-    results = backends.load(args.results_path)
+    # Only the names and statuses of the tests already run are needed, which
+    # the index of the run provides without loading every result.
+    state = backends.json.load_resume(args.results_path)
+    if state is not None:
+        results, statuses, start_count = state
+    else:
+        results = backends.load(args.results_path)
+        statuses = {n: six.text_type(r.result)
+                    for n, r in six.iteritems(results.tests)}
+        start_count = len(results.tests) + 1
+
     options.OPTIONS.execute = results.options['execute']
     options.OPTIONS.valgrind = results.options['valgrind']
     options.OPTIONS.sync = results.options['sync']
+    options.OPTIONS.sync_window = results.options.get('sync_window', 0)
+    options.OPTIONS.sync_batch = results.options.get('sync_batch', 64)
     options.OPTIONS.deqp_mustpass = results.options['deqp_mustpass']
     options.OPTIONS.proces_isolation = results.options['process_isolation']
 
     core.get_config(args.config_file)
 
+    options.OPTIONS.cache_dir = cache.default_dir()
+    options.OPTIONS.timing_results = results.options.get('timing_results', [])
     options.OPTIONS.env['PIGLIT_PLATFORM'] = results.options['platform']
 
     results.options['env'] = core.collect_system_info()
     results.options['name'] = results.name
 
-    # Resume only works with the JSON backend
-    backend = backends.get_backend('json')(
+    # Finish the run with the backend it was started with. Resume only works
+    # with backends that write the per test files of the JSON backend, runs
+    # from before the backend was recorded used that.
+    backend = backends.get_backend(results.options.get('backend', 'json'))(
         args.results_path,
-        file_start_count=len(results.tests) + 1)
+        file_start_count=start_count,
+        file_journal=results.options.get('journal', False))
     # Specifically do not initialize again, everything initialize does is done.
 
     # Don't re-run tests that have already completed, incomplete status tests
     # have obviously not completed.
-    exclude_tests = set()
-    for name, result in six.iteritems(results.tests):
-        if args.no_retry or result.result != 'incomplete':
-            exclude_tests.add(name)
+    exclude_tests = set(
+        n for n, s in six.iteritems(statuses)
+        if args.no_retry or s != 'incomplete')
 
     profiles = [profile.load_test_profile(p)
                 for p in results.options['profile']]
@@ -439,7 +509,9 @@ def resume(input_):
         profiles,
         results.options['log_level'],
         backend,
-        results.options['concurrent'])
+        results.options['concurrent'],
+        results.options.get('executor', 'thread'),
+        scheduler.durations())
 
     backend.finalize()
 
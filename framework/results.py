@@ -24,9 +24,11 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import abc
 import collections
 import copy
 import datetime
+import sys
 
 import six
 
@@ -37,32 +39,73 @@ __all__ = [
     'TestResult',
 ]
 
+if six.PY2:
+    def _intern(name):
+        """Unicode can't be interned on python 2, names are kept as they are."""
+        return name
+else:
+    _intern = sys.intern  # pylint: disable=invalid-name
+
 
 class Subtests(collections.MutableMapping):
-    """A dict-like object that stores Statuses as values."""
+    """A dict-like object that stores Statuses as values.
+
+    Most tests have no subtests, so the dict holding them is only created when
+    the first subtest is added. On python 3 the names of subtests are
+    interned, so tests run many times (or in many results) share a single copy
+    of each name.
+    """
+    __slots__ = ['__container', '__worst']
+
     def __init__(self, dict_=None):
-        self.__container = {}
+        self.__container = None
+        self.__worst = None
 
         if dict_ is not None:
             self.update(dict_)
 
     def __setitem__(self, name, value):
-        self.__container[name.lower()] = status.status_lookup(value)
+        if self.__container is None:
+            self.__container = {}
+        name = name.lower()
+        value = status.status_lookup(value)
+        # Adding a subtest can only make the worst status worse, replacing
+        # one may make it better, so it is found again when next needed.
+        if name in self.__container:
+            self.__worst = None
+        elif self.__worst is not None and value > self.__worst:
+            self.__worst = value
+        self.__container[_intern(name)] = value
 
     def __getitem__(self, name):
+        if self.__container is None:
+            raise KeyError(name)
         return self.__container[name.lower()]
 
     def __delitem__(self, name):
+        if self.__container is None:
+            raise KeyError(name)
         del self.__container[name.lower()]
+        self.__worst = None
 
     def __iter__(self):
-        return iter(self.__container)
+        return iter(self.__container or ())
 
     def __len__(self):
-        return len(self.__container)
+        return len(self.__container) if self.__container is not None else 0
 
     def __repr__(self):
-        return repr(self.__container)
+        return repr(self.__container or {})
+
+    def worst(self):
+        """Return the worst status of the subtests, or None if there are none.
+
+        The worst status is kept as subtests are added, so this is cheap to
+        call repeatedly.
+        """
+        if self.__worst is None and self.__container:
+            self.__worst = max(six.itervalues(self.__container))
+        return self.__worst
 
     def to_json(self):
         res = dict(self)
@@ -79,11 +122,26 @@ class Subtests(collections.MutableMapping):
         return res
 
 
+@six.add_metaclass(abc.ABCMeta)
+class LazyString(object):  # pylint: disable=too-few-public-methods
+    """A string that is only created when it is first read.
+
+    Backends that load results can set a LazyString as the out or err of a
+    TestResult, to avoid decoding large strings that may never be used.
+    """
+    __slots__ = []
+
+    @abc.abstractmethod
+    def resolve(self):
+        """Return the string as a str or unicode."""
+
+
 class StringDescriptor(object):  # pylint: disable=too-few-public-methods
     """A Shared data descriptor class for TestResult.
 
     This provides a property that can be passed a str or unicode, but always
-    returns a unicode object.
+    returns a unicode object. It can also be passed a LazyString, which is
+    resolved the first time the value is read.
 
     """
     def __init__(self, name, default=six.text_type()):
@@ -92,10 +150,16 @@ class StringDescriptor(object):  # pylint: disable=too-few-public-methods
         self.__default = default
 
     def __get__(self, instance, cls):
-        return getattr(instance, self.__name, self.__default)
+        value = getattr(instance, self.__name, self.__default)
+        if isinstance(value, LazyString):
+            self.__set__(instance, value.resolve())
+            value = getattr(instance, self.__name)
+        return value
 
     def __set__(self, instance, value):
-        if isinstance(value, six.binary_type):
+        if isinstance(value, LazyString):
+            setattr(instance, self.__name, value)
+        elif isinstance(value, six.binary_type):
             setattr(instance, self.__name, value.decode('utf-8', 'replace'))
         elif isinstance(value, six.text_type):
             setattr(instance, self.__name, value)
@@ -137,18 +201,14 @@ class TimeAttribute(object):
 
     @classmethod
     def from_dict(cls, dict_):
-        dict_ = copy.copy(dict_)
-
-        if '__type__' in dict_:
-            del dict_['__type__']
-        return cls(**dict_)
+        return cls(dict_.get('start', 0.0), dict_.get('end', 0.0))
 
 
 class TestResult(object):
     """An object represting the result of a single test."""
     __slots__ = ['returncode', '_err', '_out', 'time', 'command', 'traceback',
                  'environment', 'subtests', 'dmesg', '__result', 'images',
-                 'exception', 'pid']
+                 'exception', '_pid']
     err = StringDescriptor('_err')
     out = StringDescriptor('_out')
 
@@ -162,12 +222,27 @@ class TestResult(object):
         self.images = None
         self.traceback = None
         self.exception = None
-        self.pid = []
+        self._pid = None
         if result:
             self.result = result
         else:
             self.__result = status.NOTRUN
 
+    @property
+    def pid(self):
+        """The list of the pids of the processes run by the test.
+
+        The list is only created when it is first read, since most results
+        that are loaded have none.
+        """
+        if self._pid is None:
+            self._pid = []
+        return self._pid
+
+    @pid.setter
+    def pid(self, new):
+        self._pid = new or None
+
     @property
     def result(self):
         """Return the result of the test.
@@ -179,8 +254,10 @@ class TestResult(object):
         all unit tests pass.
 
         """
-        if self.subtests and self.__result != status.CRASH:
-            return max(six.itervalues(self.subtests))
+        if self.__result is not status.CRASH:
+            worst = self.subtests.worst()
+            if worst is not None:
+                return worst
         return self.__result
 
     @result.setter
@@ -205,7 +282,7 @@ class TestResult(object):
             'exception': self.exception,
             'traceback': self.traceback,
             'dmesg': self.dmesg,
-            'pid': self.pid,
+            'pid': self._pid or [],
         }
         return obj
 
@@ -290,6 +367,68 @@ class Totals(dict):
         return tots
 
 
+class TotalsCounter(object):
+    """Counts the results of tests into the totals of each group.
+
+    Tests are added one at a time with add, and totals returns the totals of
+    every group, including 'root', as calculated by
+    TestrunResult.calculate_group_totals. The totals are kept up to date as
+    tests are added, so they can be read at any time, for example while the
+    tests are still running.
+    """
+    def __init__(self):
+        self._totals = collections.defaultdict(Totals)
+        self._chains = {}
+
+    def _chain(self, group):
+        """Return the Totals of group, 'root', and every group above group.
+
+        Each group is split into the groups above it only the first time a
+        test in it is added.
+        """
+        try:
+            return self._chains[group]
+        except KeyError:
+            names = [group, 'root']
+            parent = group
+            while parent:
+                parent = grouptools.groupname(parent)
+                names.append(parent)
+            chain = self._chains[group] = [self._totals[n] for n in names]
+            return chain
+
+    def add(self, name, result, subtests=None):
+        """Count the result of a test.
+
+        Arguments:
+        name   -- the name of the test
+        result -- the status of the test
+
+        Keyword Arguments:
+        subtests -- a dict of subtest names to their statuses
+        """
+        # If there are subtests treat the test as if it is a group instead of
+        # a test.
+        if subtests:
+            chain = self._chain(name)
+            for res in six.itervalues(subtests):
+                res = six.text_type(res)
+                for totals in chain:
+                    totals[res] += 1
+        else:
+            res = six.text_type(result)
+            for totals in self._chain(grouptools.groupname(name)):
+                totals[res] += 1
+
+    def totals(self):
+        """Return a dict of group names to Totals.
+
+        The dict and the Totals in it are the ones the counter updates, they
+        must not be modified, and should be copied if they must not change.
+        """
+        return self._totals
+
+
 class TestrunResult(object):
     """The result of a single piglit run."""
     def __init__(self):
@@ -324,27 +463,26 @@ class TestrunResult(object):
             except KeyError:
                 raise e
 
+    def iterresults(self):
+        """Yield a (name, status) pair for the result of each test.
+
+        Tests with subtests yield each of their subtests instead of
+        themselves, with the subtest name joined to the name of the test.
+        """
+        for name, test in six.iteritems(self.tests):
+            if not test.subtests:
+                yield name, test.result
+            else:
+                for subtest, result in six.iteritems(test.subtests):
+                    yield grouptools.join(name, subtest), result
+
     def calculate_group_totals(self):
         """Calculate the number of pases, fails, etc at each level."""
+        counter = TotalsCounter()
         for name, result in six.iteritems(self.tests):
-            # If there are subtests treat the test as if it is a group instead
-            # of a test.
-            if result.subtests:
-                for res in six.itervalues(result.subtests):
-                    res = str(res)
-                    temp = name
-
-                    self.totals[temp][res] += 1
-                    while temp:
-                        temp = grouptools.groupname(temp)
-                        self.totals[temp][res] += 1
-                    self.totals['root'][res] += 1
-            else:
-                res = str(result.result)
-                while name:
-                    name = grouptools.groupname(name)
-                    self.totals[name][res] += 1
-                self.totals['root'][res] += 1
+            counter.add(name, result.result, result.subtests)
+        for group, totals in six.iteritems(counter.totals()):
+            self.totals[group] = totals
 
     def to_json(self):
         if not self.totals:
@@ -0,0 +1,226 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Decides the order tests are dispatched to an Executor in.
+
+The serial lane of an executor runs alongside the concurrent lane, so in the
+"some" concurrency mode the time a run takes is bounded below by the longer of
+the serial lane and the concurrent lane divided by the number of CPUs. To get
+close to that bound the tests of all profiles are split into lanes up front,
+so that serial tests of later profiles don't wait for earlier profiles, and
+the longest serial tests are started first, so that they don't end up running
+alone after the concurrent lane has drained. The concurrent lane is ordered
+longest first as well, so that a long test doesn't start in the last minute of
+a run and become its critical path.
+
+How long a test takes is estimated with the estimate function, or when timing
+data from previous runs is available, with a DurationEstimator. The durations
+function returns the DurationEstimator for the results the run was given, so
+that profiles can plan how to batch tests with it while they are loaded.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import collections
+import heapq
+import re
+
+import six
+
+from framework import backends, grouptools, options
+from framework.test.base import LazyTest, ReducedProcessMixin
+
+__all__ = [
+    'DurationEstimator',
+    'Scheduler',
+    'durations',
+    'estimate',
+]
+
+# DurationEstimator instances created by durations, by the paths of the
+# results they were created from.
+_DURATIONS = {}
+
+# The name of a batch split from a group by shader_test.batch_files
+_SPLIT_BATCH = re.compile(r'^batch[0-9]+$')
+
+
+def estimate(_, test):
+    """Return the relative cost of a test when nothing better is known.
+
+    Tests that run multiple subtests in a single process cost one unit per
+    subtest, everything else costs one unit. LazyTests haven't been created
+    yet, so they cost one unit.
+
+    Arguments:
+    name -- the name of the test
+    test -- a Test instance
+    """
+    if isinstance(test, LazyTest):
+        return 1
+    if isinstance(test, ReducedProcessMixin):
+        return max(len(test._expected), 1)  # pylint: disable=protected-access
+    return 1
+
+
+class DurationEstimator(object):
+    """Estimates the duration of tests from previous results.
+
+    An instance is a replacement for the estimate function, returning the
+    duration in seconds of the test in previous results. If a test has been
+    run more than once the mean is used. Tests that are not in any of the
+    results are assumed to take the median duration of the tests that are.
+
+    Arguments:
+    durations -- a dict mapping test names to durations in seconds
+
+    Keyword Arguments:
+    default -- the duration of unknown tests. Default: the median of
+               durations, or 1 second if durations is empty.
+    """
+
+    def __init__(self, durations, default=None):
+        self.durations = durations
+        if default is None:
+            if durations:
+                values = sorted(six.itervalues(durations))
+                default = values[len(values) // 2]
+            else:
+                default = 1.0
+        self.default = default
+
+    def __call__(self, name, _):
+        return self.durations.get(name, self.default)
+
+    @classmethod
+    def from_results(cls, results):
+        """Create an instance from a list of results.TestrunResult.
+
+        The duration of a test with subtests is also divided evenly among its
+        subtests, so that the tests can be estimated if they are run
+        differently, like each in its own process. The subtests of a batch
+        that was split from a group (GROUP@batchN, see
+        shader_test.batch_files) are estimated by their names in the group.
+        """
+        times = collections.defaultdict(list)
+        shares = collections.defaultdict(list)
+        for result in results:
+            for name, test in six.iteritems(result.tests):
+                total = test.time.total
+                if total > 0:
+                    times[name].append(total)
+                    group = name
+                    if _SPLIT_BATCH.match(grouptools.testname(name)):
+                        group = grouptools.groupname(name)
+                    for subtest in test.subtests:
+                        shares[grouptools.join(group, subtest)].append(
+                            total / len(test.subtests))
+
+        for name, share in six.iteritems(shares):
+            if name not in times:
+                times[name] = share
+
+        return cls({n: sum(t) / len(t) for n, t in six.iteritems(times)})
+
+
+def durations():
+    """Return a DurationEstimator for options.OPTIONS.timing_results.
+
+    Returns None if there are no timing results. Each set of results is only
+    loaded once, however many times this is called.
+    """
+    paths = tuple(options.OPTIONS.timing_results)
+    if not paths:
+        return None
+    if paths not in _DURATIONS:
+        _DURATIONS[paths] = DurationEstimator.from_results(
+            [backends.load(p) for p in paths])
+    return _DURATIONS[paths]
+
+
+class Scheduler(object):
+    """Orders the tests of one or more profiles for dispatch.
+
+    Iterating over a Scheduler yields (concurrent, index, name, test) tuples,
+    where concurrent is True for tests in the concurrent lane, and index is
+    the index of the test's profile. These are the arguments of
+    Executor.submit.
+
+    Unless concurrency is "none" both lanes are sorted longest first, with
+    ties kept in profile order. In "none" mode every test runs one after the
+    other anyway, so profile order is kept.
+
+    Arguments:
+    profiles    -- a list of (TestProfile, [(name, test)]) pairs
+    concurrency -- one of "all", "some", or "none"
+
+    Keyword Arguments:
+    estimate -- a function taking (name, test) and returning the expected
+                cost of the test. Default: estimate
+    """
+
+    def __init__(self, profiles, concurrency, estimate=estimate):  # pylint: disable=redefined-outer-name
+        assert concurrency in ['all', 'some', 'none'], concurrency
+        self._estimate = estimate
+        self.concurrent = []
+        self.serial = []
+
+        for index, (_, test_list) in enumerate(profiles):
+            for name, test in test_list:
+                if concurrency == 'all' or (
+                        concurrency == 'some' and test.run_concurrent):
+                    self.concurrent.append((index, name, test))
+                else:
+                    self.serial.append((index, name, test))
+
+        if concurrency != 'none':
+            for lane in [self.serial, self.concurrent]:
+                lane.sort(key=lambda x: self._estimate(x[1], x[2]),
+                          reverse=True)
+
+    def __iter__(self):
+        # The serial lane has a single worker, so it is dispatched first to
+        # make sure its longest test is started right away.
+        for index, name, test in self.serial:
+            yield False, index, name, test
+        for index, name, test in self.concurrent:
+            yield True, index, name, test
+
+    def __len__(self):
+        return len(self.serial) + len(self.concurrent)
+
+    def predict(self, processes):
+        """Return the predicted time to run all of the tests.
+
+        This simulates dispatching the concurrent lane to a pool with
+        processes workers, alongside the serial lane with a single worker,
+        using the same estimates used for ordering.
+
+        Arguments:
+        processes -- the number of workers in the concurrent lane
+        """
+        workers = [0.0] * processes
+        for _, name, test in self.concurrent:
+            heapq.heapreplace(workers, workers[0] + self._estimate(name, test))
+        serial = sum(self._estimate(n, t) for _, n, t in self.serial)
+
+        return max([serial] + workers)
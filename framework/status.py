@@ -116,6 +116,10 @@ class StatusException(exceptions.PiglitInternalError):
         return u'Unknown status "{}"'.format(self.__status)
 
 
+# Added to the key of statuses that count toward the total, see Status.key
+_KEY_COUNTED = 1 << 16
+
+
 @compat.python_2_unicode_compatible
 class Status(object):
     """ A simple class for representing the output values of tests.
@@ -139,15 +143,17 @@ class Status(object):
                      else 0
 
     """
-    __slots__ = ['__name', '__value', '__fraction']
+    __slots__ = ['__name', '__value', '__fraction', '__key']
 
     def __init__(self, name, value, fraction=(0, 1)):
         assert isinstance(value, int), type(value)
+        assert 0 <= value < _KEY_COUNTED, value
         # The object is immutable, so calling self.foo = foo will raise a
         # TypeError. Using setattr from the parrent object works around this.
         self.__name = six.text_type(name)
         self.__value = value
         self.__fraction = fraction
+        self.__key = value + _KEY_COUNTED * fraction[1]
 
     @property
     def name(self):
@@ -164,6 +170,18 @@ class Status(object):
         """ Return the totals of the test as a tuple: (<pass>. <total>) """
         return self.__fraction
 
+    @property
+    def key(self):
+        """ Return an int ordering statuses the same way they compare
+
+        a < b is the same as a.key < b.key. Statuses that don't count toward
+        the total, like skip, are ordered before all others, and the others
+        are ordered by value. This allows many statuses to be compared as
+        ints, for example in an array.
+
+        """
+        return self.__key
+
     def __repr__(self):
         return 'Status("{}", {}, {})'.format(
             self.name, self.value, self.fraction)
@@ -178,16 +196,18 @@ class Status(object):
         return self.name
 
     def __lt__(self, other):
-        return not self.__ge__(other)
+        return self.__key < other.__key
 
     def __le__(self, other):
-        return not self.__gt__(other)
+        return self.__key <= other.__key
 
     def __eq__(self, other):
         # This must be int or status, since status comparisons are done using
         # the __int__ magic method
-        if isinstance(other, (int, Status)):
-            return int(self) == int(other)
+        if isinstance(other, Status):
+            return self.__value == other.__value
+        elif isinstance(other, int):
+            return self.__value == other
         elif isinstance(other, six.text_type):
             return six.text_type(self) == other
         elif isinstance(other, six.binary_type):
@@ -198,11 +218,10 @@ class Status(object):
         return not self == other
 
     def __ge__(self, other):
-        return self.fraction[1] > other.fraction[1] or (
-            self.fraction[1] == other.fraction[1] and int(self) >= int(other))
+        return self.__key >= other.__key
 
     def __gt__(self, other):
-        return self.fraction[1] > other.fraction[1] or int(self) > int(other)
+        return self.__key > other.__key
 
     def __int__(self):
         return self.value
@@ -25,6 +25,7 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import itertools
 import re
 import operator
 
@@ -35,7 +36,6 @@ from six.moves import zip
 # the module
 import framework.status as so
 from framework.core import lazy_property
-from framework import grouptools
 
 
 class Results(object):  # pylint: disable=too-few-public-methods
@@ -76,55 +76,53 @@ class Names(object):
     def __init__(self, tests):
         self.__results = tests.results
 
-    def __diff(self, comparator, handler=None):
-        """Helper for simplifying comparators using find_diffs."""
+    def __diff(self, comparator):
+        """Find the names for which comparator(prev, cur) is True for each
+        pair of runs, see _StatusMatrix.diff.
+        """
         ret = ['']
-        if handler is None:
-            ret.extend(find_diffs(self.__results, self.all, comparator))
-        else:
-            ret.extend(find_diffs(self.__results, self.all, comparator,
-                                  handler=handler))
+        ret.extend(self._matrix.diff(comparator))
         return ret
 
     def __single(self, comparator):
-        """Helper for simplifying comparators using find_single."""
-        return find_single(self.__results, self.all, comparator)
+        """Find the names for which comparator(status) is True in each run,
+        tests missing from a run are left out.
+        """
+        return self._matrix.single(
+            lambda x: x is not None and comparator(x))
+
+    @lazy_property
+    def _found(self):
+        """A dict of the names and statuses yielded by iterresults, for each
+        run.
+        """
+        return [dict(res.iterresults()) for res in self.__results]
+
+    @lazy_property
+    def _matrix(self):
+        """The statuses of all tests in all runs, see _StatusMatrix."""
+        return _StatusMatrix(self.__results, self.all, self._found)
 
     @lazy_property
     def all(self):
         """A set of all tests in all runs."""
         all_ = set()
-        for res in self.__results:
-            for key, value in six.iteritems(res.tests):
-                if not value.subtests:
-                    all_.add(key)
-                else:
-                    for subt in six.iterkeys(value.subtests):
-                        all_.add(grouptools.join(key, subt))
+        for found in self._found:
+            all_.update(found)
         return all_
 
     @lazy_property
     def changes(self):
-        def handler(names, name, prev, cur):
-            """Handle missing tests.
+        def comparator(prev, cur):
+            # Tests missing from a run are notrun. Any case of a != b counts,
+            # except skip <-> notrun when the test is missing from a run
+            if prev is not None and cur is not None:
+                return prev != cur
+            prev = so.NOTRUN if prev is None else prev
+            cur = so.NOTRUN if cur is None else cur
+            return cur != prev and {cur, prev} != {so.SKIP, so.NOTRUN}
 
-            For changes we want literally anything where the first result
-            isn't the same as the second result.
-
-            """
-            def _get(res):
-                try:
-                    return res.get_result(name)
-                except KeyError:
-                    return so.NOTRUN
-
-            # Add any case of a != b except skip <-> notrun
-            cur = _get(cur)
-            prev = _get(prev)
-            if cur != prev and {cur, prev} != {so.SKIP, so.NOTRUN}:
-                names.add(name)
-
-        return self.__diff(operator.ne, handler=handler)
+        return self.__diff(comparator)
 
     @lazy_property
     def problems(self):
@@ -140,33 +138,33 @@ class Names(object):
     def regressions(self):
         # By ensureing tha min(x, y) is >= so.PASS we eleminate NOTRUN and SKIP
         # from these pages
-        return self.__diff(lambda x, y: x < y and min(x, y) >= so.PASS)
+        return self.__diff(lambda x, y: x is not None and y is not None and
+                           x < y and min(x, y) >= so.PASS)
 
     @lazy_property
     def fixes(self):
         # By ensureing tha min(x, y) is >= so.PASS we eleminate NOTRUN and SKIP
         # from these pages
-        return self.__diff(lambda x, y: x > y and min(x, y) >= so.PASS)
+        return self.__diff(lambda x, y: x is not None and y is not None and
+                           x > y and min(x, y) >= so.PASS)
 
     @lazy_property
     def enabled(self):
-        def handler(names, name, prev, cur):
-            if _result_in(name, cur) and not _result_in(name, prev):
-                names.add(name)
+        def comparator(prev, cur):
+            if prev is None or cur is None:
+                return prev is None and cur is not None
+            return prev is so.NOTRUN and cur is not so.NOTRUN
 
-        return self.__diff(
-            lambda x, y: x is so.NOTRUN and y is not so.NOTRUN,
-            handler=handler)
+        return self.__diff(comparator)
 
     @lazy_property
     def disabled(self):
-        def handler(names, name, prev, cur):
-            if _result_in(name, prev) and not _result_in(name, cur):
-                names.add(name)
+        def comparator(prev, cur):
+            if prev is None or cur is None:
+                return prev is not None and cur is None
+            return prev is not so.NOTRUN and cur is so.NOTRUN
 
-        return self.__diff(
-            lambda x, y: x is not so.NOTRUN and y is so.NOTRUN,
-            handler=handler)
+        return self.__diff(comparator)
 
     @lazy_property
     def incomplete(self):
@@ -271,6 +269,90 @@ class Counts(object):
         return [len(x) for x in self.__names.incomplete]
 
 
+# The statuses of _StatusMatrix, indexed by code. None is a missing test.
+_STATUSES = so.ALL + (None,)
+_MISSING = len(so.ALL)
+# Statuses hash and compare by name, so copies of a status (from a pickle, for
+# example) find the same code.
+_CODES = {s: i for i, s in enumerate(_STATUSES)}
+# The code of a pair of codes is prev * len(_STATUSES) + cur, _SCALE is a
+# translate table multiplying the code of prev.
+_SCALE = bytes(bytearray(
+    (i * len(_STATUSES)) % 256 for i in six.moves.range(256)))
+
+
+class _StatusMatrix(object):
+    """The statuses of every test in every run, aligned by name.
+
+    The status of each test in each run is looked up once, and stored as a
+    code: its index in status.ALL, or _MISSING if the run doesn't have the
+    test. Each run is a bytearray of codes in the order of names.
+
+    Categories are defined by functions of one status, or of the statuses of
+    a test in two consecutive runs, where a missing test is None. Rather than
+    calling them for every test, they are called once for every code (or pair
+    of codes) to make a table, which bytearray.translate applies to a whole
+    run at once. The names in each category are then picked out by
+    itertools.compress.
+
+    Arguments:
+    results -- a list of results.TestrunResult instances
+    names -- an iterable of the names of the tests in all of the results
+    found -- a list of a dict of the names and statuses yielded by
+             TestrunResult.iterresults, for each result
+    """
+    def __init__(self, results, names, found):
+        self.names = list(names)
+        self.runs = [self._codes(r, f) for r, f in zip(results, found)]
+
+    def _codes(self, result, found):
+        """Return the codes of the statuses of names in result."""
+        codes = bytearray(
+            map(_CODES.__getitem__, map(found.get, self.names)))
+
+        # Tests with subtests aren't yielded by iterresults, but can still be
+        # looked up, and be in names if a test in another run has no subtests.
+        missing = six.int2byte(_MISSING)
+        i = codes.find(missing)
+        while i != -1:
+            try:
+                codes[i] = _CODES[result.get_result(self.names[i])]
+            except KeyError:
+                pass
+            i = codes.find(missing, i + 1)
+        return codes
+
+    @staticmethod
+    def _table(values):
+        """Return a translate table mapping each code to 0 or 1."""
+        table = bytearray(256)
+        for i, value in enumerate(values):
+            table[i] = 1 if value else 0
+        return bytes(table)
+
+    def single(self, func):
+        """Return a set for each run, of the names for which func(status) is
+        True.
+        """
+        table = self._table(func(s) for s in _STATUSES)
+        return [set(itertools.compress(self.names, codes.translate(table)))
+                for codes in self.runs]
+
+    def diff(self, func):
+        """Return a set for each pair of consecutive runs, of the names for
+        which func(prev, cur) is True.
+        """
+        table = self._table(func(p, c) for p in _STATUSES
+                            for c in _STATUSES)
+        diffs = []
+        for prev, cur in zip(self.runs[:-1], self.runs[1:]):
+            pairs = bytearray(map(operator.add, prev.translate(_SCALE),
+                                  cur))
+            diffs.append(set(itertools.compress(
+                self.names, pairs.translate(table))))
+        return diffs
+
+
 def escape_filename(key):
     """Avoid reserved characters in filenames."""
     return re.sub(r'[<>:"|?*#]', '_', key)
@@ -281,17 +363,6 @@ def escape_pathname(key):
     return re.sub(r'[/\\]', '_', key)
 
 
-def _result_in(name, result):
-    """If a result (or a subtest result) exists return True, else False."""
-    try:
-        # This is a little hacky, but I don't know of a better way where we
-        # ensure the value is truthy
-        _ = result.get_result(name)
-        return True
-    except KeyError:
-        return False
-
-
 def find_diffs(results, tests, comparator, handler=lambda *a: None):
     """Generate diffs between two or more sets of results.
 
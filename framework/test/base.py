@@ -34,6 +34,7 @@ import itertools
 import abc
 import copy
 import signal
+import threading
 import warnings
 
 import six
@@ -106,6 +107,7 @@ elif six.PY3:
 
 
 __all__ = [
+    'LazyTest',
     'Test',
     'TestIsSkip',
     'TestRunError',
@@ -126,6 +128,17 @@ class TestIsSkip(exceptions.PiglitException):
         self.reason = reason
 
 
+class _CommunicateTimeout(subprocess.TimeoutExpired):
+    """Raised by ReducedProcessMixin._communicate if the process timed out.
+
+    The output read before the process was killed is stored as read, a tuple
+    of (stdout, stderr).
+    """
+    def __init__(self, cmd, timeout, out, err):
+        super(_CommunicateTimeout, self).__init__(cmd, timeout)
+        self.read = (out, err)
+
+
 class TestRunError(exceptions.PiglitException):
     """Exception raised if the test fails to run."""
     def __init__(self, message, status):
@@ -334,10 +347,7 @@ class Test(object):
                                     **_EXTRA_POPEN_ARGS)
 
             self.result.pid.append(proc.pid)
-            if not _SUPPRESS_TIMEOUT:
-                out, err = proc.communicate(timeout=self.timeout)
-            else:
-                out, err = proc.communicate()
+            out, err = self._communicate(proc)
             returncode = proc.returncode
         except OSError as e:
             # Different sets of tests get built under different build
@@ -347,22 +357,28 @@ class Test(object):
                 raise TestRunError("Test executable not found.\n", 'skip')
             else:
                 raise e
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             # This can only be reached if subprocess32 is present or on python
             # 3.x, since # TimeoutExpired is never raised by the python 2.7
             # fallback code.
 
-            proc.terminate()
+            if isinstance(e, _CommunicateTimeout):
+                # ReducedProcessMixin._communicate already killed the process
+                # and read all of its output.
+                self.result.out, self.result.err = e.read
+            else:
+                proc.terminate()
 
-            # XXX: This is probably broken on windows, since os.getpgid doesn't
-            # exist on windows. What is the right way to handle this?
-            if proc.poll() is None:
-                time.sleep(3)
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+                # XXX: This is probably broken on windows, since os.getpgid
+                # doesn't exist on windows. What is the right way to handle
+                # this?
+                if proc.poll() is None:
+                    time.sleep(3)
+                    os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
 
-            # Since the process isn't running it's safe to get any remaining
-            # stdout/stderr values out and store them.
-            self.result.out, self.result.err = proc.communicate()
+                # Since the process isn't running it's safe to get any
+                # remaining stdout/stderr values out and store them.
+                self.result.out, self.result.err = proc.communicate()
 
             raise TestRunError(
                 'Test run time exceeded timeout value ({} seconds)\n'.format(
@@ -374,6 +390,16 @@ class Test(object):
         self.result.err = err
         self.result.returncode = returncode
 
+    def _communicate(self, proc):
+        """Wait for proc to exit and return its stdout and stderr.
+
+        Raises subprocess.TimeoutExpired if the process doesn't exit before the
+        timeout of the test.
+        """
+        if not _SUPPRESS_TIMEOUT:
+            return proc.communicate(timeout=self.timeout)
+        return proc.communicate()
+
     def __eq__(self, other):
         return self.command == other.command
 
@@ -381,6 +407,53 @@ class Test(object):
         return not self == other
 
 
+class LazyTest(object):
+    """A placeholder for a Test that is only created when it is needed.
+
+    A LazyTest can be used anywhere a TestDict expects a Test. It keeps only
+    what is needed to create the test, and what the scheduler needs to know
+    about it, so that a large profile doesn't hold a Test instance (with its
+    own TestResult, command, and environment) for every test for the whole
+    run.
+
+    The class of the test is reported as the __class__ of the LazyTest, so
+    isinstance checks in profile filters work without creating the test.
+
+    Arguments:
+    test_class -- a Test derived class
+    args       -- a list of positional arguments to pass to test_class
+
+    Keyword Arguments:
+    kwargs         -- a dict of keyword arguments to pass to test_class.
+                      Default: None
+    run_concurrent -- the value test_class will set for run_concurrent.
+                      Default: the value of kwargs['run_concurrent'], or False
+    """
+    __slots__ = ['test_class', 'args', 'kwargs', 'run_concurrent']
+
+    def __init__(self, test_class, args, kwargs=None, run_concurrent=None):
+        self.test_class = test_class
+        self.args = args
+        self.kwargs = kwargs or {}
+        if run_concurrent is None:
+            run_concurrent = self.kwargs.get('run_concurrent', False)
+        self.run_concurrent = run_concurrent
+
+    @property
+    def __class__(self):
+        return self.test_class
+
+    def __reduce_ex__(self, _):
+        # The default implementation would use __class__, and pickle the
+        # test_class instead of the LazyTest
+        return (LazyTest, (self.test_class, self.args, self.kwargs,
+                           self.run_concurrent))
+
+    def create(self):
+        """Create and return the Test instance."""
+        return self.test_class(*self.args, **self.kwargs)
+
+
 class WindowResizeMixin(object):
     """ Mixin class that deals with spurious window resizes
 
@@ -471,6 +544,7 @@ class ReducedProcessMixin(object):
         assert subtests is not None
         super(ReducedProcessMixin, self).__init__(command, **kwargs)
         self._expected = subtests
+        self.__started = None
         self._populate_subtests()
 
     def is_skip(self):
@@ -480,9 +554,65 @@ class ReducedProcessMixin(object):
         super(ReducedProcessMixin, self).is_skip()
 
     def __find_sub(self):
-        """Helper for getting the next index."""
-        return len([l for l in self.result.out.split('\n')
-                    if self._is_subtest(l)])
+        """Helper for getting the number of subtests the last process started.
+
+        This is counted by _communicate as the output is read, it's only
+        counted here if _communicate wasn't used to run the process.
+        """
+        if self.__started is not None:
+            return self.__started
+        return sum(1 for l in self.result.out.split('\n')
+                   if self._is_subtest(l))
+
+    def _communicate(self, proc):
+        """Read stdout as it's written, counting the subtests that start.
+
+        This means that how far the process got is already known when it
+        exits, so if it crashed the resumed process can be started straight
+        away.
+        """
+        err = []
+        reader = threading.Thread(
+            target=lambda: err.append(proc.stderr.read()))
+        reader.daemon = True
+        reader.start()
+
+        expired = []
+        timer = None
+        if self.timeout and not _SUPPRESS_TIMEOUT:
+            def expire():
+                expired.append(True)
+                try:
+                    if _EXTRA_POPEN_ARGS.get('start_new_session'):
+                        os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+                    else:
+                        proc.kill()
+                except OSError:
+                    pass
+
+            timer = threading.Timer(self.timeout, expire)
+            timer.daemon = True
+            timer.start()
+
+        out = []
+        self.__started = 0
+        try:
+            for line in iter(proc.stdout.readline, ''):
+                out.append(line)
+                if self._is_subtest(line):
+                    self.__started += 1
+            proc.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            reader.join()
+
+        out = ''.join(out)
+        err = err[0] if err else ''
+        if expired:
+            raise _CommunicateTimeout(
+                getattr(proc, 'args', None), self.timeout, out, err)
+        return out, err
 
     @staticmethod
     def _subtest_name(test):
@@ -506,6 +636,7 @@ class ReducedProcessMixin(object):
         together for parsing later. I will separate those values with
         "\n\n====RESUME====\n\n".
         """
+        self.__started = None
         super(ReducedProcessMixin, self)._run_command(*args, **kwargs)
 
         if not self._is_cherry():
@@ -520,6 +651,7 @@ class ReducedProcessMixin(object):
                     self._subtest_name(self._expected[cur_sub - 1])] = \
                         self._stop_status()
 
+                self.__started = None
                 super(ReducedProcessMixin, self)._run_command(
                     _command=self._resume(cur_sub) + list(args), **kwargs)
 
@@ -22,8 +22,11 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import abc
+import collections
 import os
+import re
 import subprocess
+import tempfile
 try:
     from lxml import etree as et
 except ImportError:
@@ -32,13 +35,16 @@ except ImportError:
 import six
 from six.moves import range
 
-from framework import core, grouptools, exceptions
+from framework import cache, core, grouptools, exceptions
 from framework import options
-from framework.profile import TestProfile
-from framework.test.base import Test, is_crash_returncode, TestRunError
+from framework.profile import RegexFilter, TestProfile
+from framework.test.base import (
+    Test, is_crash_returncode, TestRunError, ReducedProcessMixin
+)
 
 __all__ = [
     'DEQPBaseTest',
+    'DEQPBatchTest',
     'gen_caselist_txt',
     'get_option',
     'iter_deqp_test_cases',
@@ -69,6 +75,14 @@ _EXTRA_ARGS = get_option('PIGLIT_DEQP_EXTRA_ARGS',
                          ('deqp', 'extra_args'),
                          default='').split()
 
+# The caselists generated by gen_caselist_txt, indexed by the dEQP binary
+_CASELISTS = cache.FileIndex('deqp_caselist', 1)
+
+# The largest number of cases run by a single dEQP process, see DEQPBatchTest
+_BATCH_SIZE = int(get_option('PIGLIT_DEQP_BATCH_SIZE',
+                             ('deqp', 'batch_size'),
+                             default='100'))
+
 
 def select_source(bin_, filename, mustpass, extra_args):
     """Return either the mustpass list or the generated list."""
@@ -79,8 +93,26 @@ def select_source(bin_, filename, mustpass, extra_args):
             gen_caselist_txt(bin_, filename, extra_args))
 
 
-def make_profile(test_list, test_class):
-    """Create a TestProfile instance."""
+def make_profile(test_list, test_class, batch_class=None):
+    """Create a TestProfile instance.
+
+    If batch_class is given, and batching isn't disabled by setting
+    [deqp]:batch_size to 0, the cases of each group are run by a single
+    batch_class instance, named for the group. Each case is a subtest, so it
+    still has its own name in the results.
+
+    """
+    if batch_class is not None and _BATCH_SIZE > 0:
+        profile = _BatchProfile()
+        groups = collections.OrderedDict()
+        for testname in test_list:
+            group, case = testname.rsplit('.', 1)
+            groups.setdefault(group, []).append(case)
+        for group, cases in six.iteritems(groups):
+            piglit_name = group.replace('.', grouptools.SEPARATOR)
+            profile.test_list[piglit_name] = batch_class(group, cases)
+        return profile
+
     profile = TestProfile()
     for testname in test_list:
         # deqp uses '.' as the testgroup separator.
@@ -90,23 +122,70 @@ def make_profile(test_list, test_class):
     return profile
 
 
-def gen_mustpass_tests(mp_list):
-    """Return a testlist from the mustpass list."""
-    root = et.parse(mp_list).getroot()
-    group = []
+class _BatchProfile(TestProfile):
+    """A TestProfile of DEQPBatchTests, which are filtered by case.
+
+    Each case keeps its own name, the name of its batch joined with the name of
+    the case, so forced test lists and filters select cases, and the selected
+    cases of each batch are run by a new batch. Filters that include tests
+    only have to match the name of a case, other filters (like the filter of
+    tests that have already run when resuming) have to accept the names of
+    both the case and its batch. Forced test lists may name either.
+    """
+
+    def _iterentries(self):
+        if not self.filters and not self.forced_test_list:
+            for entry in super(_BatchProfile, self)._iterentries():
+                yield entry
+            return
 
-    def gen(base):
-        for elem in base:
-            if elem.tag == 'Test':
-                yield '{}.{}'.format('.'.join(group), elem.get('name'))
+        forced = None
+        if self.forced_test_list:
+            forced = set(n.lower() for n in self.forced_test_list)
+        includes = [f for f in self.filters
+                    if isinstance(f, RegexFilter) and not f.inverse]
+        others = [f for f in self.filters if f not in includes]
+
+        # pylint: disable=protected-access
+        for name, test in self.test_list.iterentries():
+            if not all(f(name, test) for f in others):
+                continue
+            if forced is None or name.lower() in forced:
+                cases = test._expected
             else:
-                group.append(elem.get('name'))
-                for test in gen(elem):
-                    yield test
-                del group[-1]
+                cases = [c for c in test._expected
+                         if grouptools.join(name, c).lower() in forced]
+            cases = [c for c in cases
+                     if all(f(grouptools.join(name, c), test)
+                            for f in self.filters)]
+
+            if len(cases) == len(test._expected):
+                yield name, test
+            elif cases:
+                yield name, type(test)(test._group, cases)
+
+
+def gen_mustpass_tests(mp_list):
+    """Return a testlist from the mustpass list.
 
-    for test in gen(root):
-        yield test
+    The list is parsed incrementally, so the first tests are returned before
+    the whole file has been read, and only the elements of the group being
+    parsed are kept in memory.
+
+    """
+    # The names of the elements the current element is in, the first is the
+    # TestPackage, which isn't part of the test names
+    group = []
+
+    for event, elem in et.iterparse(mp_list, events=('start', 'end')):
+        if elem.tag == 'Test':
+            if event == 'end':
+                yield '{}.{}'.format('.'.join(group[1:]), elem.get('name'))
+        elif event == 'start':
+            group.append(elem.get('name'))
+        else:
+            del group[-1]
+            elem.clear()
 
 
 def gen_caselist_txt(bin_, caselist, extra_args):
@@ -126,18 +205,42 @@ def gen_caselist_txt(bin_, caselist, extra_args):
     #      build host. In other words, when the build host and test target
     #      differ then we cannot pre-generate the caselist on the build host:
     #      we must *dynamically* generate it during the testrun.
+    #
+    # Generating the list can take minutes for the larger suites, so the list
+    # is only regenerated if the binary, the extra arguments, or the list
+    # itself have changed since the last time it was generated.
     basedir = os.path.dirname(bin_)
     caselist_path = os.path.join(basedir, caselist)
 
-    # TODO: need to catch some exceptions here...
-    with open(os.devnull, 'w') as d:
-        subprocess.check_call(
-            [bin_, '--deqp-runmode=txt-caselist'] + extra_args, cwd=basedir,
-            stdout=d, stderr=d)
-    assert os.path.exists(caselist_path)
+    def generate(_):
+        # TODO: need to catch some exceptions here...
+        with open(os.devnull, 'w') as d:
+            subprocess.check_call(
+                [bin_, '--deqp-runmode=txt-caselist'] + extra_args,
+                cwd=basedir, stdout=d, stderr=d)
+        assert os.path.exists(caselist_path)
+        return _caselist_key(caselist_path, extra_args)
+
+    if _CASELISTS.get(bin_, generate) != \
+            _caselist_key(caselist_path, extra_args):
+        _CASELISTS.set(bin_, generate(bin_))
     return caselist_path
 
 
+def _caselist_key(caselist_path, extra_args):
+    """Return what a generated caselist is cached with.
+
+    This is the arguments it was generated with, and its modification time and
+    size, or None if it doesn't exist.
+
+    """
+    try:
+        stat = os.stat(caselist_path)
+    except OSError:
+        return None
+    return [caselist_path, list(extra_args), stat.st_mtime, stat.st_size]
+
+
 def iter_deqp_test_cases(case_file):
     """Iterate over original dEQP testcase names."""
     with open(case_file, 'r') as caselist_file:
@@ -153,7 +256,7 @@ def iter_deqp_test_cases(case_file):
 
 @six.add_metaclass(abc.ABCMeta)
 class DEQPBaseTest(Test):
-    __RESULT_MAP = {
+    _RESULT_MAP = {
         "Pass": "pass",
         "Fail": "fail",
         "QualityWarning": "warn",
@@ -199,7 +302,7 @@ class DEQPBaseTest(Test):
         # otherwise this requires some break/else/continue madness
         for line in self.result.out.split('\n'):
             line = line.lstrip()
-            for k, v in six.iteritems(self.__RESULT_MAP):
+            for k, v in six.iteritems(self._RESULT_MAP):
                 if line.startswith(k):
                     self.result.result = v
                     return
@@ -226,3 +329,113 @@ class DEQPBaseTest(Test):
             return
 
         raise TestRunError('Failed to connect to X server 5 times', 'fail')
+
+
+@six.add_metaclass(abc.ABCMeta)
+class DEQPBatchTest(ReducedProcessMixin, DEQPBaseTest):
+    """Runs the cases of a dEQP group in as few processes as possible.
+
+    Starting dEQP, creating a context and warming up the shader compiler
+    often take longer than a case does, so rather than a process per case the
+    cases are passed to dEQP with --deqp-caselist-file, up to
+    [deqp]:batch_size cases per process. Each case is a subtest. If dEQP
+    crashes the case it was running is marked crash, and a new process is
+    started with the cases after it.
+
+    Arguments:
+    group -- the dEQP name of the group the cases are in
+    cases -- a list of the names of the cases, without the group
+
+    """
+    _CASE = re.compile(r"^Test case '(?P<name>.+)'\.\.$")
+
+    def __init__(self, group, cases):
+        # The command DEQPBaseTest makes from the group is never run, see
+        # command
+        super(DEQPBatchTest, self).__init__(group, subtests=cases)
+        self._group = group
+        self._caselist = None
+        self._end = 0
+
+    @Test.command.getter
+    def command(self):
+        """Return the command to run the cases in the caselist file."""
+        return [self.deqp_bin,
+                '--deqp-caselist-file={}'.format(self._caselist)] + \
+            self.extra_args
+
+    def _write_caselist(self, start):
+        """Write the cases of the batch starting at start to the caselist."""
+        self._end = min(start + _BATCH_SIZE, len(self._expected))
+        with open(self._caselist, 'w') as f:
+            for case in self._expected[start:self._end]:
+                f.write('{}.{}\n'.format(self._group, case))
+
+        # The timeout of the class is for a single case
+        timeout = type(self).timeout
+        if timeout is not None:
+            self.timeout = timeout * (self._end - start)
+
+    def _run_command(self, *args, **kwargs):
+        fd, self._caselist = tempfile.mkstemp(prefix='piglit-deqp-',
+                                              suffix='.txt')
+        os.close(fd)
+        try:
+            self._write_caselist(0)
+            super(DEQPBatchTest, self)._run_command(*args, **kwargs)
+        finally:
+            os.unlink(self._caselist)
+
+    def _resume(self, current):
+        self._write_caselist(current)
+        return self.command
+
+    def _is_subtest(self, line):
+        return line.startswith("Test case '")
+
+    def _is_cherry(self):
+        # A process that exits cleanly may have only run a batch of the cases
+        return self.result.returncode == 0 and \
+            self._end >= len(self._expected)
+
+    def _case_result(self, lines):
+        """Return the result of a case from the lines it printed.
+
+        Returns None if the lines don't include a result, which happens if the
+        case crashed.
+        """
+        for line in lines:
+            line = line.lstrip()
+            for k, v in six.iteritems(self._RESULT_MAP):
+                if line.startswith(k):
+                    return v
+        return None
+
+    def interpret_result(self):
+        # The status of the batch itself, which is only used if the cases
+        # don't have a status, or the process crashed
+        super(DEQPBatchTest, self).interpret_result()
+
+        prefix = len(self._group) + 1
+        cases = []
+        lines = None
+        for line in self.result.out.split('\n'):
+            match = self._CASE.match(line)
+            if match:
+                lines = []
+                cases.append((match.group('name')[prefix:], lines))
+            elif line.startswith('DONE!') or line == '====RESUME====':
+                # The totals of the run, or the start of the next process
+                lines = None
+            elif lines is not None:
+                lines.append(line)
+
+        # Cases that were never started are left as notrun
+        for case, lines in cases:
+            result = self._case_result(lines)
+            if result is not None:
+                self.result.subtests[case] = result
+            elif self.result.subtests[case] == 'notrun':
+                # The case started but never finished. This is normally
+                # already marked by _run_command.
+                self.result.subtests[case] = 'crash'
@@ -30,8 +30,9 @@ import re
 import io
 import six
 
+from framework import cache
 from framework import exceptions
-from .base import TestIsSkip
+from .base import LazyTest, TestIsSkip
 from .opengl import FastSkipMixin
 from .piglit_test import PiglitBaseTest, TEST_BIN_DIR
 
@@ -52,6 +53,11 @@ else:
 # built
 _FORCE_DESKTOP_VERSION = os.environ.get('PIGLIT_FORCE_GLSLPARSER_DESKTOP', False)
 
+# The config blocks of the files that have been parsed. Files without a config
+# block are stored as None, since most of the files of the legacy glslparsertest
+# directory don't have one.
+_CACHE = cache.FileIndex('glsl_parser_test', 1)
+
 
 def _is_gles_version(version):
     """Return True if version is es, otherwsie false."""
@@ -78,6 +84,21 @@ class GLSLParserInternalError(exceptions.PiglitInternalError):
     pass
 
 
+def _read_config(filepath):
+    """Read the config block of filepath, see Parser.read_config."""
+    return Parser.read_config(filepath)
+
+
+def prefetch(filenames, pool):
+    """Parse any of filenames that aren't cached, using a process pool.
+
+    Arguments:
+    filenames -- a list of paths to glslparser test files
+    pool      -- a multiprocessing.Pool instance
+    """
+    _CACHE.prefetch(filenames, _read_config, pool)
+
+
 class Parser(object):
     """Find and parse the config block of a GLSLParserTest.
 
@@ -90,16 +111,14 @@ class Parser(object):
                               'require_extensions', 'check_link'])
 
     def __init__(self, filepath):
-        # a set that stores a list of keys that have been found already
-        self.__found_keys = set()
         self.gl_required = set()
         self.glsl_es_version = None
         self.glsl_version = None
 
         try:
-            with io.open(filepath, mode='r', encoding='utf-8') as testfile:
-                testfile = testfile.read()
-                self.config = self.parse(testfile, filepath)
+            self.config = _CACHE.get(filepath, self.read_config)
+            if self.config is None:
+                raise GLSLParserNoConfigError("No [config] section found!")
             self.command = self.get_command(filepath)
         except GLSLParserInternalError as e:
             raise exceptions.PiglitFatalError(
@@ -107,6 +126,18 @@ class Parser(object):
 
         self.set_skip_conditions()
 
+    @classmethod
+    def read_config(cls, filepath):
+        """Read and parse the config block of filepath.
+
+        Returns None if the file has no config block.
+        """
+        with io.open(filepath, mode='r', encoding='utf-8') as testfile:
+            try:
+                return cls.parse(testfile.read(), filepath)
+            except GLSLParserNoConfigError:
+                return None
+
     def set_skip_conditions(self):
         """Set OpenGL and OpenGL ES fast skipping conditions."""
         glsl = self.config['glsl_version']
@@ -186,7 +217,8 @@ class Parser(object):
 
         return command
 
-    def parse(self, testfile, filepath):
+    @classmethod
+    def parse(cls, testfile, filepath):
         """ Private helper that parses the config file
 
         This method parses the lines of text file, and then returns a
@@ -198,6 +230,9 @@ class Parser(object):
         """
         keys = {'require_extensions': '', 'check_link': 'false'}
 
+        # a set that stores a list of keys that have been found already
+        found_keys = set()
+
         # Text of config section.
         # Create a generator that iterates over the lines in the test file.
         # This allows us to run the loop until we find the header, stop and
@@ -228,12 +263,12 @@ class Parser(object):
 
             match = is_metadata.match(line)
             if match:
-                if match.group('key') not in self._CONFIG_KEYS:
+                if match.group('key') not in cls._CONFIG_KEYS:
                     raise GLSLParserInternalError(
                         "Key {} is not a valid key for a "
                         "glslparser test config block".format(
                             match.group('key')))
-                elif match.group('key') in self.__found_keys:
+                elif match.group('key') in found_keys:
                     # If this key has already been encountered throw an error,
                     # there are no duplicate keys allows
                     raise GLSLParserInternalError(
@@ -252,7 +287,7 @@ class Parser(object):
 
                     # Otherwise add the key to the set of found keys, and add
                     # it to the dictionary that will be returned
-                    self.__found_keys.add(match.group('key'))
+                    found_keys.add(match.group('key'))
                     keys[match.group('key')] = match.group('value')
             else:
                 raise GLSLParserInternalError(
@@ -281,6 +316,17 @@ class GLSLParserTest(FastSkipMixin, PiglitBaseTest):
             glsl_version=parsed.glsl_version,
             glsl_es_version=parsed.glsl_es_version)
 
+    @classmethod
+    def lazy(cls, filepath):
+        """Return a LazyTest for filepath.
+
+        The file is parsed (or taken from the cache) right away, so
+        GLSLParserNoConfigError and errors in the config are raised here
+        rather than when the test runs.
+        """
+        Parser(filepath)
+        return LazyTest(cls, [filepath], run_concurrent=True)
+
     def is_skip(self):
         if os.path.basename(self.command[0]) == 'None':
             raise TestIsSkip('Test is for desktop OpenGL, '
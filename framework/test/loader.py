@@ -0,0 +1,105 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Helpers for building profiles out of test files on disk.
+
+Profiles like all.py create a test for each shader_test and glslparser test
+file in the source tree. Creating those tests means reading and parsing every
+file, which is independent per file. prefetch parses the files in a process
+pool and stores the values in the caches of the shader_test and
+glsl_parser_test modules, so that the tests themselves can be created in the
+profile's own, deterministic, order without parsing anything.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import multiprocessing
+import os
+
+from . import glsl_parser_test, shader_test
+
+__all__ = [
+    'find',
+    'prefetch',
+]
+
+_PREFETCHERS = {
+    '.shader_test': shader_test.prefetch,
+    '.vert': glsl_parser_test.prefetch,
+    '.tesc': glsl_parser_test.prefetch,
+    '.tese': glsl_parser_test.prefetch,
+    '.geom': glsl_parser_test.prefetch,
+    '.frag': glsl_parser_test.prefetch,
+    '.comp': glsl_parser_test.prefetch,
+}
+
+# Starting a pool is slower than parsing a few files
+_MIN_PARALLEL = 256
+
+
+def find(basedirs, extensions):
+    """Yield (basedir, dirpath, filename) for files with one of extensions.
+
+    Directories and files are walked in sorted order, so the order is the
+    same regardless of the order the filesystem returns them in.
+
+    Arguments:
+    basedirs   -- a list of directories to search
+    extensions -- a list of extensions, including the leading '.'
+    """
+    for basedir in basedirs:
+        for dirpath, dirnames, filenames in os.walk(basedir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1] in extensions:
+                    yield basedir, dirpath, filename
+
+
+def prefetch(filenames, processes=None):
+    """Parse shader_test and glslparser test files in parallel.
+
+    Files of other types are ignored, as are files that fail to parse, which
+    will raise the same error when the test is created.
+
+    Arguments:
+    filenames -- a list of paths to test files
+
+    Keyword Arguments:
+    processes -- the number of worker processes. Default: the number of CPUs
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if processes < 2 or len(filenames) < _MIN_PARALLEL:
+        return
+
+    grouped = {}
+    for filename in filenames:
+        func = _PREFETCHERS.get(os.path.splitext(filename)[1])
+        if func is not None:
+            grouped.setdefault(func, []).append(filename)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for func, files in grouped.items():
+            func(files, pool)
+    finally:
+        pool.close()
+        pool.join()
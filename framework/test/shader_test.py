@@ -26,20 +26,46 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import collections
 import io
 import os
 import re
 
+import six
+
+from framework import cache
 from framework import exceptions
+from framework import grouptools
 from framework import status
-from .base import ReducedProcessMixin, TestIsSkip
+from .base import LazyTest, ReducedProcessMixin, TestIsSkip
 from .opengl import FastSkipMixin, FastSkip
 from .piglit_test import PiglitBaseTest
 
 __all__ = [
+    'MultiShaderTest',
     'ShaderTest',
+    'batch_files',
 ]
 
+_CACHE = cache.FileIndex('shader_test', 1)
+
+
+def _parse(filename):
+    """Parse filename, returning the json form of the Parser."""
+    inst = Parser(filename)
+    inst.parse()
+    return inst.to_json()
+
+
+def prefetch(filenames, pool):
+    """Parse any of filenames that aren't cached, using a process pool.
+
+    Arguments:
+    filenames -- a list of paths to shader_test files
+    pool      -- a multiprocessing.Pool instance
+    """
+    _CACHE.prefetch(filenames, _parse, pool)
+
 
 class Parser(object):
     """An object responsible for parsing a shader_test file."""
@@ -126,6 +152,43 @@ class Parser(object):
         else:
             self.prog = 'shader_runner'
 
+    def to_json(self):
+        """Return the parsed values as a json serializable object."""
+        return {
+            'filename': self.filename,
+            'prog': self.prog,
+            'gl_required': sorted(self.gl_required),
+            'gl_version': self._gl_version,
+            'gles_version': self._gles_version,
+            'glsl_version': self._glsl_version,
+            'glsl_es_version': self._glsl_es_version,
+            'op': self.__op,
+            'sl_op': self.__sl_op,
+        }
+
+    @classmethod
+    def from_dict(cls, dict_):
+        """Create an already parsed instance from the output of to_json."""
+        inst = cls(dict_['filename'])
+        inst.prog = dict_['prog']
+        inst.gl_required = set(dict_['gl_required'])
+        inst._gl_version = dict_['gl_version']
+        inst._gles_version = dict_['gles_version']
+        inst._glsl_version = dict_['glsl_version']
+        inst._glsl_es_version = dict_['glsl_es_version']
+        inst.__op = dict_['op']
+        inst.__sl_op = dict_['sl_op']
+        return inst
+
+    @classmethod
+    def cached(cls, filename):
+        """Return a parsed instance for filename.
+
+        If the file hasn't changed since it was last parsed the values are
+        taken from the persistent cache rather than reading the file.
+        """
+        return cls.from_dict(_CACHE.get(filename, _parse))
+
     # FIXME: All of these properties are a work-around for the fact that the
     # FastSkipMixin assumes that operations are always > or >=
 
@@ -155,8 +218,7 @@ class ShaderTest(FastSkipMixin, PiglitBaseTest):
     """
 
     def __init__(self, filename):
-        parser = Parser(filename)
-        parser.parse()
+        parser = Parser.cached(filename)
 
         super(ShaderTest, self).__init__(
             [parser.prog, parser.filename],
@@ -167,6 +229,16 @@ class ShaderTest(FastSkipMixin, PiglitBaseTest):
             glsl_version=parser.glsl_version,
             glsl_es_version=parser.glsl_es_version)
 
+    @classmethod
+    def lazy(cls, filename):
+        """Return a LazyTest for filename.
+
+        The file is parsed (or taken from the cache) right away, so that
+        errors in it are raised here rather than when the test runs.
+        """
+        Parser.cached(filename)
+        return LazyTest(cls, [filename], run_concurrent=True)
+
     @PiglitBaseTest.command.getter
     def command(self):
         """ Add -auto and -fbo to the test command """
@@ -186,22 +258,32 @@ class MultiShaderTest(ReducedProcessMixin, PiglitBaseTest):
 
     Arguments:
     filenames -- a list of absolute paths to shader test files
+
+    Keyword Arguments:
+    names -- a list of the names of the subtests of filenames. Default: the
+             file names without the extension, which is how shader_runner
+             reports them. The file names must still be unique.
     """
 
-    def __init__(self, filenames):
+    def __init__(self, filenames, names=None):
         assert filenames
         prog = None
         files = []
         subtests = []
         skips = []
 
+        # The names of the subtests that shader_runner reports differently
+        self._names = {}
+
         # Walk each subtest, and either add it to the list of tests to run, or
         # determine it is skip, and set the result of that test in the subtests
         # dictionary to skip without adding it ot the liest of tests to run
-        for each in filenames:
-            parser = Parser(each)
-            parser.parse()
+        for i, each in enumerate(filenames):
+            parser = Parser.cached(each)
             subtest = os.path.basename(os.path.splitext(each)[0]).lower()
+            if names is not None and names[i].lower() != subtest:
+                self._names[subtest] = names[i].lower()
+                subtest = names[i].lower()
 
             if prog is not None:
                 # This allows mixing GLES2 and GLES3 shader test files
@@ -281,3 +363,113 @@ class MultiShaderTest(ReducedProcessMixin, PiglitBaseTest):
                 'not supported on this implementation\n') and not
             self.result.out.endswith(
                 'PIGLIT: {"result": "skip" }\n'))
+
+    def interpret_result(self):
+        super(MultiShaderTest, self).interpret_result()
+
+        for reported, name in six.iteritems(self._names):
+            if reported in self.result.subtests:
+                self.result.subtests[name] = self.result.subtests[reported]
+                del self.result.subtests[reported]
+
+
+def batch_files(groups, estimate, target):
+    """Split and merge groups of shader_test files into batches.
+
+    Each group is normally run by a single MultiShaderTest, so groups range
+    from a couple of files to thousands of them. This uses the durations of the
+    files in previous results to make the batches closer to target seconds
+    each:
+
+    - A group that is estimated to take longer than target is split into
+      batches named GROUP@batch0, GROUP@batch1, and so on.
+    - Groups that take less than half of target are merged into a batch named
+      for the group they are in, as long as the files use the same
+      shader_runner binary, and their names don't clash. The subtests of such a
+      batch are named by their path from the batch (SUBGROUP@test), so their
+      full names are the same as when they are run on their own.
+
+    Arguments:
+    groups   -- a dict mapping group names to lists of shader_test files
+    estimate -- a function taking (name, test) and returning the expected
+                duration of a test, like scheduler.DurationEstimator. It is
+                called with the name each file has when run on its own, and
+                None.
+    target   -- the duration in seconds to aim for for each batch
+
+    Returns a list of (name, files, subtests) tuples.
+    """
+    batches = collections.OrderedDict()
+    durations = {}
+    small = collections.defaultdict(list)
+
+    for group, files in six.iteritems(groups):
+        names = [os.path.basename(os.path.splitext(f)[0]).lower()
+                 for f in files]
+        times = [estimate(grouptools.join(group.lower(), n), None)
+                 for n in names]
+        total = sum(times)
+
+        if total > target and len(files) > 1:
+            chunks = [[]]
+            elapsed = 0
+            for name, filename, time_ in zip(names, files, times):
+                if chunks[-1] and elapsed + time_ > target:
+                    chunks.append([])
+                    elapsed = 0
+                chunks[-1].append((name, filename))
+                elapsed += time_
+            for i, chunk in enumerate(chunks):
+                batches[grouptools.join(group, 'batch{}'.format(i))] = chunk
+            continue
+
+        batches[group] = list(zip(names, files))
+        durations[group] = total
+        if total * 2 < target:
+            small[grouptools.groupname(group)].append(group)
+
+    def progs(group):
+        return {Parser.cached(f).prog for _, f in batches[group]}
+
+    # Merge the deepest groups first, so that a merged batch isn't merged
+    # again into the group above it.
+    for parent in sorted(small, key=lambda p: -len(grouptools.split(p))):
+        if not parent:
+            continue
+        if parent in batches:
+            # The parent's own files can only be merged into if they are small
+            if durations.get(parent, target) * 2 >= target:
+                continue
+            merged = [parent]
+        else:
+            merged = []
+        prog = progs(merged[0] if merged else small[parent][0])
+        elapsed = durations.get(parent, 0)
+        reported = set()
+
+        for group in [parent] + small[parent]:
+            if group not in durations or progs(group) != prog:
+                continue
+            if group != parent and elapsed + durations[group] > target:
+                continue
+            names = {n for n, _ in batches[group]}
+            if reported.intersection(names):
+                continue
+            reported.update(names)
+            if group != parent:
+                merged.append(group)
+                elapsed += durations[group]
+
+        if len(merged) < 2:
+            continue
+
+        entries = []
+        for group in merged:
+            prefix = group[len(parent) + 1:]
+            entries.extend((grouptools.join(prefix, n) if prefix else n, f)
+                           for n, f in batches.pop(group))
+            durations.pop(group)
+        batches[parent] = entries
+
+    return [(name, [f for _, f in entries], [n for n, _ in entries])
+            for name, entries in six.iteritems(batches)]
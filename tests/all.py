@@ -13,18 +13,27 @@ import six
 from six.moves import range
 
 from framework import grouptools
+from framework import core
 from framework import options
+from framework import scheduler
 from framework.profile import TestProfile
 from framework.driver_classifier import DriverClassifier
 from framework.test import (PiglitGLTest, GleanTest, PiglitBaseTest,
                             GLSLParserTest, GLSLParserNoConfigError)
-from framework.test.shader_test import ShaderTest, MultiShaderTest
+from framework.test import loader
+from framework.test.shader_test import (ShaderTest, MultiShaderTest,
+                                        batch_files)
 from .py_modules.constants import TESTS_DIR, GENERATED_TESTS_DIR
 
 __all__ = ['profile']
 
 PROCESS_ISOLATION = options.OPTIONS.process_isolation
 
+# The number of seconds each batch of shader tests should take to run, when
+# process isolation is disabled, see batch_files
+BATCH_TIME = float(core.PIGLIT_CONFIG.safe_get('core', 'batch time',
+                                               fallback='10'))
+
 # Disable bad hanging indent errors in pylint
 # There is a bug in pylint which causes the profile.test_list.group_manager to
 # be tagged as bad hanging indent, even though it seems to be correct (and
@@ -210,49 +219,60 @@ profile = TestProfile()  # pylint: disable=invalid-name
 
 shader_tests = collections.defaultdict(list)
 
-# Find and add all shader tests.
-for basedir in [TESTS_DIR, GENERATED_TESTS_DIR]:
-    for dirpath, _, filenames in os.walk(basedir):
-        for filename in filenames:
-            testname, ext = os.path.splitext(filename)
-            groupname = grouptools.from_path(os.path.relpath(dirpath, basedir))
-            if ext == '.shader_test':
-                if PROCESS_ISOLATION:
-                    test = ShaderTest(os.path.join(dirpath, filename))
-                else:
-                    shader_tests[groupname].append(os.path.join(dirpath, filename))
-                    continue
-            elif ext in ['.vert', '.tesc', '.tese', '.geom', '.frag', '.comp']:
-                try:
-                    test = GLSLParserTest(os.path.join(dirpath, filename))
-                except GLSLParserNoConfigError:
-                    # In the event that there is no config assume that it is a
-                    # legacy test, and continue
-                    continue
-
-                # For glslparser tests you can have multiple tests with the
-                # same name, but a different stage, so keep the extension.
-                testname = filename
-            else:
-                continue
+# Find and add all shader tests. The files are parsed in parallel up front,
+# then the tests are added in order. They are only created when they run.
+_files = list(loader.find(
+    [TESTS_DIR, GENERATED_TESTS_DIR],
+    ['.shader_test', '.vert', '.tesc', '.tese', '.geom', '.frag', '.comp']))
+loader.prefetch([os.path.join(d, f) for _, d, f in _files])
+
+for basedir, dirpath, filename in _files:
+    testname, ext = os.path.splitext(filename)
+    groupname = grouptools.from_path(os.path.relpath(dirpath, basedir))
+    if ext == '.shader_test':
+        if PROCESS_ISOLATION:
+            test = ShaderTest.lazy(os.path.join(dirpath, filename))
+        else:
+            shader_tests[groupname].append(os.path.join(dirpath, filename))
+            continue
+    else:
+        try:
+            test = GLSLParserTest.lazy(os.path.join(dirpath, filename))
+        except GLSLParserNoConfigError:
+            # In the event that there is no config assume that it is a
+            # legacy test, and continue
+            continue
+
+        # For glslparser tests you can have multiple tests with the
+        # same name, but a different stage, so keep the extension.
+        testname = filename
 
-            group = grouptools.join(groupname, testname)
-            assert group not in profile.test_list, group
+    group = grouptools.join(groupname, testname)
+    assert group not in profile.test_list, group
 
-            profile.test_list[group] = test
+    profile.test_list[group] = test
 
 # Because we need to handle duplicate group names in TESTS and GENERATED_TESTS
 # this dictionary is constructed, then added to the actual test dictionary.
-for group, files in six.iteritems(shader_tests):
+# When the durations of tests in previous results are known the directories are
+# split and merged into batches that take about BATCH_TIME seconds.
+_estimate = scheduler.durations()
+if _estimate is not None:
+    _batches = batch_files(shader_tests, _estimate, BATCH_TIME)
+else:
+    _batches = [(g, f, None) for g, f in six.iteritems(shader_tests)]
+
+for group, files, subtests in _batches:
     assert group not in profile.test_list, 'duplicate group: {}'.format(group)
     # If there is only one file in the directory use a normal shader_test.
     # Otherwise use a MultiShaderTest
     if len(files) == 1:
         group = grouptools.join(
-            group, os.path.basename(os.path.splitext(files[0])[0]))
+            group, subtests[0] if subtests else
+            os.path.basename(os.path.splitext(files[0])[0]))
         profile.test_list[group] = ShaderTest(files[0])
     else:
-        profile.test_list[group] = MultiShaderTest(files)
+        profile.test_list[group] = MultiShaderTest(files, subtests)
 
 # Collect and add all asmparsertests
 for basedir in [TESTS_DIR, GENERATED_TESTS_DIR]:
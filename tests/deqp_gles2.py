@@ -52,8 +52,11 @@ class DEQPGLES2Test(deqp.DEQPBaseTest):
             [x for x in _EXTRA_ARGS if not x.startswith('--deqp-case')]
 
 
+class DEQPGLES2BatchTest(deqp.DEQPBatchTest, DEQPGLES2Test):
+    """Runs the cases of a group of dEQP tests in batches."""
+
 
 profile = deqp.make_profile(  # pylint: disable=invalid-name
     deqp.select_source(_DEQP_GLES2_BIN, 'dEQP-GLES2-cases.txt', _DEQP_MUSTPASS,
                        _EXTRA_ARGS),
-    DEQPGLES2Test)
+    DEQPGLES2Test, DEQPGLES2BatchTest)
@@ -52,7 +52,11 @@ class DEQPGLES31Test(deqp.DEQPBaseTest):
             [x for x in _EXTRA_ARGS if not x.startswith('--deqp-case')]
 
 
+class DEQPGLES31BatchTest(deqp.DEQPBatchTest, DEQPGLES31Test):
+    """Runs the cases of a group of dEQP tests in batches."""
+
+
 profile = deqp.make_profile(  # pylint: disable=invalid-name
     deqp.select_source(_DEQP_GLES31_BIN, 'dEQP-GLES31-cases.txt',
                        _DEQP_MUSTPASS, _EXTRA_ARGS),
-    DEQPGLES31Test)
+    DEQPGLES31Test, DEQPGLES31BatchTest)
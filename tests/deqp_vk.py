@@ -29,6 +29,7 @@ from __future__ import (
 )
 import re
 
+from framework import status
 from framework.test import deqp
 
 __all__ = ['profile']
@@ -71,8 +72,25 @@ class DEQPVKTest(deqp.DEQPBaseTest):
             super(DEQPVKTest, self).interpret_result()
 
 
+class DEQPVKBatchTest(deqp.DEQPBatchTest, DEQPVKTest):
+    """Runs the cases of a group of the Khronos Vulkan CTS in batches."""
+
+    def _case_result(self, lines):
+        if any('Failed to compile shader at vkGlslToSpirV' in l
+               for l in lines):
+            return 'skip'
+        return super(DEQPVKBatchTest, self)._case_result(lines)
+
+    def _stop_status(self):
+        # An internal dEQP assertion aborts the process, the case is a skip
+        # like it is for DEQPVKTest
+        if _DEQP_ASSERT.search(self.result.err):
+            return status.SKIP
+        return super(DEQPVKBatchTest, self)._stop_status()
+
+
 profile = deqp.make_profile(  # pylint: disable=invalid-name
     deqp.iter_deqp_test_cases(
         deqp.gen_caselist_txt(_DEQP_VK_BIN, 'dEQP-VK-cases.txt',
                               _EXTRA_ARGS)),
-    DEQPVKTest)
+    DEQPVKTest, DEQPVKBatchTest)
@@ -36,11 +36,12 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 
+import multiprocessing.dummy
 import os
 import re
 import subprocess
 
-from framework import grouptools, exceptions, core, options
+from framework import grouptools, exceptions, core, options, cache
 from framework import dmesg
 from framework.profile import TestProfile, Test
 
@@ -143,26 +144,44 @@ def list_tests(listname):
     return []
 
 
-def add_subtest_cases(test):
-    """Get subtest instances."""
+# The subtests of each igt binary, see list_subtests
+_SUBTESTS = cache.FileIndex('igt_subtests', 1)
+
+
+def list_subtests(binary):
+    """Return the subtests of an igt binary, or None if it has none.
+
+    Raises subprocess.CalledProcessError if the subtests can't be listed.
+
+    """
     try:
         out = subprocess.check_output(
-            [os.path.join(IGT_TEST_ROOT, test), '--list-subtests'],
+            [binary, '--list-subtests'],
             env=os.environ.copy(),
             universal_newlines=True)
     except subprocess.CalledProcessError as e:
         # a return code of 79 indicates there are no subtests
         if e.returncode == 79:
-            profile.test_list[grouptools.join('igt', test)] = IGTTest(test)
-        elif e.returncode != 0:
-            print("Error: Could not list subtests for " + test)
-        else:
-            raise
+            return None
+        raise
+
+    return [s for s in out.splitlines() if s]
 
-        # If we reach here there are no subtests.
+
+def add_subtest_cases(test):
+    """Get subtest instances."""
+    try:
+        subtests = _SUBTESTS.get(os.path.join(IGT_TEST_ROOT, test),
+                                 list_subtests)
+    except subprocess.CalledProcessError:
+        print("Error: Could not list subtests for " + test)
         return
 
-    for subtest in (s for s in out.splitlines() if s):
+    if subtests is None:
+        profile.test_list[grouptools.join('igt', test)] = IGTTest(test)
+        return
+
+    for subtest in subtests:
         profile.test_list[grouptools.join('igt', test, subtest)] = \
             IGTTest(test, ['--run-subtest', subtest])
 
@@ -172,6 +191,17 @@ def populate_profile():
     for test_list in TEST_LISTS:
         tests.extend(list_tests(test_list))
 
+    # Listing the subtests of a binary is mostly spent waiting on it, so list
+    # the subtests of the binaries that aren't cached using a pool of threads.
+    binaries = [os.path.join(IGT_TEST_ROOT, t) for t in tests]
+    pool = multiprocessing.dummy.Pool(multiprocessing.cpu_count())
+    try:
+        _SUBTESTS.prefetch([b for b in binaries if os.path.exists(b)],
+                           list_subtests, pool, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
     for test in tests:
         add_subtest_cases(test)
 
@@ -0,0 +1,150 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Micro-benchmarks for the hot paths of reading and writing results.
+
+These require pytest-benchmark, and are skipped without it. They take too long
+to run with the unit tests, run them with the benchmark tox environment, or
+with py.test directly:
+
+py.test unittests/benchmarks
+
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import itertools
+
+import pytest
+import six
+
+from framework import backends
+from framework import results
+from framework import status
+
+from ..framework.backends import shared
+
+pytest.importorskip('pytest_benchmark')
+
+# pylint: disable=redefined-outer-name
+
+# Statuses repeated to a list long enough that the time of each call to the
+# benchmarked function dominates the time of the loop calling it.
+STATUSES = list(itertools.islice(itertools.cycle(status.ALL), 10000))
+
+
+@pytest.fixture(scope='module')
+def subtests():
+    """A TestResult with many subtests, like a deqp or igt test."""
+    result = results.TestResult('pass')
+    for i, stat in enumerate(STATUSES[:1000]):
+        result.subtests['subtest {}'.format(i)] = stat
+    return result
+
+
+def test_status_lookup_str(benchmark):
+    """Benchmark status.status_lookup with strings."""
+    names = [six.text_type(s) for s in STATUSES]
+    benchmark(lambda: [status.status_lookup(n) for n in names])
+
+
+def test_status_lookup_status(benchmark):
+    """Benchmark status.status_lookup with Status instances."""
+    benchmark(lambda: [status.status_lookup(s) for s in STATUSES])
+
+
+def test_status_lt(benchmark):
+    """Benchmark ordering statuses, as Names.regressions does."""
+    pairs = list(zip(STATUSES, reversed(STATUSES)))
+    benchmark(lambda: [x < y for x, y in pairs])
+
+
+def test_status_eq(benchmark):
+    """Benchmark comparing statuses for equality, as Names.changes does."""
+    pairs = list(zip(STATUSES, reversed(STATUSES)))
+    benchmark(lambda: [x == y for x, y in pairs])
+
+
+def test_status_max(benchmark):
+    """Benchmark finding the worst of many statuses."""
+    benchmark(max, STATUSES)
+
+
+def test_testresult_result(benchmark, subtests):
+    """Benchmark reading the result of a test with many subtests."""
+    benchmark(lambda: subtests.result)
+
+
+def test_subtest_names_memory(benchmark):
+    """Benchmark the memory used by a run of 200,000 tests with subtests.
+
+    The peak and final sizes of the memory allocated while creating the run
+    are recorded in the extra info of the benchmark.
+    """
+    tracemalloc = pytest.importorskip('tracemalloc')
+
+    def create():
+        run = results.TestrunResult()
+        for i in range(200000):
+            test = results.TestResult('pass')
+            # New strings each time, as when they are loaded from a file
+            for j in range(2):
+                test.subtests['Subtest {}'.format(j)] = 'pass'
+            run.tests['group@test {}'.format(i)] = test
+        return run
+
+    def measure():
+        tracemalloc.start()
+        try:
+            run = create()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['current'] = current
+        benchmark.extra_info['peak'] = peak
+        return run
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize('threads', [1, 2, 4, 8])
+def test_json_finalize(benchmark, mocker, tmpdir, threads):
+    """Benchmark finalizing a gz compressed json run, by compression threads.
+    """
+    mocker.patch('framework.backends.compression.get_mode',
+                 return_value='gz')
+    mocker.patch('framework.backends.compression.get_threads',
+                 return_value=threads)
+    rounds = itertools.count()
+
+    def setup():
+        dest = tmpdir.join(six.text_type(next(rounds)))
+        dest.ensure(dir=True)
+        backend = backends.json.JSONBackend(six.text_type(dest))
+        # Write the whole file in finalize, rather than while tests run
+        backend._incremental = False  # pylint: disable=protected-access
+        backend.initialize(dict(shared.INITIAL_METADATA))
+        for i in range(2000):
+            with backend.write_test('group@test {}'.format(i)) as t:
+                result = results.TestResult('pass')
+                result.out = 'output of test {}\n'.format(i) * 100
+                t(result)
+        return (backend, ), {}
+
+    benchmark.pedantic(lambda b: b.finalize(), setup=setup, rounds=5)
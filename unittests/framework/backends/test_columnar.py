@@ -0,0 +1,162 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Tests for the columnar backend."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import collections
+
+import pytest
+import six
+
+from framework import backends
+from framework import exceptions
+from framework import grouptools
+from framework import results
+from framework import status
+
+from . import shared
+
+# pylint: disable=no-self-use
+
+
+@pytest.fixture
+def testrun():
+    run = results.TestrunResult.from_dict(shared.JSON)
+
+    test = results.TestResult('crash')
+    test.out = 'out \u2603'
+    test.err = 'err'
+    test.returncode = -11
+    test.pid = [1, 2]
+    test.subtests['a'] = 'pass'
+    test.subtests['B'] = 'fail'
+    test.time = results.TimeAttribute(1.0, 2.5)
+    run.tests[grouptools.join('group', 'test')] = test
+    run.totals = collections.defaultdict(results.Totals)
+    run.calculate_group_totals()
+    return run
+
+
+@pytest.fixture
+def loaded(testrun, tmpdir):
+    p = six.text_type(tmpdir.join('results.columnar'))
+    backends.columnar.write_results(testrun, p)
+    return backends.columnar.ColumnarResult(p)
+
+
+class TestColumnarResult(object):
+    """Tests for writing and loading with the ColumnarResult class."""
+
+    def test_names(self, testrun, loaded):
+        assert list(loaded.tests) == list(testrun.tests)
+
+    def test_tests(self, testrun, loaded):
+        """Tests are identical to the ones written."""
+        for name, test in six.iteritems(testrun.tests):
+            assert loaded.tests[name].to_json() == test.to_json()
+
+    def test_metadata(self, testrun, loaded):
+        assert loaded.name == testrun.name
+        assert loaded.options == testrun.options
+        assert loaded.time_elapsed.to_json() == testrun.time_elapsed.to_json()
+
+    def test_totals(self, testrun, loaded):
+        assert loaded.totals == testrun.totals
+
+    def test_lazy(self, loaded):
+        """out and err are read from the file when they are used."""
+        test = loaded.tests[grouptools.join('group', 'test')]
+        # pylint: disable=protected-access
+        assert isinstance(test._out, results.LazyString)
+        assert test.out == 'out \u2603'
+
+    @pytest.mark.parametrize('name, expected', [
+        (grouptools.join('group', 'test'), status.CRASH),
+        (grouptools.join('group', 'test', 'b'), status.FAIL),
+        (grouptools.join('group', 'test', 'A'), status.PASS),
+    ])
+    def test_get_result(self, loaded, name, expected):
+        assert loaded.get_result(name) is expected
+
+    def test_iterresults(self, testrun, loaded):
+        assert list(loaded.iterresults()) == list(testrun.iterresults())
+
+    def test_get_result_missing(self, loaded):
+        with pytest.raises(KeyError):
+            loaded.get_result(grouptools.join('group', 'test', 'c'))
+
+    def test_bad_magic(self, tmpdir):
+        p = tmpdir.join('results.columnar')
+        p.write('not a columnar result')
+        with pytest.raises(exceptions.PiglitFatalError):
+            backends.columnar.ColumnarResult(six.text_type(p))
+
+    def test_empty(self, tmpdir):
+        p = tmpdir.join('results.columnar')
+        p.write('')
+        with pytest.raises(exceptions.PiglitFatalError):
+            backends.columnar.ColumnarResult(six.text_type(p))
+
+
+class TestColumnarBackend(object):
+    """Tests for the ColumnarBackend class."""
+
+    name = grouptools.join('a', 'test')
+
+    @pytest.fixture
+    def backend(self, tmpdir):
+        inst = backends.columnar.ColumnarBackend(six.text_type(tmpdir))
+        inst.initialize(shared.INITIAL_METADATA)
+        with inst.write_test(self.name) as t:
+            t(results.TestResult('pass'))
+        return inst
+
+    def test_finalize(self, backend, tmpdir):
+        backend.finalize(
+            {'time_elapsed': results.TimeAttribute(0.0, 1.0).to_json()})
+        assert tmpdir.join('results.columnar').check()
+        assert not tmpdir.join('tests').check()
+
+        result = backends.load(six.text_type(tmpdir))
+        assert isinstance(result, backends.columnar.ColumnarResult)
+        assert result.get_result(self.name) is status.PASS
+
+    def test_unfinished(self, backend, tmpdir):
+        """An unfinished run can be loaded."""
+        result = backends.load(six.text_type(tmpdir))
+        assert result.tests[self.name].result is status.PASS
+
+    def test_json_files(self, backend, tmpdir):
+        """The files written for each test are json."""
+        assert tmpdir.join('tests', '0.json').check()
+
+    def test_resume(self, backend, tmpdir):
+        """An unfinished run can be finished by a new backend."""
+        _, _, start = backends.json.load_resume(six.text_type(tmpdir))
+        inst = backends.columnar.ColumnarBackend(six.text_type(tmpdir),
+                                                 file_start_count=start)
+        with inst.write_test(grouptools.join('a', 'other')) as t:
+            t(results.TestResult('fail'))
+        inst.finalize()
+
+        result = backends.load(six.text_type(tmpdir))
+        assert isinstance(result, backends.columnar.ColumnarResult)
+        assert result.get_result(grouptools.join('a', 'other')) is status.FAIL
@@ -131,10 +131,19 @@ def compressor():
         yield c
 
 
+requires_zstd = pytest.mark.skipif(  # pylint: disable=invalid-name
+    'zstd' not in compression.COMPRESSORS,
+    reason="zstd requires the zstandard module or the zstd binary.")
+
+requires_lz4 = pytest.mark.skipif(  # pylint: disable=invalid-name
+    'lz4' not in compression.COMPRESSORS,
+    reason="lz4 requires the lz4 module or the lz4 binary.")
+
 # Tests
 
 
-@pytest.mark.parametrize("mode", ['none', 'bz2', 'gz', requires_lzma('xz')])
+@pytest.mark.parametrize("mode", ['none', 'bz2', 'gz', requires_lzma('xz'),
+                                  requires_zstd('zstd'), requires_lz4('lz4')])
 def test_compress(mode, tmpdir):
     """Test that each compressor that we want works.
 
@@ -148,7 +157,8 @@ def test_compress(mode, tmpdir):
         f.write('foo')
 
 
-@pytest.mark.parametrize("mode", ['none', 'bz2', 'gz', requires_lzma('xz')])
+@pytest.mark.parametrize("mode", ['none', 'bz2', 'gz', requires_lzma('xz'),
+                                  requires_zstd('zstd'), requires_lz4('lz4')])
 def test_decompress(mode, tmpdir):
     """Test that each supported decompressor works.
 
@@ -167,6 +177,50 @@ def test_decompress(mode, tmpdir):
     assert actual == 'foo'
 
 
+@pytest.mark.parametrize("mode", ['none', 'bz2', 'gz', requires_lzma('xz'),
+                                  requires_zstd('zstd'), requires_lz4('lz4')])
+def test_detect_mode(mode, tmpdir):
+    """The mode of a file is detected from its contents."""
+    testfile = six.text_type(tmpdir.join('test'))
+    with compression.COMPRESSORS[mode](testfile) as f:
+        f.write('{"foo": 1}')
+
+    assert compression.detect_mode(testfile) == mode
+
+
+class TestWriteParallel(object):
+    """Tests for the compression.write_parallel function."""
+
+    @pytest.mark.parametrize("mode", sorted(compression.BLOCK_COMPRESSORS))
+    def test_blocks(self, mode, tmpdir, mocker):
+        """Text written in many blocks is read back as a single file."""
+        mocker.patch('framework.backends.compression.BLOCK_SIZE', 10)
+        testfile = six.text_type(tmpdir.join('test'))
+        expected = ''.join('line {}\n'.format(i) for i in range(100))
+
+        with compression.write_parallel(mode, testfile, threads=4) as f:
+            for line in expected.splitlines(True):
+                f.write(line)
+
+        with compression.DECOMPRESSORS[mode](testfile) as f:
+            assert f.read() == expected
+
+    def test_one_thread(self, tmpdir, mocker):
+        """With one thread the compressor for the mode is used."""
+        mocker.patch.dict('framework.backends.compression.COMPRESSORS',
+                          {'gz': mocker.MagicMock()})
+        testfile = six.text_type(tmpdir.join('test'))
+
+        with compression.write_parallel('gz', testfile, threads=1):
+            pass
+
+        compression.COMPRESSORS['gz'].assert_called_once_with(testfile)
+
+    def test_threads_config(self, config):
+        config.set('core', 'compression threads', '3')
+        assert compression.get_threads() == 3
+
+
 @skip.posix
 @skip.PY3
 @requires_xz_bin
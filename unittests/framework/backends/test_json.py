@@ -24,6 +24,7 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import os
+import time
 try:
     import simplejson as json
 except ImportError:
@@ -143,6 +144,240 @@ class TestJSONBackend(object):
 
             jsonschema.validate(json_, schema)
 
+    class TestJournal(object):
+        """Tests for the journal write mode."""
+
+        @staticmethod
+        def _backend(tmpdir):
+            test = backends.json.JSONBackend(six.text_type(tmpdir),
+                                             file_journal=True)
+            test.initialize(shared.INITIAL_METADATA)
+            with test.write_test('a') as t:
+                t(results.TestResult('pass'))
+            with test.write_test('b') as t:
+                t(results.TestResult('fail'))
+            return test
+
+        def test_one_file(self, tmpdir):
+            """A single journal is written instead of a file per test."""
+            self._backend(tmpdir)
+            assert sorted(tmpdir.join('tests').listdir()) == [
+                tmpdir.join('tests', '{}.journal.json'.format(os.getpid())),
+                tmpdir.join('tests', 'index')]
+
+        def test_last_record(self, tmpdir):
+            """The final result replaces the incomplete placeholder."""
+            self._backend(tmpdir)
+            test = backends.json._resume(six.text_type(tmpdir))
+            assert test.tests['a'].result == 'pass'
+            assert test.tests['b'].result == 'fail'
+
+        def test_incomplete(self, tmpdir):
+            """A test that never finished is incomplete."""
+            test = self._backend(tmpdir)
+            with test.write_test('c'):
+                pass
+            test = backends.json._resume(six.text_type(tmpdir))
+            assert test.tests['c'].result == 'incomplete'
+
+        def test_torn_record(self, tmpdir):
+            """A record that was not completely written is ignored."""
+            self._backend(tmpdir)
+            journal = tmpdir.join('tests',
+                                  '{}.journal.json'.format(os.getpid()))
+            data = journal.read_binary()
+            journal.write_binary(data[:-1])
+            test = backends.json._resume(six.text_type(tmpdir))
+            assert test.tests['b'].result == 'incomplete'
+
+        def test_finalize(self, tmpdir):
+            test = self._backend(tmpdir)
+            test.finalize(
+                {'time_elapsed':
+                    results.TimeAttribute(start=0.0, end=1.0).to_json()})
+            with tmpdir.join('results.json').open('r') as f:
+                json_ = json.load(f)
+            assert set(json_['tests']) == {'a', 'b'}
+            assert not tmpdir.join('tests').check()
+
+    class TestIncremental(object):
+        """Tests for writing results.json while tests are running."""
+
+        @staticmethod
+        def _backend(tmpdir, **kwargs):
+            test = backends.json.JSONBackend(six.text_type(tmpdir), **kwargs)
+            test.initialize(shared.INITIAL_METADATA)
+            for i in range(5):
+                with test.write_test(grouptools.join('g', str(i))) as t:
+                    t(results.TestResult('pass' if i % 2 else 'fail'))
+            return test
+
+        @staticmethod
+        def _stopped(test):
+            """Return the writer of test, with its thread stopped."""
+            writer = test._writer
+            writer._stop.set()
+            writer._thread.join()
+            return writer
+
+        @staticmethod
+        def _finalize(test, tmpdir):
+            test.finalize(
+                {'time_elapsed':
+                    results.TimeAttribute(start=0.0, end=1.0).to_json()})
+            return backends.json.load_results(six.text_type(tmpdir), 'none')
+
+        def test_partial(self, tmpdir):
+            """Finished tests are written before finalize."""
+            writer = self._stopped(self._backend(tmpdir))
+            writer._add(writer._follower.poll(), False)
+            assert tmpdir.join('partial-results.tmp').check()
+            assert not writer._held
+
+        def test_in_order(self, tmpdir):
+            """Tests are written in the order they were started."""
+            test = self._backend(tmpdir)
+            with test.write_test('slow'):
+                with test.write_test('fast') as t:
+                    t(results.TestResult('pass'))
+                    writer = self._stopped(test)
+                    writer._add(writer._follower.poll(), False)
+                    assert list(writer._held) == [6]
+            result = self._finalize(test, tmpdir)
+            assert list(result.tests)[-2:] == ['slow', 'fast']
+            assert result.tests['slow'].result == 'incomplete'
+
+        @pytest.mark.parametrize('journal', [True, False])
+        def test_same(self, tmpdir, mocker, journal):
+            """The results are the same as writing them at the end."""
+            result = self._finalize(
+                self._backend(tmpdir.mkdir('a'), file_journal=journal),
+                tmpdir.join('a'))
+            mocker.patch.object(backends.json.JSONBackend, '_incremental',
+                                False)
+            expected = self._finalize(
+                self._backend(tmpdir.mkdir('b'), file_journal=journal),
+                tmpdir.join('b'))
+
+            assert list(result.tests) == list(expected.tests)
+            assert [t.result for t in six.itervalues(result.tests)] == \
+                [t.result for t in six.itervalues(expected.tests)]
+            assert result.totals == expected.totals
+            assert result.time_elapsed.total == 1.0
+
+        def test_error(self, tmpdir):
+            """If the writer fails the results are written at the end."""
+            test = self._backend(tmpdir)
+            self._stopped(test)._error = IOError()
+            result = self._finalize(test, tmpdir)
+            assert len(result.tests) == 5
+            assert not tmpdir.join('partial-results.tmp').check()
+
+        def test_abort(self, tmpdir):
+            """The partial file is removed if the run is aborted."""
+            test = self._backend(tmpdir)
+            writer = self._stopped(test)
+            writer._add(writer._follower.poll(), False)
+            test.abort()
+            assert not tmpdir.join('partial-results.tmp').check()
+
+        def test_stale(self, tmpdir):
+            """A partial file left by an earlier run is removed."""
+            tmpdir.join('partial-results.tmp').write('stale')
+            self._stopped(self._backend(tmpdir))
+            assert not tmpdir.join('partial-results.tmp').check()
+
+        @pytest.mark.parametrize('abort', [True, False])
+        def test_abort_resume(self, tmpdir, abort):
+            """A run that stopped early can be resumed and finalized."""
+            test = self._backend(tmpdir)
+            writer = self._stopped(test)
+            writer._add(writer._follower.poll(), False)
+            if abort:
+                test.abort()
+
+            _, _, start = backends.json.load_resume(six.text_type(tmpdir))
+            test = backends.json.JSONBackend(six.text_type(tmpdir),
+                                             file_start_count=start)
+            with test.write_test(grouptools.join('g', '5')) as t:
+                t(results.TestResult('pass'))
+            result = self._finalize(test, tmpdir)
+            assert len(result.tests) == 6
+            assert not tmpdir.join('partial-results.tmp').check()
+
+    class TestGroupCommit(object):
+        """Tests for syncing with a sync window."""
+
+        @pytest.fixture
+        def fsync(self, mocker):
+            mocker.patch.object(backends.abstract.options.OPTIONS, 'sync',
+                                True)
+            mocker.patch.object(backends.abstract.options.OPTIONS,
+                                'sync_window', 60000)
+            return mocker.patch('framework.backends.abstract.os.fsync')
+
+        @staticmethod
+        def _write(tmpdir, fsync, count):
+            test = backends.json.JSONBackend(six.text_type(tmpdir))
+            test.initialize(shared.INITIAL_METADATA)
+            fsync.reset_mock()
+            for i in range(count):
+                with test.write_test('test{}'.format(i)) as t:
+                    t(results.TestResult('pass'))
+            return test
+
+        def test_no_window(self, tmpdir, mocker, fsync):
+            """Without a window every write is synced."""
+            mocker.patch.object(backends.abstract.options.OPTIONS,
+                                'sync_window', 0)
+            self._write(tmpdir, fsync, 2)
+            # Each test's placeholder and result, and the index after each
+            # final status
+            assert fsync.call_count == 6
+
+        def test_window(self, tmpdir, fsync):
+            """Writes are not synced until the window has passed."""
+            self._write(tmpdir, fsync, 2)
+            assert not fsync.called
+
+        def test_flush(self, tmpdir, fsync):
+            """Flushing syncs each file, the directory and the index once."""
+            test = self._write(tmpdir, fsync, 2)
+            test._group_commit.flush()
+            assert fsync.call_count == 4
+
+        def test_journal_index(self, tmpdir, fsync):
+            """In journal mode each status is indexed once."""
+            test = backends.json.JSONBackend(six.text_type(tmpdir),
+                                             file_journal=True)
+            test.initialize(shared.INITIAL_METADATA)
+            for i in range(2):
+                with test.write_test('test{}'.format(i)) as t:
+                    t(results.TestResult('pass'))
+            test._group_commit.flush()
+            assert len(tmpdir.join('tests', 'index').readlines()) == 4
+
+        def test_index_after_sync(self, tmpdir, fsync):
+            """The final status is only indexed once the result is synced."""
+            test = self._write(tmpdir, fsync, 1)
+            statuses, _ = backends.abstract.read_index(six.text_type(tmpdir))
+            assert statuses == {'test0': 'incomplete'}
+
+            test._group_commit.flush()
+            statuses, _ = backends.abstract.read_index(six.text_type(tmpdir))
+            assert statuses == {'test0': 'pass'}
+
+        def test_batch(self, tmpdir, mocker, fsync):
+            """A full batch is synced before the window has passed."""
+            mocker.patch.object(backends.abstract.options.OPTIONS,
+                                'sync_batch', 2)
+            self._write(tmpdir, fsync, 2)
+            for _ in range(100):
+                if fsync.called:
+                    break
+                time.sleep(0.05)
+            assert fsync.called
+
 
 class TestUpdateResults(object):
     """Test for the _update_results function."""
@@ -237,6 +472,63 @@ class TestResume(object):
             {'group1/test1', 'group1/test2', 'group2/test3', 'group2/test4'}
 
 
+class TestLoadResume(object):
+    """Tests for the load_resume function."""
+
+    @staticmethod
+    def _backend(tmpdir, **kwargs):
+        backend = backends.json.JSONBackend(six.text_type(tmpdir), **kwargs)
+        backend.initialize(shared.INITIAL_METADATA)
+        with backend.write_test('group1/test1') as t:
+            t(results.TestResult('fail'))
+        with backend.write_test('group1/test2') as t:
+            t(results.TestResult('pass'))
+        with backend.write_test('group2/test3'):
+            pass
+        return backend
+
+    @pytest.mark.parametrize('journal', [False, True])
+    def test_statuses(self, tmpdir, journal):
+        """The last status of each test is returned."""
+        self._backend(tmpdir, file_journal=journal)
+        _, statuses, _ = backends.json.load_resume(six.text_type(tmpdir))
+        assert statuses == {'group1/test1': 'fail', 'group1/test2': 'pass',
+                            'group2/test3': 'incomplete'}
+
+    def test_metadata(self, tmpdir):
+        self._backend(tmpdir)
+        test, _, _ = backends.json.load_resume(six.text_type(tmpdir))
+        assert test.name == 'name'
+        assert not test.tests
+
+    def test_start_count(self, tmpdir):
+        """The next id follows the last one used."""
+        self._backend(tmpdir, file_start_count=5)
+        _, _, start = backends.json.load_resume(six.text_type(tmpdir))
+        assert start == 8
+
+    def test_torn_line(self, tmpdir):
+        """A line that was not completely written is ignored."""
+        self._backend(tmpdir)
+        with tmpdir.join('tests', 'index').open('ab') as f:
+            f.write(b'9 pass group2/te')
+        _, statuses, start = backends.json.load_resume(six.text_type(tmpdir))
+        assert statuses['group2/test3'] == 'incomplete'
+        assert start == 3
+
+    def test_no_index(self, tmpdir):
+        """Runs without an index return None."""
+        self._backend(tmpdir)
+        tmpdir.join('tests', 'index').remove()
+        assert backends.json.load_resume(six.text_type(tmpdir)) is None
+
+    def test_resume_ignores_index(self, tmpdir):
+        """The index isn't loaded as a result."""
+        self._backend(tmpdir)
+        test = backends.json._resume(six.text_type(tmpdir))
+        assert len(test.tests) == 3
+
+
 class TestLoadResults(object):
     """Tests for the load_results function."""
 
@@ -263,6 +555,14 @@ class TestLoadResults(object):
         assert isinstance(backends.json.load_results(six.text_type(p), 'none'),
                           results.TestrunResult)
 
+    def test_detect_compression(self, tmpdir):
+        """The compression of a file is found from its contents."""
+        p = six.text_type(tmpdir.join('results.json'))
+        with backends.compression.COMPRESSORS['gz'](p) as f:
+            f.write(json.dumps(shared.JSON))
+        assert isinstance(backends.json.load_results(p, 'none'),
+                          results.TestrunResult)
+
 
 class TestLoad(object):
     """Tests for the _load function."""
@@ -274,3 +574,53 @@ class TestLoad(object):
         with p.open('r') as f:
             with pytest.raises(exceptions.PiglitFatalError):
                 backends.json._load(f)
+
+
+class TestParse(object):
+    """Tests for the _parse function."""
+
+    @staticmethod
+    def _doc(**test):
+        return {'results_version': 9,
+                'tests': {'a': dict(result='pass', **test)}}
+
+    def test_equivalent(self):
+        """backends.json._parse: returns the same values as json.loads."""
+        doc = self._doc(out='a "quoted" \\ string\n', err='\u2603')
+        result = backends.json._parse(json.dumps(doc))
+        assert result['tests']['a']['result'] == 'pass'
+        assert result['tests']['a']['out'].resolve() == doc['tests']['a']['out']
+        assert result['tests']['a']['err'].resolve() == doc['tests']['a']['err']
+
+    def test_lazy(self):
+        """backends.json._parse: out and err are not decoded."""
+        result = backends.json._parse(json.dumps(self._doc(out='a', err='b')))
+        assert isinstance(result['tests']['a']['out'], results.LazyString)
+        assert isinstance(result['tests']['a']['err'], results.LazyString)
+
+    def test_literal(self):
+        """backends.json._parse: only the literal of out and err is kept."""
+        result = backends.json._parse(json.dumps(self._doc(out='a')))
+        assert result['tests']['a']['out'].literal == '"a"'
+
+    def test_not_test(self):
+        """backends.json._parse: out and err outside of a test are decoded."""
+        doc = self._doc(out='a', subtests={'out': 'pass'})
+        result = backends.json._parse(json.dumps(doc))
+        assert result['tests']['a']['subtests'] == {'out': 'pass'}
+        assert result['tests']['a']['out'] == 'a'
+
+    def test_load_results(self, tmpdir):
+        """backends.json.load_results: out and err are decoded when used."""
+        p = tmpdir.join('results.json')
+        p.write(json.dumps(shared.JSON))
+        result = backends.json.load_results(six.text_type(p), 'none')
+        test = result.tests['spec@!opengl 1.0@gl-1.0-readpixsanity']
+        assert test.err == shared.JSON['tests'][
+            'spec@!opengl 1.0@gl-1.0-readpixsanity']['err']
+
+    def test_encoder(self):
+        """backends.json.piglit_encoder: resolves LazyStrings."""
+        result = backends.json._parse(json.dumps(self._doc(out='a')))
+        assert json.loads(json.dumps(
+            result, default=backends.json.piglit_encoder)) == self._doc(out='a')
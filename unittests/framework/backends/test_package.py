@@ -121,6 +121,15 @@ class TestLoad(object):
 
         backends.load(six.text_type(tmpdir))
 
+    def test_interupted_index(self, tmpdir, mock_backend):  # pylint: disable=unused-argument,redefined-outer-name
+        """backends.load: skips the index when resuming."""
+        tmpdir.mkdir('tests')
+        tmpdir.join('tests', 'index').write('0 incomplete a\n')
+        with tmpdir.join('tests', '0.test_backend').open('w') as f:
+            f.write('foo')
+
+        backends.load(six.text_type(tmpdir))
+
     def test_notimplemented(self, tmpdir, mocker):
         """backends.load(): An error is raised if a loader isn't properly
         implmented.
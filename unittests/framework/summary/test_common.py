@@ -25,6 +25,8 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 
+import copy
+
 import pytest
 from six.moves import range
 
@@ -74,6 +76,17 @@ def test_find_single():
     assert diffs == [{'oink', 'bonk', 'bar'}, {'foo', 'oink'}]
 
 
+def test_find_single_copied_status():
+    """summary.find_single: statuses that are copies are found."""
+    res = results.TestrunResult()
+    res.tests['foo'] = results.TestResult(copy.deepcopy(status.FAIL))
+    res.tests['bar'] = results.TestResult(copy.deepcopy(status.PASS))
+
+    diffs = summary.find_single([res], {'foo', 'bar'},
+                                lambda x: x > status.PASS)
+    assert diffs == [{'foo'}]
+
+
 class TestResults(object):
     """Tests for the Results class."""
 
@@ -428,6 +441,31 @@ class TestNames(object):
             assert getattr(self.test.names, 'all_' + attr) == \
                 getattr(self.test.names, attr)[0]
 
+    class TestNamesGainedSubtests(object):
+        """summary.Names: a test that has subtests in only one run."""
+
+        @classmethod
+        def setup_class(cls):
+            """Class fixture."""
+            res1 = results.TestrunResult()
+            res1.tests['foo'] = results.TestResult('pass')
+
+            res2 = results.TestrunResult()
+            res2.tests['foo'] = results.TestResult('pass')
+            res2.tests['foo'].subtests['1'] = 'pass'
+            res2.tests['foo'].subtests['2'] = 'fail'
+
+            cls.test = summary.Results([res1, res2])
+
+        def test_regressions(self):
+            """The test is compared with the worst status of its subtests."""
+            assert self.test.names.all_regressions == {'foo'}
+
+        def test_enabled(self):
+            """The subtests are enabled, but the test isn't."""
+            assert self.test.names.all_enabled == {
+                grouptools.join('foo', '1'), grouptools.join('foo', '2')}
+
 
 class TestEscapeFilename(object):
     """Tests for the escape_filename function."""
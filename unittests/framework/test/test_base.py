@@ -24,6 +24,8 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import os
+import pickle
+import sys
 import textwrap
 try:
     import subprocess32 as subprocess
@@ -195,6 +197,20 @@ class TestTest(object):
             test.run()
             assert test.result.result is status.TIMEOUT
 
+        @pytest.mark.slow
+        @pytest.mark.timeout(6)
+        @skip.posix
+        def test_timeout_output(self):
+            """test.base.Test: Keeps the output of a test that timed out, once.
+            """
+            test = _Test([sys.executable, '-c',
+                          'import sys, time; print("out"); sys.stdout.flush(); '
+                          'time.sleep(60)'])
+            test.timeout = 1
+            with pytest.raises(base.TestRunError):
+                test._run_command()
+            assert test.result.out == 'out\n'
+
     class TestExecuteTraceback(object):
         """Test.execute tests for Traceback handling."""
 
@@ -284,6 +300,38 @@ class TestTest(object):
             assert test.result.result is status.FAIL
 
 
+class TestLazyTest(object):
+    """Tests for the LazyTest class."""
+
+    def test_isinstance(self):
+        """isinstance sees both the LazyTest and the class of the test."""
+        test = base.LazyTest(_Test, [['foo']])
+        assert isinstance(test, base.LazyTest)
+        assert isinstance(test, _Test)
+
+    def test_create(self):
+        test = base.LazyTest(_Test, [['foo']], {'run_concurrent': True})
+        created = test.create()
+
+        assert created.command == ['foo']
+        assert created.run_concurrent is True
+
+    @pytest.mark.parametrize('kwargs, run_concurrent, expected', [
+        (None, None, False),
+        ({'run_concurrent': True}, None, True),
+        (None, True, True),
+    ])
+    def test_run_concurrent(self, kwargs, run_concurrent, expected):
+        test = base.LazyTest(_Test, [['foo']], kwargs, run_concurrent)
+        assert test.run_concurrent is expected
+
+    def test_pickle(self):
+        """Pickling keeps the LazyTest, rather than the class of the test."""
+        test = pickle.loads(pickle.dumps(base.LazyTest(_Test, [['foo']]), 2))
+        assert type(test) is base.LazyTest  # pylint: disable=unidiomatic-typecheck
+        assert test.create().command == ['foo']
+
+
 class TestWindowResizeMixin(object):
     """Tests for the WindowResizeMixin class."""
 
@@ -541,3 +589,62 @@ class TestReducedProcessMixin(object):
             assert test.result.subtests['a'] == status.PASS
             assert test.result.subtests['b'] == status.PASS
             assert test.result.subtests['c'] == status.CRASH
+
+    class TestCommunicate(object):
+        """Tests for the _communicate method, which streams stdout."""
+
+        class _Test(base.ReducedProcessMixin, _Test):
+            def _resume(self, current):
+                return self.command[:3] + [','.join(self._expected[current:])]
+
+            def _is_subtest(self, line):
+                return line.startswith('SUBTEST')
+
+        # Prints a SUBTEST line for each of the comma separated names in
+        # argv[1], and aborts on a subtest called crash.
+        _SCRIPT = textwrap.dedent("""\
+            import os, sys
+            for name in sys.argv[1].split(','):
+                print('SUBTEST: ' + name)
+                sys.stdout.flush()
+                if name == 'crash':
+                    os.abort()
+                print('RESULT: pass')
+            sys.stderr.write('done')
+        """)
+
+        def _make(self, subtests):
+            return self._Test(
+                [sys.executable, '-c', self._SCRIPT, ','.join(subtests)],
+                subtests=subtests)
+
+        def test_output(self):
+            """The output of the process is returned."""
+            test = self._make(['a', 'b'])
+            test._run_command()
+            assert test.result.out == \
+                'SUBTEST: a\nRESULT: pass\nSUBTEST: b\nRESULT: pass\n'
+            assert test.result.err == 'done'
+
+        @skip.posix
+        def test_resume(self):
+            """The subtests after a crash are run by a new process."""
+            test = self._make(['a', 'crash', 'b'])
+            test._run_command()
+            assert test.result.subtests['crash'] is status.CRASH
+            assert test.result.out.endswith(
+                '====RESUME====\n\nSUBTEST: b\nRESULT: pass\n')
+
+        @skip.posix
+        def test_timeout(self, mocker):
+            """A process that runs longer than the timeout is killed."""
+            test = self._Test(
+                [sys.executable, '-c',
+                 'print("SUBTEST: a"); import time; time.sleep(30)'],
+                subtests=['a'])
+            test.timeout = 1
+            mocker.patch('framework.test.base._SUPPRESS_TIMEOUT', False)
+
+            with pytest.raises(base.TestRunError):
+                test._run_command()
+            assert test.result.out == 'SUBTEST: a\n'
@@ -28,6 +28,7 @@ tests
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import os
 import textwrap
 try:
     from unittest import mock
@@ -37,6 +38,7 @@ except ImportError:
 import pytest
 import six
 
+from framework import cache
 from framework import exceptions
 from framework import grouptools
 from framework import profile
@@ -51,6 +53,11 @@ class _DEQPTestTest(deqp.DEQPBaseTest):
     extra_args = ['extra']
 
 
+class _DEQPBatchTestTest(deqp.DEQPBatchTest):
+    deqp_bin = 'deqp.bin'
+    extra_args = ['extra']
+
+
 class TestGetOptions(object):
     """Tests for the get_option function."""
 
@@ -119,6 +126,73 @@ class TestMakeProfile(object):
         expected = grouptools.join('this', 'is', 'a', 'deqp', 'test')
         assert expected in self.profile.test_list
 
+    class TestBatches(object):
+        """Tests for make_profile with a batch class."""
+
+        _CASES = ['a.group.test1', 'a.group.test2', 'a.other.test3']
+
+        def test_one_test_per_group(self):
+            """deqp.make_profile: makes a test for each group."""
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            assert set(profile_.test_list.keys()) == {
+                grouptools.join('a', 'group'), grouptools.join('a', 'other')}
+
+        def test_cases_are_subtests(self):
+            """deqp.make_profile: the cases of a group are its subtests."""
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            test = profile_.test_list[grouptools.join('a', 'group')]
+            assert set(test.result.subtests.keys()) == {'test1', 'test2'}
+
+        def test_forced_test_list(self):
+            """deqp.make_profile: cases can be forced by their names."""
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            profile_.forced_test_list = [grouptools.join('a', 'group',
+                                                         'test2')]
+            tests = list(profile_.itertests())
+            assert [n for n, _ in tests] == [grouptools.join('a', 'group')]
+            assert list(tests[0][1].result.subtests) == ['test2']
+
+        def test_include_case(self):
+            """deqp.make_profile: an include filter can select a case."""
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            profile_.filters.append(profile.RegexFilter([r'group@test1$']))
+            tests = list(profile_.itertests())
+            assert [n for n, _ in tests] == [grouptools.join('a', 'group')]
+            assert list(tests[0][1].result.subtests) == ['test1']
+
+        def test_exclude_case(self):
+            """deqp.make_profile: an exclude filter can remove a case."""
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            profile_.filters.append(
+                profile.RegexFilter([r'test1'], inverse=True))
+            tests = dict(profile_.itertests())
+            assert list(tests[grouptools.join('a', 'group')].result.subtests) \
+                == ['test2']
+            assert grouptools.join('a', 'other') in tests
+
+        def test_exclude_batch(self):
+            """deqp.make_profile: filters that aren't includes also apply to
+            the batch, like the filter of completed tests when resuming.
+            """
+            done = {grouptools.join('a', 'group')}
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            profile_.filters.append(lambda n, _: n not in done)
+            assert [n for n, _ in profile_.itertests()] == \
+                [grouptools.join('a', 'other')]
+
+        def test_disabled(self, mocker):
+            """deqp.make_profile: a batch_size of 0 makes a test per case."""
+            mocker.patch('framework.test.deqp._BATCH_SIZE', 0)
+            profile_ = deqp.make_profile(self._CASES, _DEQPTestTest,
+                                         _DEQPBatchTestTest)
+            assert len(profile_.test_list) == 3
+
 
 class TestIterDeqpTestCases(object):
     """Tests for iter_deqp_test_cases."""
@@ -296,6 +370,116 @@ class TestDEQPBaseTest(object):
             assert self.inst.result.result is status.CRASH
 
 
+class TestDEQPBatchTest(object):
+    """Tests for the DEQPBatchTest class."""
+
+    _OUT = textwrap.dedent("""\
+        dEQP Core 2014.x (0xcafebabe) starting..
+          target implementation = 'DRM'
+
+        Test case 'a.group.test1'..
+          Pass (Pass)
+
+        Test case 'a.group.test2'..
+        Fragment shader compile time = 0.264000 ms
+          NotSupported (Not supported)
+
+        Test case 'a.group.test3'..
+
+        ====RESUME====
+
+        Test case 'a.group.test4'..
+          Fail (Fail)
+
+        DONE!
+
+        Test run totals:
+          Passed:        1/1 (100.0%)
+    """)
+
+    @pytest.fixture
+    def inst(self):
+        test = _DEQPBatchTestTest(
+            'a.group', ['test1', 'test2', 'test3', 'test4', 'test5'])
+        test.result.returncode = 0
+        return test
+
+    def test_command(self, inst):
+        """deqp.DEQPBatchTest.command: runs the caselist file."""
+        inst._caselist = 'foo.txt'
+        assert inst.command == [
+            'deqp.bin', '--deqp-caselist-file=foo.txt', 'extra']
+
+    def test_write_caselist(self, inst, tmpdir, mocker):
+        """deqp.DEQPBatchTest._write_caselist: writes a batch of cases."""
+        mocker.patch('framework.test.deqp._BATCH_SIZE', 2)
+        inst._caselist = six.text_type(tmpdir.join('caselist.txt'))
+        inst._write_caselist(1)
+        assert tmpdir.join('caselist.txt').read() == \
+            'a.group.test2\na.group.test3\n'
+
+    def test_is_cherry_batches_left(self, inst, mocker):
+        """deqp.DEQPBatchTest._is_cherry: False if there are cases left."""
+        mocker.patch('framework.test.deqp._BATCH_SIZE', 2)
+        inst._caselist = os.devnull
+        inst._write_caselist(0)
+        assert not inst._is_cherry()
+
+    def test_is_cherry_last_batch(self, inst):
+        """deqp.DEQPBatchTest._is_cherry: True after the last batch."""
+        inst._caselist = os.devnull
+        inst._write_caselist(0)
+        assert inst._is_cherry()
+
+    class TestInterpretResult(object):
+        """Tests for DEQPBatchTest.interpret_result."""
+
+        @pytest.fixture(scope='class')
+        def result(self):
+            test = _DEQPBatchTestTest(
+                'a.group', ['test1', 'test2', 'test3', 'test4', 'test5'])
+            test.result.returncode = 0
+            test.result.subtests['test3'] = status.CRASH
+            test.result.out = TestDEQPBatchTest._OUT
+            test.interpret_result()
+            return test.result
+
+        def test_pass(self, result):
+            assert result.subtests['test1'] is status.PASS
+
+        def test_skip(self, result):
+            assert result.subtests['test2'] is status.SKIP
+
+        def test_crash(self, result):
+            """A case without a result keeps the status of the crash."""
+            assert result.subtests['test3'] is status.CRASH
+
+        def test_resumed(self, result):
+            assert result.subtests['test4'] is status.FAIL
+
+        def test_notrun(self, result):
+            """A case that wasn't started is left as notrun."""
+            assert result.subtests['test5'] is status.NOTRUN
+
+        def test_started_without_result(self):
+            """A case that started but didn't finish is a crash."""
+            test = _DEQPBatchTestTest('a.group', ['test1', 'test2'])
+            test.result.returncode = 0
+            test.result.out = "Test case 'a.group.test1'..\n"
+            test.interpret_result()
+            assert test.result.subtests['test1'] is status.CRASH
+            assert test.result.subtests['test2'] is status.NOTRUN
+
+        def test_crash_returncode(self):
+            """The batch is a crash if dEQP crashed."""
+            test = _DEQPBatchTestTest(
+                'a.group', ['test1', 'test2', 'test3', 'test4', 'test5'])
+            test.result.returncode = -9
+            test.result.out = TestDEQPBatchTest._OUT
+            test.interpret_result()
+            assert test.result.result is status.CRASH
+
+
 class TestGenMustpassTests(object):
     """Tests for the gen_mustpass_tests function."""
 
@@ -327,3 +511,61 @@ class TestGenMustpassTests(object):
             'dEQP.piglit.nested.group2.test3',
             'dEQP.piglit.nested.group2.test4',
         }
+
+    def test_streamed(self, tmpdir):
+        """deqp.gen_mustpass_tests: returns tests in the order of the file."""
+        p = tmpdir.join('foo.xml')
+        p.write(self._xml)
+        assert list(deqp.gen_mustpass_tests(six.text_type(p))) == [
+            'dEQP.piglit.group1.test1',
+            'dEQP.piglit.group1.test2',
+            'dEQP.piglit.nested.group2.test3',
+            'dEQP.piglit.nested.group2.test4',
+        ]
+
+
+class TestGenCaselistTxt(object):
+    """Tests for the gen_caselist_txt function."""
+
+    @pytest.fixture
+    def bin_(self, tmpdir, mocker):
+        """A fake deqp binary, which writes a caselist when called."""
+        bin_ = tmpdir.join('deqp-foo')
+        bin_.write('')
+
+        def generate(*args, **kwargs):
+            tmpdir.join('foo-cases.txt').write('TEST: a.deqp.test\n')
+
+        mocker.patch('framework.test.deqp.subprocess.check_call',
+                     side_effect=generate)
+        mocker.patch('framework.cache.options.OPTIONS.cache_dir',
+                     six.text_type(tmpdir.mkdir('cache')))
+        mocker.patch('framework.test.deqp._CASELISTS',
+                     cache.FileIndex('deqp_caselist', 1))
+        return six.text_type(bin_)
+
+    def test_generated(self, bin_, tmpdir):
+        """deqp.gen_caselist_txt: returns the path to the caselist."""
+        assert deqp.gen_caselist_txt(bin_, 'foo-cases.txt', []) == \
+            six.text_type(tmpdir.join('foo-cases.txt'))
+
+    def test_cached(self, bin_):
+        """deqp.gen_caselist_txt: the caselist is only generated once."""
+        deqp.gen_caselist_txt(bin_, 'foo-cases.txt', [])
+        deqp.gen_caselist_txt(bin_, 'foo-cases.txt', [])
+        assert deqp.subprocess.check_call.call_count == 1
+
+    def test_extra_args_changed(self, bin_):
+        """deqp.gen_caselist_txt: different extra args generate the caselist
+        again.
+        """
+        deqp.gen_caselist_txt(bin_, 'foo-cases.txt', [])
+        deqp.gen_caselist_txt(bin_, 'foo-cases.txt', ['--foo'])
+        assert deqp.subprocess.check_call.call_count == 2
+
+    def test_caselist_removed(self, bin_, tmpdir):
+        """deqp.gen_caselist_txt: a missing caselist is generated again."""
+        deqp.gen_caselist_txt(bin_, 'foo-cases.txt', [])
+        tmpdir.join('foo-cases.txt').remove()
+        deqp.gen_caselist_txt(bin_, 'foo-cases.txt', [])
+        assert deqp.subprocess.check_call.call_count == 2
@@ -0,0 +1,77 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Tests for the framework.test.loader module."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import os
+import textwrap
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import six
+
+from framework.test import loader
+from framework.test import glsl_parser_test, shader_test
+
+# pylint: disable=invalid-name,no-self-use,protected-access
+
+
+def test_find_sorted(tmpdir):
+    """test.loader.find: files are yielded in sorted order."""
+    for name in ['b/b.frag', 'b/a.vert', 'a/c.shader_test', 'a/d.txt']:
+        tmpdir.join(name).write('', ensure=True)
+    base = six.text_type(tmpdir)
+
+    found = [os.path.relpath(os.path.join(d, f), b) for b, d, f in
+             loader.find([base], ['.frag', '.vert', '.shader_test'])]
+    assert found == [os.path.join('a', 'c.shader_test'),
+                     os.path.join('b', 'a.vert'),
+                     os.path.join('b', 'b.frag')]
+
+
+@mock.patch('framework.test.loader._MIN_PARALLEL', 0)
+def test_prefetch(tmpdir):
+    """test.loader.prefetch: values are parsed by worker processes."""
+    shader = tmpdir.join('test.shader_test')
+    shader.write(textwrap.dedent("""\
+        [require]
+        GLSL >= 1.50
+
+        [next section]
+        """))
+    glsl = tmpdir.join('test.vert')
+    glsl.write(textwrap.dedent("""\
+        // [config]
+        // expect_result: pass
+        // glsl_version: 1.10
+        // [end config]
+        """))
+
+    loader.prefetch([six.text_type(shader), six.text_type(glsl)],
+                    processes=2)
+
+    assert shader_test._CACHE.get(six.text_type(shader), mock.Mock()) == \
+        shader_test._parse(six.text_type(shader))
+    assert glsl_parser_test._CACHE.get(six.text_type(glsl), mock.Mock()) == \
+        glsl_parser_test._read_config(six.text_type(glsl))
@@ -33,6 +33,7 @@ except ImportError:
 import pytest
 import six
 
+from framework import exceptions, results, scheduler
 from framework.test import shader_test
 
 # pylint: disable=invalid-name,no-self-use,protected-access
@@ -279,3 +280,154 @@ class TestMultiShaderTest(object):
         assert os.path.basename(actual[0]) == 'shader_runner'
         assert os.path.basename(actual[1]) == 'bar.shader_test'
         assert os.path.basename(actual[2]) == '-auto'
+
+    class TestNames(object):
+        """Tests for the names argument."""
+
+        @pytest.fixture
+        def inst(self, tmpdir):
+            files = []
+            for name in ['foo', 'bar']:
+                p = tmpdir.join('{}.shader_test'.format(name))
+                p.write('[require]\nGLSL >= 1.10\n\n[vertex shader]')
+                files.append(six.text_type(p))
+
+            return shader_test.MultiShaderTest(files, ['a@foo', 'bar'])
+
+        def test_subtests(self, inst):
+            """The subtests are named by names."""
+            assert set(inst.result.subtests) == {'a@foo', 'bar'}
+
+        def test_interpret_result(self, inst):
+            """Results reported by file name are stored by names."""
+            inst.result.returncode = 0
+            inst.result.out = (
+                'PIGLIT TEST: 1 - foo\n'
+                'PIGLIT: {"subtest": {"foo" : "pass"}}\n'
+                'PIGLIT TEST: 2 - bar\n'
+                'PIGLIT: {"subtest": {"bar" : "fail"}}\n')
+            inst.interpret_result()
+            assert dict(inst.result.subtests) == {'a@foo': 'pass',
+                                                  'bar': 'fail'}
+
+
+class TestBatchFiles(object):
+    """Tests for the batch_files function."""
+
+    @pytest.fixture
+    def write(self, tmpdir):
+        """Returns a function that writes shader tests and returns the path."""
+        def write(path, gles=False):
+            p = tmpdir.join(path)
+            p.dirpath().ensure(dir=True)
+            p.write(textwrap.dedent("""\
+                [require]
+                {}
+
+                [vertex shader]""".format(
+                    'GL ES >= 2.0' if gles else 'GLSL >= 1.10')))
+            return six.text_type(p)
+        return write
+
+    @staticmethod
+    def _batch(groups, times, target=10):
+        """Batch groups, estimating tests in times, or at 1 second."""
+        return {n: s for n, _, s in shader_test.batch_files(
+            groups, lambda n, _: times.get(n, 1.0), target)}
+
+    def test_unchanged(self, write):
+        """A group that takes about the target is left as it is."""
+        groups = {'a': [write('a/1.shader_test'), write('a/2.shader_test')]}
+        assert self._batch(groups, {}, target=3) == {'a': ['1', '2']}
+
+    def test_split(self, write):
+        """A group that takes longer than the target is split."""
+        groups = {'a': [write('a/{}.shader_test'.format(i))
+                        for i in range(3)]}
+        assert self._batch(groups, {}, target=2) == {
+            'a@batch0': ['0', '1'], 'a@batch1': ['2']}
+
+    def test_split_long_test(self, write):
+        """A test that takes longer than the target is batched alone."""
+        groups = {'a': [write('a/1.shader_test'), write('a/2.shader_test')]}
+        assert self._batch(groups, {'a@1': 20.0}) == {
+            'a@batch0': ['1'], 'a@batch1': ['2']}
+
+    def test_merge(self, write):
+        """Small groups are merged into a batch named for their parent."""
+        groups = {'p@x': [write('p/x/1.shader_test')],
+                  'p@y': [write('p/y/2.shader_test')]}
+        assert self._batch(groups, {}) == {'p': ['x@1', 'y@2']}
+
+    def test_merge_parent(self, write):
+        """Small groups are merged with the small group they are in."""
+        groups = {'p': [write('p/1.shader_test')],
+                  'p@x': [write('p/x/2.shader_test')]}
+        assert self._batch(groups, {}) == {'p': ['1', 'x@2']}
+
+    def test_merge_parent_large(self, write):
+        """Groups aren't merged into a large group they are in."""
+        groups = {'p': [write('p/1.shader_test')],
+                  'p@x': [write('p/x/2.shader_test')],
+                  'p@y': [write('p/y/3.shader_test')]}
+        assert self._batch(groups, {'p@1': 8.0}) == {
+            'p': ['1'], 'p@x': ['2'], 'p@y': ['3']}
+
+    def test_merge_binary(self, write):
+        """Groups using different shader_runner binaries aren't merged."""
+        groups = {'p@x': [write('p/x/1.shader_test')],
+                  'p@y': [write('p/y/2.shader_test', gles=True)]}
+        assert self._batch(groups, {}) == {'p@x': ['1'], 'p@y': ['2']}
+
+    def test_merge_same_name(self, write):
+        """Groups with files of the same name aren't merged."""
+        groups = {'p@x': [write('p/x/1.shader_test')],
+                  'p@y': [write('p/y/1.shader_test')]}
+        assert self._batch(groups, {}) == {'p@x': ['1'], 'p@y': ['1']}
+
+    def test_split_from_results(self, write):
+        """The durations of split batches are used to batch them again."""
+        groups = {'a': [write('a/{}.shader_test'.format(i))
+                        for i in range(3)]}
+        run = results.TestrunResult()
+        for name, subtests, time_ in [('a@batch0', ['0', '1'], 8.0),
+                                      ('a@batch1', ['2'], 1.0)]:
+            run.tests[name] = results.TestResult('pass')
+            run.tests[name].time = results.TimeAttribute(0.0, time_)
+            for subtest in subtests:
+                run.tests[name].subtests[subtest] = 'pass'
+
+        estimate = scheduler.DurationEstimator.from_results([run])
+        batches = {n: s for n, _, s in
+                   shader_test.batch_files(groups, estimate, 5)}
+        assert batches == {'a@batch0': ['0'], 'a@batch1': ['1', '2']}
+
+
+def test_parser_cached(tmpdir):
+    """test.shader_test.Parser: cached values match a fresh parse."""
+    p = tmpdir.join('test.shader_test')
+    p.write(textwrap.dedent("""\
+        [require]
+        GL ES >= 3.0
+        GLSL ES <= 3.00 es
+        GL_ARB_foo
+
+        [next section]
+        """))
+    with mock.patch('framework.cache.options.OPTIONS.cache_dir',
+                    six.text_type(tmpdir.mkdir('cache'))):
+        shader_test.Parser.cached(six.text_type(p))
+        test = shader_test.ShaderTest(six.text_type(p))
+
+    assert os.path.basename(test.command[0]) == 'shader_runner_gles3'
+    assert test.gl_required == {'GL_ARB_foo'}
+    assert test.gles_version == 3.0
+    assert test.glsl_es_version is None
+
+
+def test_lazy_parses(tmpdir):
+    """test.shader_test.ShaderTest.lazy: errors are raised immediately."""
+    p = tmpdir.join('test.shader_test')
+    p.write('[vertex shader]\n')
+    with pytest.raises(exceptions.PiglitFatalError):
+        shader_test.ShaderTest.lazy(six.text_type(p))
@@ -0,0 +1,171 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Tests for the framework.cache module."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import multiprocessing.dummy
+import os
+try:
+    import simplejson as json
+except ImportError:
+    import json
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+import six
+
+from framework import cache
+
+# pylint: disable=no-self-use,invalid-name,protected-access
+
+
+@pytest.fixture
+def cache_dir(tmpdir):
+    """Enable caching in a temporary directory."""
+    path = tmpdir.mkdir('cache')
+    with mock.patch('framework.cache.options.OPTIONS.cache_dir',
+                    six.text_type(path)):
+        yield path
+
+
+@pytest.fixture
+def source(tmpdir):
+    p = tmpdir.join('source')
+    p.write('foo')
+    return six.text_type(p)
+
+
+class TestFileIndex(object):
+    """Tests for the FileIndex class."""
+
+    def test_disabled(self, source):
+        """Without a cache_dir every get calls func."""
+        func = mock.Mock(return_value='bar')
+        inst = cache.FileIndex('test', 1)
+        inst.get(source, func)
+        inst.get(source, func)
+
+        assert func.call_count == 2
+        assert inst.path is None
+
+    def test_hit(self, cache_dir, source):
+        """A value for an unchanged file is only created once."""
+        func = mock.Mock(return_value='bar')
+        inst = cache.FileIndex('test', 1)
+
+        assert inst.get(source, func) == 'bar'
+        assert inst.get(source, func) == 'bar'
+        assert func.call_count == 1
+
+    def test_changed(self, cache_dir, source):
+        """A value is created again if the file is modified."""
+        func = mock.Mock(return_value='bar')
+        inst = cache.FileIndex('test', 1)
+        inst.get(source, func)
+        with open(source, 'w') as f:
+            f.write('a longer string')
+        inst.get(source, func)
+
+        assert func.call_count == 2
+
+    def test_round_trip(self, cache_dir, source):
+        """A saved index is used by new instances."""
+        cache.FileIndex('test', 1).get(source, lambda _: {'a': [1, 2]})
+        cache.save()
+
+        func = mock.Mock()
+        assert cache.FileIndex('test', 1).get(source, func) == {'a': [1, 2]}
+        assert not func.called
+
+    def test_version(self, cache_dir, source):
+        """An index with a different version is discarded."""
+        inst = cache.FileIndex('test', 1)
+        inst.get(source, lambda _: 'bar')
+        inst.save()
+
+        assert cache.FileIndex('test', 2).get(source, lambda _: 'foo') == 'foo'
+
+    def test_save_prunes(self, cache_dir, source):
+        """Entries for files that no longer exist are not saved."""
+        inst = cache.FileIndex('test', 1)
+        inst.get(source, lambda _: 'bar')
+        os.unlink(source)
+        inst.save()
+
+        with open(inst.path, 'r') as f:
+            assert json.load(f)['entries'] == {}
+
+    def test_corrupt(self, cache_dir, source):
+        """An unreadable index is treated as empty."""
+        cache_dir.join('test.json').write('{')
+        assert cache.FileIndex('test', 1).get(source, lambda _: 'foo') == 'foo'
+
+    class TestPrefetch(object):
+        """Tests for FileIndex.prefetch."""
+
+        @pytest.fixture
+        def pool(self):
+            pool = multiprocessing.dummy.Pool(2)
+            yield pool
+            pool.close()
+            pool.join()
+
+        def test_disabled(self, pool, source):
+            """Prefetched values are used even if caching is disabled."""
+            inst = cache.FileIndex('test', 1)
+            inst.prefetch([source], lambda _: 'bar', pool)
+
+            assert inst.get(source, mock.Mock()) == 'bar'
+
+        def test_error(self, pool, source):
+            """Files that func raises for are created again by get."""
+            inst = cache.FileIndex('test', 1)
+            inst.prefetch([source], mock.Mock(side_effect=ValueError), pool)
+
+            assert inst.get(source, lambda _: 'bar') == 'bar'
+
+        def test_skips_cached(self, pool, cache_dir, source):
+            """Files that are already in the index aren't computed again."""
+            func = mock.Mock(return_value='bar')
+            inst = cache.FileIndex('test', 1)
+            inst.get(source, func)
+            inst.prefetch([source], func, pool)
+
+            assert func.call_count == 1
+
+
+class TestDefaultDir(object):
+    """Tests for the default_dir function."""
+
+    def test_env(self):
+        with mock.patch.dict('os.environ', {'PIGLIT_CACHE_DIR': 'foo'}):
+            assert cache.default_dir() == 'foo'
+
+    def test_xdg(self):
+        with mock.patch.dict('os.environ', {'XDG_CACHE_HOME': 'foo'}):
+            os.environ.pop('PIGLIT_CACHE_DIR', None)
+            with mock.patch('framework.cache.core.PIGLIT_CONFIG.safe_get',
+                            mock.Mock(return_value=None)):
+                assert cache.default_dir() == os.path.join('foo', 'piglit')
@@ -0,0 +1,140 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Tests for the framework.executor module."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import os
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import pytest
+import six
+
+from framework import backends
+from framework import exceptions
+from framework import executor
+from framework import log
+from framework import profile
+from framework.test.base import LazyTest
+from . import utils
+
+# pylint: disable=no-self-use,invalid-name
+
+
+class _Test(utils.Test):
+    """A Test that passes without running anything."""
+
+    def execute(self, path, log_, options):
+        log_.start(path)
+        self.result.result = 'pass'
+        log_.log(self.result.result)
+
+
+class _AbortTest(utils.Test):
+    """A Test that requests an abort through the monitoring object."""
+
+    def execute(self, path, log_, options):
+        log_.start(path)
+        self.result.result = 'fail'
+        options['monitor'].abort('oops')
+        log_.log(self.result.result)
+
+
+class _RaiseTest(utils.Test):
+    """A Test that raises an exception while running."""
+
+    def execute(self, path, log_, options):
+        raise RuntimeError('oops')
+
+
+def _read_results(path):
+    """Return a dict of name: result for all of the tests written."""
+    tests = {}
+    tests_dir = os.path.join(path, 'tests')
+    for file_ in os.listdir(tests_dir):
+        if file_ == 'index':
+            continue
+        with open(os.path.join(tests_dir, file_), 'r') as f:
+            tests.update(json.load(f))
+    return {k: v['result'] for k, v in six.iteritems(tests)}
+
+
+@pytest.fixture
+def backend(tmpdir):
+    inst = backends.json.JSONBackend(six.text_type(tmpdir))
+    inst.initialize({'name': 'foo'})
+    return inst
+
+
+def test_unknown_executor(backend):
+    """executor.Executor: raises PiglitFatalError for unknown kinds."""
+    with pytest.raises(exceptions.PiglitFatalError):
+        executor.Executor('foo', backend, log.LogManager('dummy', 0), [])
+
+
+@pytest.mark.parametrize('kind', executor.EXECUTORS)
+class TestExecutor(object):
+    """Tests for the Executor class."""
+
+    def test_runs_all_tests(self, kind, backend, tmpdir):
+        """All tests in both lanes are run and written to the backend."""
+        prof = profile.TestProfile()
+        inst = executor.Executor(kind, backend, log.LogManager('dummy', 20),
+                                 [prof])
+        for i in range(20):
+            inst.submit(bool(i % 2), 0, 'test{}'.format(i), _Test(['foo']))
+        inst.wait()
+
+        results = _read_results(six.text_type(tmpdir))
+        assert results == {'test{}'.format(i): 'pass' for i in range(20)}
+
+    def test_lazy(self, kind, backend, tmpdir):
+        """LazyTests are created and run."""
+        inst = executor.Executor(kind, backend, log.LogManager('dummy', 2),
+                                 [profile.TestProfile()])
+        inst.submit(False, 0, 'a', LazyTest(_Test, [['foo']]))
+        inst.submit(True, 0, 'b', LazyTest(_Test, [['foo']]))
+        inst.wait()
+
+        assert _read_results(six.text_type(tmpdir)) == {'a': 'pass',
+                                                        'b': 'pass'}
+
+    def test_abort(self, kind, backend):
+        """Monitoring errors from workers are set on the profile."""
+        prof = profile.TestProfile()
+        inst = executor.Executor(kind, backend, log.LogManager('dummy', 1),
+                                 [prof])
+        inst.submit(False, 0, 'test', _AbortTest(['foo']))
+        inst.wait()
+
+        assert prof.options['monitor'].abort_needed
+        assert prof.options['monitor'].error_message == 'oops'
+
+    def test_exception(self, kind, backend):
+        """Exceptions raised running a test are raised by wait."""
+        inst = executor.Executor(kind, backend, log.LogManager('dummy', 2),
+                                 [profile.TestProfile()])
+        inst.submit(True, 0, 'test', _RaiseTest(['foo']))
+        with pytest.raises(exceptions.PiglitInternalError) as e:
+            inst.wait()
+        assert 'oops' in six.text_type(e.value)
@@ -130,3 +130,44 @@ class TestSplitname(object):
     def test_basic(self):
         assert grouptools.splitname(grouptools.join('g1', 'g2', 't1')) == \
             (grouptools.join('g1', 'g2'), 't1')
+
+
+class TestGroupTrie(object):
+    """Tests for the GroupTrie class."""
+
+    @pytest.fixture
+    def inst(self):
+        return grouptools.GroupTrie(
+            ['spec@glsl-1.10@a', 'spec@gl@b', 'spec@gl', 'other@c',
+             'spec@glsl-1.10@b@c'])
+
+    def test_iter_order(self, inst):
+        """Tests are yielded in the order they were added."""
+        assert list(inst) == ['spec@glsl-1.10@a', 'spec@gl@b', 'spec@gl',
+                              'other@c', 'spec@glsl-1.10@b@c']
+
+    def test_contains(self, inst):
+        """Groups are not tests, unless they were added as tests."""
+        assert 'spec@gl' in inst
+        assert 'spec' not in inst
+
+    @pytest.mark.parametrize('prefix, expected', [
+        ('spec@gl', ['spec@glsl-1.10@a', 'spec@gl@b', 'spec@gl',
+                     'spec@glsl-1.10@b@c']),
+        ('spec@gl@', ['spec@gl@b']),
+        ('spec@glsl-1.10@b', ['spec@glsl-1.10@b@c']),
+        (('other', 'spec@gl@'), ['spec@gl@b', 'other@c']),
+        ('nope@gl', []),
+    ])
+    def test_iterprefix(self, inst, prefix, expected):
+        assert list(inst.iterprefix(prefix)) == expected
+
+    def test_remove(self, inst):
+        """Removing a test removes its empty groups."""
+        inst.remove('spec@glsl-1.10@b@c')
+        assert len(inst) == 4
+        assert list(inst.iterprefix('spec@glsl-1.10@')) == ['spec@glsl-1.10@a']
+
+    def test_remove_missing(self, inst):
+        with pytest.raises(KeyError):
+            inst.remove('spec')
@@ -31,6 +31,7 @@ import pytest
 import six
 
 import framework.log as log
+from framework import grouptools, results
 
 # pylint: disable=no-self-use,protected-access
 
@@ -197,3 +198,16 @@ class TestDummyLog(object):
 
             actual = sys.stdout.read()
             assert actual == b''
+
+
+class TestHTTPLog(object):
+    """Tests for the HTTPLog class."""
+
+    def test_totals(self, log_state):  # pylint: disable=redefined-outer-name
+        """The totals of the groups are counted as tests complete."""
+        log_state['totals'] = results.TotalsCounter()
+        http = log.HTTPLog(log_state, threading.Lock())
+        http.start(grouptools.join('foo', 'bar'))
+        http.log('pass')
+
+        assert log_state['totals'].totals()['foo']['pass'] == 1
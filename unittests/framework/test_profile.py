@@ -30,6 +30,7 @@ import six
 from framework import exceptions
 from framework import grouptools
 from framework import profile
+from framework.test.base import LazyTest
 from framework.test.gleantest import GleanTest
 from . import utils
 
@@ -118,6 +119,33 @@ class TestTestProfile(object):
             assert fixture.test_list is not new.test_list
 
 
+    class TestItertests(object):
+        """Tests for the itertests method."""
+
+        @pytest.fixture
+        def inst(self):
+            inst = profile.TestProfile()
+            inst.test_list['foo'] = LazyTest(utils.Test, [['foo']])
+            inst.test_list['bar'] = LazyTest(utils.Test, [['bar']])
+            return inst
+
+        def test_creates(self, inst):
+            """LazyTests are created, but not stored in the test_list."""
+            assert [type(t) for _, t in inst.itertests()] == [utils.Test] * 2
+            assert all(isinstance(t, LazyTest)
+                       for _, t in inst.test_list.iterentries())
+
+        def test_filters_isinstance(self, inst):
+            """Filters can use isinstance on LazyTests."""
+            inst.filters.append(lambda n, t: isinstance(t, utils.Test) and
+                                n == 'foo')
+            assert [n for n, _ in inst.itertests()] == ['foo']
+
+        def test_forced_test_list(self, inst):
+            inst.forced_test_list = ['bar']
+            assert [n for n, _ in inst.itertests()] == ['bar']
+
+
 class TestTestDict(object):
     """Tests for the TestDict object."""
 
@@ -267,6 +295,39 @@ class TestTestDict(object):
             assert grouptools.join('foo', 'abc') in inst
 
 
+    def test_groups(self):
+        """The group trie follows keys being added and removed."""
+        self.test['a@b'] = utils.Test(['foo'])
+        self.test['a@c'] = utils.Test(['bar'])
+        del self.test['a@b']
+        assert [k for k, _ in self.test.iterentries(prefixes=('a@', ))] == \
+            ['a@c']
+
+    class TestLazy(object):
+        """Tests for LazyTest values."""
+
+        @pytest.fixture
+        def inst(self):
+            inst = profile.TestDict()
+            inst['foo'] = LazyTest(utils.Test, [['foo']])
+            return inst
+
+        def test_getitem_creates(self, inst):
+            """Accessing a LazyTest by key replaces it with the test."""
+            test = inst['foo']
+            assert type(test) is utils.Test  # pylint: disable=unidiomatic-typecheck
+            assert inst['foo'] is test
+
+        def test_iterentries(self, inst):
+            """iterentries doesn't create the test."""
+            assert isinstance(dict(inst.iterentries())['foo'], LazyTest)
+
+        def test_reassignment(self, inst):
+            """reassigning a key with a LazyTest raises an exception."""
+            with pytest.raises(exceptions.PiglitFatalError):
+                inst['foo'] = LazyTest(utils.Test, [['foo', 'bar']])
+
+
 class TestRegexFilter(object):
     """Tests for the RegexFilter class."""
 
@@ -305,3 +366,59 @@ class TestRegexFilter(object):
             """Returns False when the test matches any regex."""
             test = profile.RegexFilter([r'fob', r'bar'], inverse=True)
             assert test('foobob', None)
+
+    class TestCombined(object):
+        """Tests for combining the regexes into one."""
+
+        def test_backreference(self):
+            """Regexes with backreferences are still matched separately."""
+            test = profile.RegexFilter([r'(a)\1', r'(b)\1'])
+            assert test('xbb', None)
+            assert not test('xab', None)
+
+        def test_flags(self):
+            """A regex setting global flags is still matched separately."""
+            test = profile.RegexFilter([r'foo', r'(?x) b a r'])
+            assert test('bar', None)
+
+    class TestPrefixes(object):
+        """Tests for the prefixes attribute."""
+
+        @pytest.mark.parametrize('filters, expected', [
+            ([r'^spec@Foo', r'^bar@'], ('spec@foo', 'bar@')),
+            ([r'^spec@glsl\.'], ('spec@glsl',)),
+            ([r'^spec@gls?'], ('spec@gl',)),
+            ([r'^spec', r'bar'], None),
+            ([r'^spec|bar'], None),
+            ([r'^.*'], None),
+            ([], None),
+        ])
+        def test_prefixes(self, filters, expected):
+            assert profile.RegexFilter(filters).prefixes == expected
+
+        def test_itertests(self):
+            """TestProfile skips tests without the prefixes."""
+            class _Filter(profile.RegexFilter):
+                def __call__(self, name, test):
+                    if name != 'spec@foo':
+                        pytest.fail('filtered {}'.format(name))
+                    return super(_Filter, self).__call__(name, test)
+
+            inst = profile.TestProfile()
+            inst.test_list['spec@foo'] = utils.Test(['foo'])
+            inst.test_list['spec@bar'] = utils.Test(['bar'])
+            inst.filters.append(_Filter([r'^spec@f']))
+
+            assert [n for n, _ in inst.itertests()] == ['spec@foo']
+
+        def test_itertests_other_filters(self):
+            """Filters that aren't RegexFilters see every test."""
+            seen = []
+            inst = profile.TestProfile()
+            inst.test_list['spec@foo'] = utils.Test(['foo'])
+            inst.test_list['spec@bar'] = utils.Test(['bar'])
+            inst.filters.append(lambda n, _: seen.append(n) or True)
+            inst.filters.append(profile.RegexFilter([r'^spec@f']))
+
+            assert [n for n, _ in inst.itertests()] == ['spec@foo']
+            assert sorted(seen) == ['spec@bar', 'spec@foo']
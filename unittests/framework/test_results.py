@@ -33,6 +33,7 @@ from framework import grouptools
 from framework import results
 from framework import status
 
+from . import skip
 from .backends import shared
 
 # pylint: disable=no-self-use
@@ -81,6 +82,42 @@ class TestSubtests(object):
 
         assert test['foo'] is status.PASS
 
+    def test_empty(self, subtest):
+        """results.Subtests: an empty instance acts as an empty dict."""
+        assert not subtest
+        assert list(subtest) == []
+        with pytest.raises(KeyError):
+            subtest['foo']  # pylint: disable=pointless-statement
+
+    def test_worst(self, subtest):
+        """results.Subtests.worst: returns the worst status."""
+        subtest['a'] = status.PASS
+        assert subtest.worst() is status.PASS
+        subtest['b'] = status.FAIL
+        subtest['c'] = status.WARN
+        assert subtest.worst() is status.FAIL
+
+    def test_worst_replaced(self, subtest):
+        """results.Subtests.worst: replacing the worst status updates it."""
+        subtest['a'] = status.PASS
+        subtest['b'] = status.FAIL
+        assert subtest.worst() is status.FAIL
+        subtest['b'] = status.PASS
+        assert subtest.worst() is status.PASS
+
+    def test_worst_empty(self, subtest):
+        """results.Subtests.worst: returns None without subtests."""
+        assert subtest.worst() is None
+
+    @skip.PY2
+    def test_names_interned(self, subtest):
+        """results.Subtests: instances share the names of subtests."""
+        other = results.Subtests()
+        subtest[''.join(['F', 'oo'])] = status.PASS
+        other[''.join(['f', 'OO'])] = status.FAIL
+
+        assert next(iter(subtest)) is next(iter(other))
+
 
 class TestTestResult(object):
     """Tests for the TestResult class."""
@@ -300,6 +337,19 @@ class TestTestResult(object):
             test.update({'subtest': {'result': 'incomplete'}})
             assert test.subtests['result'] == 'incomplete'
 
+    class TestPid(object):
+        """Tests for TestResult.pid."""
+
+        def test_append(self):
+            """results.TestResult.pid: pids can be appended to a new result"""
+            test = results.TestResult('pass')
+            test.pid.append(1934)
+            assert test.to_json()['pid'] == [1934]
+
+        def test_default(self):
+            """results.TestResult.pid: defaults to an empty list"""
+            assert results.TestResult('pass').to_json()['pid'] == []
+
     class TestTotals(object):
         """Test the totals generated by TestrunResult.calculate_group_totals().
         """
@@ -433,6 +483,29 @@ class TestStringDescriptor(object):
         test.val = '\ufffd'
         assert test.val == '�'
 
+    def test_lazy(self, test):
+        """results.StringDescriptor: LazyStrings are resolved once, on read."""
+        class Lazy(results.LazyString):
+            calls = 0
+
+            def resolve(self):
+                Lazy.calls += 1
+                return b'foo'
+
+        test.val = Lazy()
+        assert Lazy.calls == 0
+        assert test.val == 'foo'
+        assert test.val == 'foo'
+        assert Lazy.calls == 1
+
+    def test_lazy_abstract(self):
+        """results.LazyString: subclasses must implement resolve."""
+        class Lazy(results.LazyString):
+            pass
+
+        with pytest.raises(TypeError):
+            Lazy()
+
     def test_delete(self, test):
         """results.StringDescriptor.__delete__: raises NotImplementedError"""
         with pytest.raises(NotImplementedError):
@@ -457,6 +530,22 @@ class TestTotals(object):
         assert bool(test)
 
 
+class TestTotalsCounter(object):
+    """Tests for the TotalsCounter class."""
+
+    def test_updated_while_adding(self):
+        """Totals read before a test is added include that test."""
+        counter = results.TotalsCounter()
+        counter.add(grouptools.join('foo', 'bar', 'a'), status.PASS)
+        totals = counter.totals()
+        counter.add(grouptools.join('foo', 'b'), status.FAIL)
+
+        assert totals['root']['pass'] == 1
+        assert totals['root']['fail'] == 1
+        assert totals['foo']['fail'] == 1
+        assert totals[grouptools.join('foo', 'bar')]['fail'] == 0
+
+
 class TestTestrunResult(object):
     """Tests for the TestrunResult class."""
 
@@ -587,6 +676,18 @@ class TestTestrunResult(object):
             with pytest.raises(KeyError):
                 self.inst.get_result('fooobar')
 
+    def test_iterresults(self):
+        """TestrunResult.iterresults: yields subtests instead of their test."""
+        test = results.TestResult('crash')
+        test.subtests['foo'] = status.PASS
+        run = results.TestrunResult()
+        run.tests['sub'] = test
+        run.tests['test'] = results.TestResult('fail')
+
+        assert list(run.iterresults()) == [
+            (grouptools.join('sub', 'foo'), status.PASS),
+            ('test', status.FAIL)]
+
 
 class TestTimeAttribute(object):
     """Tests for the TimeAttribute class."""
@@ -0,0 +1,220 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Tests for the framework.scheduler module."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+
+import pytest
+
+from framework import results
+from framework import scheduler
+from framework.test.base import LazyTest, ReducedProcessMixin
+from . import utils
+
+# pylint: disable=no-self-use,invalid-name
+
+
+class _ReducedTest(ReducedProcessMixin, utils.Test):
+    def _resume(self, current):
+        return self.command
+
+    def _is_subtest(self, line):
+        return False
+
+
+def _profiles():
+    """Two profiles, each with a mix of serial and concurrent tests."""
+    return [
+        (None, [('a', utils.Test(['a'], run_concurrent=True)),
+                ('b', utils.Test(['b'])),
+                ('c', utils.Test(['c']))]),
+        (None, [('d', utils.Test(['d'])),
+                ('e', utils.Test(['e'], run_concurrent=True))]),
+    ]
+
+
+def _names(sched):
+    return [(c, i, n) for c, i, n, _ in sched]
+
+
+class TestScheduler(object):
+    """Tests for the Scheduler class."""
+
+    def test_all(self):
+        """Every test is in the concurrent lane, in profile order."""
+        sched = scheduler.Scheduler(_profiles(), 'all')
+        assert _names(sched) == [
+            (True, 0, 'a'), (True, 0, 'b'), (True, 0, 'c'), (True, 1, 'd'),
+            (True, 1, 'e')]
+
+    def test_none(self):
+        """Every test is in the serial lane, in profile order."""
+        sched = scheduler.Scheduler(_profiles(), 'none',
+                                    estimate=lambda n, _: ord(n))
+        assert _names(sched) == [
+            (False, 0, 'a'), (False, 0, 'b'), (False, 0, 'c'),
+            (False, 1, 'd'), (False, 1, 'e')]
+
+    def test_all_longest_first(self):
+        """The concurrent lane is sorted by estimate, longest first."""
+        costs = {'c': 5, 'e': 3}
+        sched = scheduler.Scheduler(_profiles(), 'all',
+                                    estimate=lambda n, _: costs.get(n, 0))
+        assert [n for _, _, n in _names(sched)] == ['c', 'e', 'a', 'b', 'd']
+
+    def test_some_lanes(self):
+        """Tests go to the lane matching run_concurrent, across profiles."""
+        sched = scheduler.Scheduler(_profiles(), 'some')
+        assert _names(sched) == [
+            (False, 0, 'b'), (False, 0, 'c'), (False, 1, 'd'),
+            (True, 0, 'a'), (True, 1, 'e')]
+
+    def test_some_longest_first(self):
+        """The serial lane is sorted by estimate, longest first."""
+        costs = {'b': 1, 'c': 5, 'd': 3}
+        sched = scheduler.Scheduler(_profiles(), 'some',
+                                    estimate=lambda n, _: costs.get(n, 0))
+        assert [n for _, _, n in _names(sched)][:3] == ['c', 'd', 'b']
+
+    def test_len(self):
+        assert len(scheduler.Scheduler(_profiles(), 'some')) == 5
+
+    class TestPredict(object):
+        """Tests for Scheduler.predict."""
+
+        def test_concurrent_bound(self):
+            """The concurrent lane is spread over the workers."""
+            sched = scheduler.Scheduler(_profiles(), 'all',
+                                        estimate=lambda n, _: 2.0)
+            assert sched.predict(2) == 6.0
+
+        def test_serial_bound(self):
+            """The serial lane runs alongside the concurrent lane."""
+            costs = {'a': 1.0, 'e': 1.0, 'b': 4.0, 'c': 4.0, 'd': 4.0}
+            sched = scheduler.Scheduler(_profiles(), 'some',
+                                        estimate=lambda n, _: costs[n])
+            assert sched.predict(8) == 12.0
+
+        def test_longest_first(self):
+            """Long tests are started first, and don't end the run."""
+            costs = {'a': 1.0, 'b': 1.0, 'c': 1.0, 'd': 1.0, 'e': 4.0}
+            sched = scheduler.Scheduler(_profiles(), 'all',
+                                        estimate=lambda n, _: costs[n])
+            assert sched.predict(2) == 4.0
+
+
+class TestEstimate(object):
+    """Tests for the estimate function."""
+
+    def test_plain(self):
+        assert scheduler.estimate('a', utils.Test(['a'])) == 1
+
+    @pytest.mark.parametrize('subtests, expected', [
+        (['a', 'b', 'c'], 3),
+        ([], 1),
+    ])
+    def test_reduced_process(self, subtests, expected):
+        """Tests running many subtests in one process cost one per subtest."""
+        test = _ReducedTest(['a'], subtests=subtests)
+        assert scheduler.estimate('a', test) == expected
+
+    def test_lazy(self):
+        """LazyTests cost one unit, without being created."""
+        test = LazyTest(_ReducedTest, [['a']], {'subtests': ['a', 'b']})
+        assert scheduler.estimate('a', test) == 1
+
+
+class TestDurationEstimator(object):
+    """Tests for the DurationEstimator class."""
+
+    @staticmethod
+    def _result(**times):
+        run = results.TestrunResult()
+        for name, (start, end) in times.items():
+            run.tests[name] = results.TestResult('pass')
+            run.tests[name].time = results.TimeAttribute(start, end)
+        return run
+
+    def test_known(self):
+        inst = scheduler.DurationEstimator({'a': 3.0})
+        assert inst('a', None) == 3.0
+
+    def test_unknown_median(self):
+        """Unknown tests take the median duration."""
+        inst = scheduler.DurationEstimator({'a': 3.0, 'b': 1.0, 'c': 9.0})
+        assert inst('d', None) == 3.0
+
+    def test_unknown_empty(self):
+        assert scheduler.DurationEstimator({})('a', None) == 1.0
+
+    def test_from_results_mean(self):
+        """Durations from more than one result are averaged."""
+        inst = scheduler.DurationEstimator.from_results([
+            self._result(a=(1.0, 3.0)), self._result(a=(1.0, 5.0))])
+        assert inst.durations == {'a': 3.0}
+
+    def test_from_results_no_time(self):
+        """Tests without a time are treated as unknown."""
+        inst = scheduler.DurationEstimator.from_results([
+            self._result(a=(0.0, 0.0), b=(1.0, 2.0))])
+        assert inst.durations == {'b': 1.0}
+
+    def test_from_results_subtests(self):
+        """The duration of a test is shared among its subtests."""
+        run = self._result(a=(1.0, 5.0), b=(0.0, 1.0))
+        run.tests['a'].subtests['x'] = 'pass'
+        run.tests['a'].subtests['b'] = 'pass'
+        inst = scheduler.DurationEstimator.from_results([run])
+        assert inst.durations['a@x'] == 2.0
+
+    def test_from_results_subtests_test(self):
+        """The duration of a test is used over a share of a test."""
+        run = self._result(a=(1.0, 5.0), **{'a@x': (0.0, 1.0)})
+        run.tests['a'].subtests['x'] = 'pass'
+        inst = scheduler.DurationEstimator.from_results([run])
+        assert inst.durations['a@x'] == 1.0
+
+    def test_from_results_split_batch(self):
+        """The subtests of a split batch are shared by their group."""
+        run = self._result(**{'a@batch0': (1.0, 5.0)})
+        run.tests['a@batch0'].subtests['x'] = 'pass'
+        inst = scheduler.DurationEstimator.from_results([run])
+        assert inst.durations['a@x'] == 4.0
+        assert 'a@batch0@x' not in inst.durations
+
+
+class TestDurations(object):
+    """Tests for the durations function."""
+
+    def test_none(self, mocker):
+        """Without timing results there is no estimator."""
+        mocker.patch('framework.scheduler.options.OPTIONS.timing_results', [])
+        assert scheduler.durations() is None
+
+    def test_loaded_once(self, mocker):
+        """The results are only loaded once."""
+        mocker.patch('framework.scheduler.options.OPTIONS.timing_results',
+                     ['foo'])
+        mocker.patch('framework.scheduler._DURATIONS', {})
+        load = mocker.patch('framework.scheduler.backends.load',
+                            return_value=results.TestrunResult())
+        assert scheduler.durations() is scheduler.durations()
+        assert load.call_count == 1
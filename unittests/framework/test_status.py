@@ -137,3 +137,11 @@ def test_no_change(new, old):
 def test_status_comparisons(stat, op, expected):
     """Test status.Status equality protocol."""
     assert op(stat) == expected
+
+
+@pytest.mark.parametrize('new,old', itertools.permutations(
+    STATUSES + NO_OPS, 2))
+def test_key(new, old):
+    """status.Status.key: compares the same way as the statuses"""
+    assert (new < old) == (new.key < old.key)
+    assert (new <= old) == (new.key <= old.key)